@@ -0,0 +1,23 @@
+"""
+Gunicorn hooks keeping the multiprocess Prometheus metrics coherent,
+see `app.common.metrics`. Pass it with `gunicorn -c app/api/gunicorn.conf.py`.
+"""
+
+import os
+import shutil
+from typing import Any
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server: Any) -> None:  # noqa: U100
+    # Metrics files of a previous run would be added to the new ones
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server: Any, worker: Any) -> None:  # noqa: U100
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -31,6 +31,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.common.middleware.RequestMetricsMiddleware",
+    # First, to also count the queries of the other middleware
+    "app.common.middleware.QueryTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -129,3 +132,28 @@ STATICFILES_DIRS = [BASE_DIR.parent / "static"]  # noqa: F405
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 INTERNAL_IPS: list[str] = os.environ.get("DJANGO_INTERNAL_IPS", "127.0.0.1").split(" ")
+
+# Share of the requests whose queries are timed, sent in the Server-Timing header
+# and logged, from 0 (none) to 1 (all of them)
+QUERY_TIMING_SAMPLE_RATE = float(os.environ.get("QUERY_TIMING_SAMPLE_RATE", 1))
+
+# Where ProductManager.get_products_aggr reads monthly sales from:
+# - "rollup": the ProductMonthlySales table, maintained on purchase (default)
+# - "matview": a PostgreSQL materialized view, as fresh as its last refresh
+# - "live": aggregate purchased carts on every request
+PRODUCTS_AGGREGATION_BACKEND = os.environ.get("PRODUCTS_AGGREGATION_BACKEND", "rollup")
+
+# Seconds to cache the products aggregates for, 0 disables the cache.
+# Cached pages are invalidated as soon as sales, products or categories change.
+PRODUCTS_CACHE_TIMEOUT = int(os.environ.get("PRODUCTS_CACHE_TIMEOUT", 0))
+
+# Most recently used pages are also kept in the memory of each worker, which only
+# checks the data version in the shared cache every VERSION_CHECK_INTERVAL seconds.
+# Set MAX_ENTRIES or MAX_BYTES to 0 to disable this tier.
+PRODUCTS_LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get("PRODUCTS_LOCAL_CACHE_MAX_ENTRIES", 128))
+PRODUCTS_LOCAL_CACHE_MAX_BYTES = int(
+    os.environ.get("PRODUCTS_LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+PRODUCTS_CACHE_VERSION_CHECK_INTERVAL = float(
+    os.environ.get("PRODUCTS_CACHE_VERSION_CHECK_INTERVAL", 1)
+)
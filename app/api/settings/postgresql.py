@@ -0,0 +1,21 @@
+"""
+Development settings on PostgreSQL, for the code paths SQLite does not have:
+the raw queries, the materialized view, the partitioning of the cart items.
+
+    DJANGO_SETTINGS_MODULE=app.api.settings.postgresql make tests-units
+"""
+
+import os
+
+from .development import *  # noqa: F401, F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DB_DATABASE", "postgres"),
+        "USER": os.environ.get("DB_USER", "postgres"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+        "HOST": os.environ.get("DB_HOST", "localhost"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+    }
+}
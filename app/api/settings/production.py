@@ -1,17 +1,44 @@
 import os
 
+from loguru import logger
+
 from .base import *  # noqa: F401, F403
 
 DEBUG = False
 
+DB_POOLED_ENGINE = "app.common.db.backends.postgresql"
+_DB_ENGINE = os.environ.get("DB_ENGINE", DB_POOLED_ENGINE)
+if _DB_ENGINE == "django.db.backends.postgresql":
+    # `.env` files written before the pool was added still name the stock engine
+    logger.warning(
+        "DB_ENGINE is {}: connections are not pooled, set it to {} or remove it to pool them",
+        _DB_ENGINE,
+        DB_POOLED_ENGINE,
+    )
+
+# Connections borrowed from the pool of the worker, see app.common.db.pool.PoolOptions
+_DB_POOL = {
+    "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+    "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+    "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    "check": os.environ.get("DB_POOL_CHECK", "1") == "1",
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": os.environ.get("DB_ENGINE"),
+        "ENGINE": _DB_ENGINE,
         "NAME": os.environ.get("DB_DATABASE"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASSWORD"),
         "HOST": os.environ.get("DB_HOST"),
         "PORT": int(os.environ.get("DB_PORT")),  # type: ignore[arg-type]
+        # A pooled connection is given back at the end of every request,
+        # otherwise the connection of every thread is kept for a while
+        "CONN_MAX_AGE": 0
+        if _DB_ENGINE == DB_POOLED_ENGINE
+        else int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"pool": _DB_POOL} if _DB_ENGINE == DB_POOLED_ENGINE else {},
     }
 }
 
@@ -27,4 +54,8 @@ CACHES = {
     },
 }
 
+PRODUCTS_CACHE_TIMEOUT = int(os.environ.get("PRODUCTS_CACHE_TIMEOUT", 300))
+
+QUERY_TIMING_SAMPLE_RATE = float(os.environ.get("QUERY_TIMING_SAMPLE_RATE", 0.01))
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
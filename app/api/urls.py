@@ -4,6 +4,8 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic.base import RedirectView
 
+from app.common.views import metrics
+
 handler404 = "app.common.views.handler404"
 handler500 = "app.common.views.handler500"
 
@@ -15,6 +17,8 @@ urlpatterns = [
     path("admin/login/", RedirectView.as_view(url="/accounts/login/", permanent=True)),
     path("admin/logout/", RedirectView.as_view(url="/accounts/logout/", permanent=True)),
     path("admin/", admin.site.urls),
+    # Scraped from inside the network, nginx does not proxy it
+    path("metrics", metrics, name="metrics"),
     # TODO (a.bagryanov): Figure out how to use debug toolbar
     # only in development mode.
     path("__debug__/", include("debug_toolbar.urls")),
@@ -0,0 +1,312 @@
+"""
+Versioned read-through cache on top of the Django cache framework.
+
+Every key of a namespace embeds the namespace's data version, a counter kept
+in the shared cache. Bumping the counter invalidates all the keys at once:
+stale entries are never read again and simply expire.
+
+Values are stored as bytes produced by the caller's `dumps`, which keeps them
+compact and independent of the Python classes (no pickled model instances).
+Concurrent misses of the same key are collapsed with a lock in the shared
+cache, so only one worker computes the value while the others wait for it.
+
+Hot values can also be kept in the memory of each worker by a `LocalCache`,
+in front of the shared cache. The worker then only reads the version from the
+shared cache, at most once per `version_check_interval`, and a hit costs no I/O.
+
+Hits and misses of both tiers are counted in `app.common.metrics.CACHE_REQUESTS`.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple, TypeVar
+
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+from loguru import logger
+
+from app.common.metrics import CACHE_REQUESTS
+
+T = TypeVar("T")
+
+
+class _LocalEntry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+class LocalCache:
+    """
+    Thread-safe in-process LRU cache, bounded both in entries and in bytes.
+
+    The size of an entry is given by the caller, an estimate of the memory its
+    value holds once decoded.
+    Values are shared between the callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _LocalEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(self, key: str, value: Any, size: int, timeout: float) -> None:
+        if size > self.max_bytes or not self.max_entries:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = _LocalEntry(value, size, time.monotonic() + timeout)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _pop(self, key: str) -> None:
+        self._size -= self._entries.pop(key).size
+
+
+def _initial_version() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class VersionedCache:
+    def __init__(
+        self,
+        namespace: str,
+        alias: str = "default",
+        lock_timeout: float = 30,
+        poll_interval: float = 0.05,
+        local: LocalCache | None = None,
+        version_check_interval: float = 1,
+    ) -> None:
+        self._namespace = namespace
+        self._alias = alias
+        self._lock_timeout = lock_timeout
+        self._poll_interval = poll_interval
+        self._local = local
+        self._version_check_interval = version_check_interval
+        self._local_version: int | None = None
+        self._version_checked_at = 0.0
+
+    @property
+    def _cache(self) -> BaseCache:
+        cache: BaseCache = caches[self._alias]
+        return cache
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self._namespace}:version"
+
+    def get_version(self) -> int:
+        """
+        Return the current data version of the namespace.
+
+        With a local cache, the version read from the shared cache is reused
+        for `version_check_interval` seconds, so a change made by another worker
+        may go unnoticed for that long.
+        """
+        if self._local_version is not None and self._is_local_version_fresh():
+            return self._local_version
+        return self._use_version(self._fetch_version())
+
+    async def aget_version(self) -> int:
+        if self._local_version is not None and self._is_local_version_fresh():
+            return self._local_version
+        return self._use_version(await self._afetch_version())
+
+    def _is_local_version_fresh(self) -> bool:
+        if self._local is None:
+            return False
+        return time.monotonic() - self._version_checked_at < self._version_check_interval
+
+    def _use_version(self, version: int) -> int:
+        if self._local is not None:
+            if version != self._local_version:
+                # Entries of the previous versions can not be read any more
+                self._local.clear()
+            self._local_version, self._version_checked_at = version, time.monotonic()
+        return version
+
+    def _fetch_version(self) -> int:
+        version = self._cache.get(self._version_key)
+        if version is None:
+            # Start from the current time rather than from 1, so that a counter
+            # evicted from the cache never goes back to a version still in use
+            self._cache.add(self._version_key, _initial_version(), timeout=None)
+            version = self._cache.get(self._version_key)
+        return int(version)
+
+    async def _afetch_version(self) -> int:
+        version = await self._cache.aget(self._version_key)
+        if version is None:
+            await self._cache.aadd(self._version_key, _initial_version(), timeout=None)
+            version = await self._cache.aget(self._version_key)
+        return int(version)
+
+    def bump(self) -> None:
+        """
+        Invalidate every key of the namespace.
+        """
+        try:
+            self._cache.incr(self._version_key)
+        except ValueError:
+            self._fetch_version()
+        self.clear_local()
+
+    def clear_local(self) -> None:
+        """
+        Forget the values and the version cached in the memory of this worker.
+        """
+        self._local_version = None
+        if self._local is not None:
+            self._local.clear()
+
+    def bump_on_commit(self) -> None:
+        """
+        Invalidate every key of the namespace once the current transaction commits.
+        """
+        transaction.on_commit(self.bump)
+
+    def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], T],
+        dumps: Callable[[T], bytes],
+        loads: Callable[[bytes], T],
+        timeout: float,
+        sizeof: Callable[[T], int] | None = None,
+    ) -> T:
+        """
+        Return the cached value of the key, computing and caching it on a miss.
+
+        Only one caller computes a missing value; the others poll the cache
+        for up to `lock_timeout` seconds before computing it themselves.
+        `sizeof` estimates the memory of the value in the local tier, the length
+        of its serialized form by default, which is far less for compressed data.
+        """
+        cache = self._cache
+        full_key = f"{self._namespace}:v{self.get_version()}:{key}"
+        lock_key = f"{full_key}:lock"
+
+        if self._local is not None:
+            value: T | None = self._local.get(full_key)
+            self._count("local", value is not None)
+            if value is not None:
+                return value
+
+        data = cache.get(full_key)
+        self._count("shared", data is not None)
+        if data is not None:
+            return self._set_local(full_key, loads(data), data, timeout, sizeof)
+
+        deadline = time.monotonic() + self._lock_timeout
+        locked = cache.add(lock_key, 1, timeout=self._lock_timeout)
+        while not locked:
+            time.sleep(self._poll_interval)
+            data = cache.get(full_key)
+            if data is not None:
+                return self._set_local(full_key, loads(data), data, timeout, sizeof)
+            if time.monotonic() > deadline:
+                logger.warning("Timed out waiting for {} to be computed", full_key)
+                break
+            locked = cache.add(lock_key, 1, timeout=self._lock_timeout)
+
+        try:
+            computed = compute()
+            data = dumps(computed)
+            cache.set(full_key, data, timeout=timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return self._set_local(full_key, computed, data, timeout, sizeof)
+
+    async def aget_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[T]],
+        dumps: Callable[[T], bytes],
+        loads: Callable[[bytes], T],
+        timeout: float,
+        sizeof: Callable[[T], int] | None = None,
+    ) -> T:
+        """
+        Async `get_or_set`, taking a coroutine function to compute the value.
+        """
+        cache = self._cache
+        full_key = f"{self._namespace}:v{await self.aget_version()}:{key}"
+        lock_key = f"{full_key}:lock"
+
+        if self._local is not None:
+            value: T | None = self._local.get(full_key)
+            self._count("local", value is not None)
+            if value is not None:
+                return value
+
+        data = await cache.aget(full_key)
+        self._count("shared", data is not None)
+        if data is not None:
+            return self._set_local(full_key, loads(data), data, timeout, sizeof)
+
+        deadline = time.monotonic() + self._lock_timeout
+        locked = await cache.aadd(lock_key, 1, timeout=self._lock_timeout)
+        while not locked:
+            await asyncio.sleep(self._poll_interval)
+            data = await cache.aget(full_key)
+            if data is not None:
+                return self._set_local(full_key, loads(data), data, timeout, sizeof)
+            if time.monotonic() > deadline:
+                logger.warning("Timed out waiting for {} to be computed", full_key)
+                break
+            locked = await cache.aadd(lock_key, 1, timeout=self._lock_timeout)
+
+        try:
+            computed = await compute()
+            data = dumps(computed)
+            await cache.aset(full_key, data, timeout=timeout)
+        finally:
+            if locked:
+                await cache.adelete(lock_key)
+        return self._set_local(full_key, computed, data, timeout, sizeof)
+
+    def _count(self, tier: str, hit: bool) -> None:
+        CACHE_REQUESTS.labels(self._namespace, tier, "hit" if hit else "miss").inc()
+
+    def _set_local(
+        self,
+        full_key: str,
+        value: T,
+        data: bytes,
+        timeout: float,
+        sizeof: Callable[[T], int] | None,
+    ) -> T:
+        if self._local is not None:
+            size = sizeof(value) if sizeof is not None else len(data)
+            self._local.set(full_key, value, size=size, timeout=timeout)
+        return value
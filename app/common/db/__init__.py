@@ -0,0 +1,40 @@
+from .aio import afetchall, async_connection, get_async_connection_params, has_pool
+from .copy import (
+    abulk_load,
+    acopy_rows,
+    areserve_pks,
+    bulk_load,
+    copy_rows,
+    reserve_pks,
+    supports_copy,
+)
+from .explain import capture_sql, explain_plan, QueryPlan
+from .pool import aclose_pools, pool_stats, PoolOptions
+from .prepared import prepared_statements, PreparedStatement, PreparedStatementRegistry
+from .timing import collect_queries, QueryStats, record_query
+
+__all__ = [
+    "abulk_load",
+    "aclose_pools",
+    "acopy_rows",
+    "areserve_pks",
+    "afetchall",
+    "async_connection",
+    "bulk_load",
+    "capture_sql",
+    "collect_queries",
+    "copy_rows",
+    "explain_plan",
+    "get_async_connection_params",
+    "has_pool",
+    "pool_stats",
+    "PoolOptions",
+    "PreparedStatement",
+    "PreparedStatementRegistry",
+    "prepared_statements",
+    "QueryPlan",
+    "QueryStats",
+    "record_query",
+    "reserve_pks",
+    "supports_copy",
+]
@@ -0,0 +1,93 @@
+"""
+Native async access to PostgreSQL for raw analytics queries.
+
+Django 4.2 runs every ORM query in a thread, even from async views.
+:func:`async_connection` opens a psycopg3 ``AsyncConnection`` with the settings
+of a Django database instead, so a slow query only suspends the coroutine
+awaiting it and the event loop keeps serving other requests.
+
+Connecting costs more than a short query, so request handlers only take this
+path when the database has an async pool (:func:`has_pool`) and run their
+queries in a thread otherwise. Without a pool, :func:`async_connection` opens
+a connection per call, which suits long jobs such as ``COPY`` only.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from typing import Any
+
+import psycopg
+from django.db import connections
+
+from app.common.db.pool import acheck_connection, aget_pool, PoolOptions, report_stats
+from app.common.db.prepared import PreparedStatement
+from app.common.db.timing import record_query
+
+
+def get_async_connection_params(alias: str = "default") -> dict[str, Any]:
+    """
+    Return the psycopg connection parameters of a Django database.
+    """
+    params: dict[str, Any] = connections[alias].get_connection_params()
+    # Django's cursor classes are synchronous
+    params.pop("cursor_factory", None)
+    # Not a libpq option, the pooled backend drops it too
+    params.pop("pool", None)
+    params["autocommit"] = True
+    return params
+
+
+def has_pool(alias: str = "default") -> bool:
+    """
+    Return whether the connections of the database are pooled, see `app.common.db.pool`.
+    """
+    return connections[alias].settings_dict["OPTIONS"].get("pool") is not None
+
+
+@asynccontextmanager
+async def async_connection(alias: str = "default") -> AsyncIterator[psycopg.AsyncConnection[Any]]:
+    """
+    Borrow a connection from the async pool of the database if it has one
+    (see `app.common.db.pool`), open a new connection otherwise.
+
+    A new connection is closed on exit, along with the statements prepared on it.
+    """
+    pool_options = connections[alias].settings_dict["OPTIONS"].get("pool")
+    if pool_options is None:
+        conn = await psycopg.AsyncConnection.connect(**get_async_connection_params(alias))
+        try:
+            yield conn
+        finally:
+            await conn.close()
+        return
+
+    options = PoolOptions(**pool_options)
+    pool = await aget_pool(alias, get_async_connection_params(alias), options)
+    report_stats(pool, options)
+    conn = await pool.getconn()
+    if options.check and not await acheck_connection(conn):
+        # A broken connection is closed rather than put back in the pool
+        await pool.putconn(conn)
+        conn = await pool.getconn()
+    try:
+        yield conn
+    finally:
+        await pool.putconn(conn)
+
+
+async def afetchall(
+    conn: psycopg.AsyncConnection[Any], statement: PreparedStatement, params: Sequence[Any]
+) -> list[tuple[Any, ...]]:
+    """
+    Execute the statement, prepared on the server by psycopg, and return all the rows.
+
+    Preparing only pays off on a connection that outlives the call, a pooled one.
+    """
+    _start = time.perf_counter()
+    cursor = await conn.execute(statement.sql, params, prepare=True)
+    rows = await cursor.fetchall()
+    record_query(statement.sql, time.perf_counter() - _start, len(rows))
+    return rows
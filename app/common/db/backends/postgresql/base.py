@@ -0,0 +1,56 @@
+"""
+PostgreSQL backend borrowing its connections from a `psycopg_pool.ConnectionPool`.
+
+Use it as the `ENGINE` of a database and configure the pool with
+`OPTIONS["pool"]`, a dict of `app.common.db.pool.PoolOptions` fields.
+Requires psycopg3.
+"""
+
+from typing import Any
+
+from django.db.backends.postgresql import base
+from psycopg import Connection, IsolationLevel
+from psycopg_pool import ConnectionPool
+
+from app.common.db.pool import check_connection, get_pool, PoolOptions, report_stats
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # The pool the current connection was borrowed from
+    _pool: ConnectionPool | None = None
+
+    @property
+    def pool_options(self) -> PoolOptions:
+        return PoolOptions(**self.settings_dict["OPTIONS"].get("pool", {}))
+
+    def get_connection_params(self) -> dict[str, Any]:
+        conn_params: dict[str, Any] = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params: dict[str, Any]) -> Connection[Any]:
+        options = self.pool_options
+        pool = get_pool(self.alias, conn_params, options)
+        report_stats(pool, options)
+        connection = pool.getconn()
+        if options.check and not check_connection(connection):
+            # A broken connection is closed rather than put back in the pool
+            pool.putconn(connection)
+            connection = pool.getconn()
+
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        self.isolation_level = IsolationLevel(
+            IsolationLevel.READ_COMMITTED if isolation_level is None else isolation_level
+        )
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        self._pool = pool
+        return connection
+
+    def _close(self) -> None:
+        if self._pool is None:
+            super()._close()  # type: ignore[misc]
+            return
+        pool, self._pool = self._pool, None
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
@@ -0,0 +1,94 @@
+"""
+Query plans, to tell which indexes a query is run with.
+
+On PostgreSQL the plan is read from ``EXPLAIN (FORMAT JSON)``, on SQLite from
+``EXPLAIN QUERY PLAN``. Other databases are not supported.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test.utils import CaptureQueriesContext
+
+# Details of the SEARCH and SCAN steps of a SQLite plan, e.g. SEARCH t USING INDEX i (c>?)
+SQLITE_PLAN_RE = re.compile(
+    r"^(?P<op>SEARCH|SCAN) (?:TABLE )?(?P<table>\w+)(?: AS \w+)?"
+    r"(?: USING (?P<scan>(?:COVERING )?INDEX|INTEGER PRIMARY KEY)(?: (?P<index>\w+))?)?"
+)
+
+
+@dataclass
+class QueryPlan:
+    # Index -> how it is scanned, e.g. "Index Only Scan" or "COVERING INDEX"
+    indexes: dict[str, str] = field(default_factory=dict)
+    # Tables read in full
+    seq_scans: set[str] = field(default_factory=set)
+    # The plan as printed
+    lines: list[str] = field(default_factory=list)
+
+
+def capture_sql(call: Callable[[], Any], using: str = DEFAULT_DB_ALIAS) -> str:
+    """
+    Return the last query run by the call, with its parameters inlined.
+    """
+    with CaptureQueriesContext(connections[using]) as queries:
+        call()
+    if not queries.captured_queries:
+        raise ValueError("No query was run")
+    return str(queries.captured_queries[-1]["sql"])
+
+
+def _walk_pg_plan(node: dict[str, Any], plan: QueryPlan, depth: int = 0) -> None:
+    node_type = node["Node Type"]
+    line = node_type
+    if "Index Name" in node:
+        plan.indexes.setdefault(node["Index Name"], node_type)
+        line = f"{line} using {node['Index Name']}"
+    if "Relation Name" in node:
+        if node_type == "Seq Scan":
+            plan.seq_scans.add(node["Relation Name"])
+        line = f"{line} on {node['Relation Name']}"
+    if node.get("Subplans Removed"):
+        line = f"{line} ({node['Subplans Removed']} partitions pruned)"
+    if "Actual Total Time" in node:
+        line = f"{line} (actual time={node['Actual Total Time']} rows={node['Actual Rows']})"
+    plan.lines.append(f"{'  ' * depth}{line}")
+    for child in node.get("Plans", []):
+        _walk_pg_plan(child, plan, depth + 1)
+
+
+def explain_plan(sql: str, analyze: bool = False, using: str = DEFAULT_DB_ALIAS) -> QueryPlan:
+    """
+    Return the indexes and the full table scans of the plan of the query.
+    """
+    connection = connections[using]
+    plan = QueryPlan()
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            options = "FORMAT JSON, ANALYZE, BUFFERS" if analyze else "FORMAT JSON"
+            cursor.execute(f"EXPLAIN ({options}) {sql}")
+            (result,) = cursor.fetchone()
+            # psycopg decodes json columns, unless told otherwise
+            if isinstance(result, str):
+                result = json.loads(result)
+            _walk_pg_plan(result[0]["Plan"], plan)
+        elif connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            for _, _, _, detail in cursor.fetchall():
+                plan.lines.append(detail)
+                match = SQLITE_PLAN_RE.match(detail)
+                if not match:
+                    continue
+                if match["index"]:
+                    plan.indexes.setdefault(match["index"], match["scan"])
+                elif match["op"] == "SCAN":
+                    plan.seq_scans.add(match["table"])
+        else:
+            raise ValueError(f"Query plans of {connection.vendor} are not supported")
+    return plan
@@ -0,0 +1,175 @@
+"""
+Process-wide psycopg3 connection pools.
+
+Django 4.2 opens one connection per thread and closes it at the end of every
+request (``CONN_MAX_AGE = 0``), or keeps it for the whole life of the thread.
+With the ``app.common.db.backends.postgresql`` engine, connections are instead
+borrowed from a :class:`psycopg_pool.ConnectionPool` shared by all the threads
+of the worker and given back when Django closes them. The async code paths use
+an :class:`psycopg_pool.AsyncConnectionPool` of the running event loop, which
+:func:`aclose_pools` closes before a short-lived loop (``asyncio.run``,
+``async_to_sync``) finishes, or its connections stay open.
+
+The pool is configured with ``DATABASES[...]["OPTIONS"]["pool"]``, see
+:class:`PoolOptions`. Pools are created lazily, once per process, so workers
+forked by gunicorn never share connections.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+from psycopg import AsyncConnection, Connection
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+from app.common.metrics import set_pool_stats
+
+
+@dataclass(frozen=True)
+class PoolOptions:
+    """
+    Parameters
+    ----------
+    min_size : int
+        The number of connections kept open even when idle.
+    max_size : int
+        The maximum number of connections of a worker, across all its threads.
+    timeout : float
+        Seconds to wait for a free connection before raising `PoolTimeout`.
+    max_idle : float
+        Seconds an unused connection is kept open above `min_size`.
+    max_lifetime : float
+        Seconds after which a connection is replaced, to spread server side memory growth.
+    check : bool
+        Run `SELECT 1` on a connection before handing it out, replacing it if it is broken.
+    stats_interval : float
+        Log the pool statistics at most once per this many seconds, `0` to never log them.
+    """
+
+    min_size: int = 2
+    max_size: int = 10
+    timeout: float = 30
+    max_idle: float = 600
+    max_lifetime: float = 3600
+    check: bool = True
+    stats_interval: float = 60
+
+    @property
+    def pool_kwargs(self) -> dict[str, Any]:
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "timeout": self.timeout,
+            "max_idle": self.max_idle,
+            "max_lifetime": self.max_lifetime,
+        }
+
+
+_lock = threading.Lock()
+_pools: dict[tuple[int, str], ConnectionPool] = {}
+_async_pools: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[str, AsyncConnectionPool]
+] = weakref.WeakKeyDictionary()
+_stats_logged_at: dict[str, float] = {}
+
+
+def get_pool(alias: str, conn_params: dict[str, Any], options: PoolOptions) -> ConnectionPool:
+    """
+    Return the pool of the database in this process, opening it on first use.
+    """
+    key = (os.getpid(), alias)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            logger.info("[{}] Opening connection pool of pid {}", alias, key[0])
+            pool = ConnectionPool(kwargs=conn_params, name=alias, open=True, **options.pool_kwargs)
+            _pools[key] = pool
+    return pool
+
+
+async def aget_pool(
+    alias: str, conn_params: dict[str, Any], options: PoolOptions
+) -> AsyncConnectionPool:
+    """
+    Return the pool of the database for the running event loop, opening it on first use.
+    """
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(alias)
+    if pool is None:
+        logger.info("[{}] Opening async connection pool of pid {}", alias, os.getpid())
+        # An async pool must be opened from its event loop
+        pool = AsyncConnectionPool(
+            kwargs=conn_params, name=f"{alias}-async", open=False, **options.pool_kwargs
+        )
+        pools[alias] = pool
+    await pool.open()
+    return pool
+
+
+async def aclose_pools() -> None:
+    """
+    Close the async pools of the running event loop.
+    """
+    pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for alias, pool in pools.items():
+        logger.info("[{}] Closing async connection pool of pid {}", alias, os.getpid())
+        await pool.close()
+
+
+def check_connection(conn: Connection[Any]) -> bool:
+    try:
+        conn.execute("SELECT 1")
+        if not conn.autocommit:
+            conn.rollback()
+    except Exception as exc:
+        logger.warning("Discarding broken pooled connection: {}", exc)
+        return False
+    return True
+
+
+async def acheck_connection(conn: AsyncConnection[Any]) -> bool:
+    try:
+        await conn.execute("SELECT 1")
+        if not conn.autocommit:
+            await conn.rollback()
+    except Exception as exc:
+        logger.warning("Discarding broken pooled connection: {}", exc)
+        return False
+    return True
+
+
+def report_stats(pool: ConnectionPool | AsyncConnectionPool, options: PoolOptions) -> None:
+    """
+    Export the statistics of the pool to the metrics and log them every `stats_interval`.
+    """
+    stats = pool.get_stats()
+    set_pool_stats(pool.name, stats)
+    if not options.stats_interval:
+        return
+    now = time.monotonic()
+    if now - _stats_logged_at.get(pool.name, 0) < options.stats_interval:
+        return
+    _stats_logged_at[pool.name] = now
+    logger.info("[{}] Pool stats of pid {}: {}", pool.name, os.getpid(), stats)
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    """
+    Return the statistics of every pool of this worker, by pool name.
+
+    See https://www.psycopg.org/psycopg3/docs/advanced/pool.html#pool-stats
+    """
+    pid = os.getpid()
+    pools: list[ConnectionPool | AsyncConnectionPool] = [
+        pool for (pool_pid, _), pool in _pools.items() if pool_pid == pid
+    ]
+    for async_pools in list(_async_pools.values()):
+        pools.extend(async_pools.values())
+    return {pool.name: pool.get_stats() for pool in pools}
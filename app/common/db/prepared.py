@@ -0,0 +1,166 @@
+"""
+Per-connection registry of PostgreSQL prepared statements.
+
+Raw analytics queries are declared once as :class:`PreparedStatement` objects
+and executed through :data:`prepared_statements`. The first execution on a
+physical connection sends ``PREPARE``, every following one only ``EXECUTE``,
+so the query is parsed and planned once per connection instead of per request.
+
+If the connection is configured for psycopg3 server-side binding with a
+``prepare_threshold`` (see ``DATABASES[...]["OPTIONS"]``), the statement is
+handed to psycopg as is and its own prepared statements cache is used instead.
+"""
+
+from __future__ import annotations
+
+import itertools
+import re
+import threading
+import weakref
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from django.db import DatabaseError
+from django.db.backends.utils import CursorWrapper
+from loguru import logger
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+# https://www.postgresql.org/docs/current/errcodes-appendix.html
+INVALID_SQL_STATEMENT_NAME = "26000"
+
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    """
+    A named SQL statement that should be parsed and planned once per connection.
+
+    Parameters
+    ----------
+    name : str
+        The name of the statement on the server, must be a lowercase identifier.
+    sql : str
+        The statement body using DB-API ``%s`` placeholders.
+    arg_types : tuple[str, ...]
+        PostgreSQL types of the parameters, in placeholders order.
+    """
+
+    name: str
+    sql: str
+    arg_types: tuple[str, ...] = ()
+
+    @property
+    def prepare_sql(self) -> str:
+        counter = itertools.count(1)
+        body = _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", self.sql)
+        args = f"({', '.join(self.arg_types)})" if self.arg_types else ""
+        return f"PREPARE {self.name}{args} AS {body}"
+
+    @property
+    def execute_sql(self) -> str:
+        if not self.arg_types:
+            return f"EXECUTE {self.name}"
+        return f"EXECUTE {self.name}({', '.join(['%s'] * len(self.arg_types))})"
+
+
+def _sqlstate(exc: BaseException) -> str | None:
+    cause = exc.__cause__
+    # psycopg3 exposes `sqlstate`, psycopg2 exposes `pgcode`
+    return getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+
+
+def _uses_psycopg_prepare(cursor: CursorWrapper) -> bool:
+    """
+    Whether psycopg3 is going to prepare the statement on its own.
+    """
+    raw_connection = cursor.db.connection
+    if getattr(raw_connection, "prepare_threshold", None) is None:
+        return False
+    try:
+        import psycopg
+    except ImportError:
+        return False
+    return not isinstance(cursor.cursor, psycopg.ClientCursor)
+
+
+class PreparedStatementRegistry:
+    """
+    Tracks which statements were prepared on which DB-API connection.
+
+    The state is keyed by the physical connection object rather than by the
+    Django connection wrapper, so a closed or recycled connection
+    (``CONN_MAX_AGE``, a pool, a reconnect after an error) is forgotten together
+    with its statements, and a pooled connection handed to another thread
+    keeps the statements it already has.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._prepared: weakref.WeakKeyDictionary[Any, set[str]] = weakref.WeakKeyDictionary()
+
+    def is_prepared(self, raw_connection: Any, name: str) -> bool:
+        with self._lock:
+            return name in self._prepared.get(raw_connection, ())
+
+    def discard(self, raw_connection: Any, name: str | None = None) -> None:
+        """
+        Forget one statement or, if `name` is not given, all statements of the connection.
+        """
+        with self._lock:
+            if name is None:
+                self._prepared.pop(raw_connection, None)
+            else:
+                self._prepared.get(raw_connection, set()).discard(name)
+
+    def _mark_prepared(self, raw_connection: Any, name: str) -> None:
+        with self._lock:
+            self._prepared.setdefault(raw_connection, set()).add(name)
+
+    def prepare(self, cursor: CursorWrapper, statement: PreparedStatement) -> None:
+        """
+        Prepare the statement on the cursor's connection unless it already exists there.
+        """
+        cursor.execute(
+            "SELECT 1 FROM pg_prepared_statements WHERE name = %s",
+            [statement.name],
+        )
+        if cursor.fetchone() is None:
+            logger.debug("[{}] Preparing statement {}", cursor.db.alias, statement.name)
+            cursor.execute(statement.prepare_sql)
+        self._mark_prepared(cursor.db.connection, statement.name)
+
+    def execute(
+        self,
+        cursor: CursorWrapper,
+        statement: PreparedStatement,
+        params: Sequence[Any] = (),
+    ) -> None:
+        """
+        Execute the statement, preparing it first if the connection has not seen it yet.
+
+        Results are left on the cursor, as with `cursor.execute`.
+        """
+        if _uses_psycopg_prepare(cursor):
+            cursor.execute(statement.sql, params)
+            return
+
+        raw_connection = cursor.db.connection
+        if not self.is_prepared(raw_connection, statement.name):
+            self.prepare(cursor, statement)
+
+        try:
+            cursor.execute(statement.execute_sql, params)
+        except DatabaseError as exc:
+            if _sqlstate(exc) != INVALID_SQL_STATEMENT_NAME:
+                raise
+            # The statement was dropped behind our back: DISCARD ALL from a pooler,
+            # DEALLOCATE or a rolled back transaction.
+            self.discard(raw_connection, statement.name)
+            if cursor.db.in_atomic_block:
+                raise
+            self.prepare(cursor, statement)
+            cursor.execute(statement.execute_sql, params)
+
+
+prepared_statements = PreparedStatementRegistry()
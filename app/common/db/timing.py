@@ -0,0 +1,84 @@
+"""
+Per-request statistics of the SQL queries.
+
+Every Django connection runs its queries through :func:`time_query`, installed
+by ``CommonConfig.ready``, and the raw async queries of :func:`afetchall`
+report theirs with :func:`record_query`. Statistics are only kept within
+:func:`collect_queries`, whose context variable follows a request into
+``sync_to_async`` threads, so queries of concurrent requests are not mixed up.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    # As reported by the driver: psycopg counts the rows a SELECT returns, sqlite3 does not
+    rows: int = 0
+    slowest_sql: str = ""
+    slowest_seconds: float = 0.0
+
+    def add(self, sql: str, seconds: float, rows: int) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.rows += rows
+        if seconds >= self.slowest_seconds:
+            self.slowest_sql, self.slowest_seconds = sql, seconds
+
+
+# Nested `collect_queries` all see the queries
+_collectors: ContextVar[tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+def record_query(sql: str, seconds: float, rows: int = 0) -> None:
+    for stats in _collectors.get():
+        stats.add(sql, seconds, rows)
+
+
+@contextmanager
+def collect_queries() -> Iterator[QueryStats]:
+    """
+    Collect the statistics of the queries run meanwhile in this context.
+    """
+    stats = QueryStats()
+    token = _collectors.set((*_collectors.get(), stats))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+def time_query(
+    execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]
+) -> Any:
+    """
+    `execute_wrapper` of every connection, free when no queries are collected.
+    """
+    if not _collectors.get():
+        return execute(sql, params, many, context)
+
+    _start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - _start
+        record_query(sql, seconds, max(getattr(context["cursor"], "rowcount", 0), 0))
+
+
+def install_query_timing(connection: BaseDatabaseWrapper, **kwargs: Any) -> None:  # noqa: U100
+    """
+    `connection_created` receiver adding `time_query` to the connection.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
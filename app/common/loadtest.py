@@ -0,0 +1,328 @@
+"""
+HTTP load generation against the ASGI application.
+
+Requests are sent with the session cookie of a synthetic user, either
+in-process straight to ``api.asgi:application`` or over HTTP to a running
+server, for example gunicorn with uvicorn workers started by
+:func:`start_server`. Every request is timed and its queries are counted:
+in-process with `collect_queries`, over HTTP from the ``Server-Timing`` header
+of the requests sampled by `QueryTimingMiddleware`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import os
+import re
+import socket
+import subprocess  # nosec B404
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from loguru import logger
+
+from app.common.db import aclose_pools, collect_queries
+from app.common.utils import create_faker, percentile
+from app.common.utils.bakery import MultiBakery
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Query count of the `db` metric sent by `QueryTimingMiddleware`
+SERVER_TIMING_QUERIES_RE = re.compile(r'(?:^|,\s*)db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@dataclass(frozen=True)
+class Sample:
+    status: int
+    seconds: float
+    # Queries run while serving the request, `None` when they can not be counted
+    queries: int | None = None
+
+
+@dataclass
+class LoadTestReport:
+    target: str
+    concurrency: int
+    seconds: float
+    samples: list[Sample] = field(default_factory=list)
+
+    @property
+    def requests_per_second(self) -> float:
+        return len(self.samples) / self.seconds if self.seconds else 0.0
+
+    def latency(self, q: float) -> float:
+        return percentile([sample.seconds for sample in self.samples], q)
+
+    def histogram(self) -> list[tuple[float, int]]:
+        """
+        Return the upper bound in milliseconds and the number of requests of every bucket.
+        """
+        counts = Counter(
+            next((bound for bound in HISTOGRAM_BOUNDS_MS if ms <= bound), float("inf"))
+            for ms in (sample.seconds * 1000 for sample in self.samples)
+        )
+        return [(bound, counts[bound]) for bound in (*HISTOGRAM_BOUNDS_MS, float("inf"))]
+
+    def statuses(self) -> dict[int, int]:
+        return dict(sorted(Counter(sample.status for sample in self.samples).items()))
+
+    def queries(self) -> list[int]:
+        return [sample.queries for sample in self.samples if sample.queries is not None]
+
+    def as_dict(self) -> dict[str, Any]:
+        queries = self.queries()
+        return {
+            "target": self.target,
+            "concurrency": self.concurrency,
+            "requests": len(self.samples),
+            "seconds": self.seconds,
+            "requests_per_second": self.requests_per_second,
+            "latency": {f"p{q}": self.latency(q) for q in (50, 95, 99)},
+            "histogram_ms": {str(bound): count for bound, count in self.histogram()},
+            "statuses": self.statuses(),
+            "queries_per_request": {
+                "mean": sum(queries) / len(queries) if queries else None,
+                "max": max(queries, default=None),
+            },
+        }
+
+
+def login_cookies() -> dict[str, str]:
+    """
+    Create a synthetic user, log them in and return the cookies of their session.
+    """
+    user = MultiBakery(faker=create_faker()).make_user(user_model=get_user_model())
+    user.save()
+    client = Client()
+    client.force_login(user)
+    return {name: morsel.value for name, morsel in client.cookies.items()}
+
+
+def _cookie_header(cookies: dict[str, str]) -> str:
+    return "; ".join(f"{name}={value}" for name, value in cookies.items())
+
+
+async def asgi_request(
+    application: Any, path: str, cookies: dict[str, str], host: str = "localhost"
+) -> Sample:
+    """
+    Send a GET request to the ASGI application and time it.
+    """
+    url = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", host.encode()),
+            (b"cookie", _cookie_header(cookies).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": (host, 80),
+    }
+    status = 0
+    body_sent = False
+    finished = asyncio.Event()
+
+    async def receive() -> dict[str, Any]:
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client only goes away once the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    _start = time.perf_counter()
+    with collect_queries() as queries:
+        await application(scope, receive, send)
+    return Sample(status=status, seconds=time.perf_counter() - _start, queries=queries.count)
+
+
+async def _run_in_process(
+    application: Any, path: str, cookies: dict[str, str], requests: int, concurrency: int, host: str
+) -> list[Sample]:
+    samples: list[Sample] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            samples.append(await asgi_request(application, path, cookies, host=host))
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        # The pools of the event loop would outlive it
+        await aclose_pools()
+    return samples
+
+
+def run_in_process(
+    path: str,
+    cookies: dict[str, str],
+    requests: int = 100,
+    concurrency: int = 10,
+    host: str = "localhost",
+) -> LoadTestReport:
+    """
+    Send the requests to `api.asgi:application` from `concurrency` tasks of an event loop.
+    """
+    from app.api.asgi import application
+
+    _start = time.perf_counter()
+    samples = asyncio.run(_run_in_process(application, path, cookies, requests, concurrency, host))
+    seconds = time.perf_counter() - _start
+    return LoadTestReport(
+        target=f"asgi:{path}", concurrency=concurrency, seconds=seconds, samples=samples
+    )
+
+
+def server_timing_queries(header: str) -> int | None:
+    """
+    Return the number of queries in a `Server-Timing` header, `None` if the request was not sampled.
+    """
+    match = SERVER_TIMING_QUERIES_RE.search(header)
+    return int(match.group(1)) if match else None
+
+
+def run_http(
+    url: str,
+    cookies: dict[str, str],
+    requests: int = 100,
+    concurrency: int = 10,
+    timeout: float = 30,
+) -> LoadTestReport:
+    """
+    Send the requests to a running server from `concurrency` threads,
+    each keeping its connection alive.
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    headers = {"Cookie": _cookie_header(cookies)}
+    local = threading.local()
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def take() -> bool:
+        with lock:
+            remaining[0] -= 1
+            return remaining[0] >= 0
+
+    def request() -> Sample:
+        if getattr(local, "connection", None) is None:
+            local.connection = http.client.HTTPConnection(
+                parts.hostname or "localhost", parts.port or 80, timeout=timeout
+            )
+        _start = time.perf_counter()
+        try:
+            local.connection.request("GET", path, headers=headers)
+            response = local.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            logger.warning("Request to {} failed: {}", url, exc)
+            local.connection.close()
+            local.connection = None
+            return Sample(status=0, seconds=time.perf_counter() - _start)
+        return Sample(
+            status=response.status,
+            seconds=time.perf_counter() - _start,
+            queries=server_timing_queries(response.getheader("Server-Timing", "")),
+        )
+
+    def worker() -> list[Sample]:
+        samples = []
+        while take():
+            samples.append(request())
+        if getattr(local, "connection", None) is not None:
+            local.connection.close()
+        return samples
+
+    _start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        samples = [sample for future in futures for sample in future.result()]
+    return LoadTestReport(
+        target=url,
+        concurrency=concurrency,
+        seconds=time.perf_counter() - _start,
+        samples=samples,
+    )
+
+
+def _wait_for_port(port: int, process: subprocess.Popen[bytes], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with code {process.returncode}")
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"The server did not listen on port {port} in {timeout} seconds")
+
+
+@contextmanager
+def start_server(workers: int = 4, port: int = 8001, timeout: float = 30) -> Iterator[str]:
+    """
+    Run gunicorn with uvicorn workers, as in production, and yield its URL.
+    """
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        str(BASE_DIR / "app" / "api" / "gunicorn.conf.py"),
+        "--chdir",
+        str(BASE_DIR / "app"),
+        "--pythonpath",
+        str(BASE_DIR),
+        "api.asgi:application",
+        "--bind",
+        f"127.0.0.1:{port}",
+        "-w",
+        str(workers),
+        "-k",
+        "uvicorn.workers.UvicornWorker",
+    ]
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    logger.info("Starting {}", " ".join(command))
+    process = subprocess.Popen(command, env=env)  # nosec B603
+    try:
+        _wait_for_port(port, process, timeout)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait(timeout=timeout)
@@ -0,0 +1,41 @@
+import time
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+
+from app.common.utils import create_faker
+from app.common.utils.bakery import MultiBakery
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how fast populate makes customers, hashing every password "
+        "or sharing a pool of hashed passwords"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--customers", type=int, default=100)
+        parser.add_argument(
+            "--pool-sizes",
+            type=int,
+            nargs="+",
+            default=[0, 1, 16],
+            help="Values of Settings.password_pool_size to compare, 0 hashes every password",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        User = get_user_model()
+        amount = options["customers"]
+        baseline = None
+        for pool_size in options["pool_sizes"]:
+            bakery = MultiBakery(faker=create_faker(), password_pool_size=pool_size)
+            _start = time.perf_counter()
+            bakery.make_customers(User, amount)
+            elapsed = time.perf_counter() - _start
+
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f"password_pool_size={pool_size}: {amount} customers in {elapsed:.2f} seconds, "
+                f"{amount / elapsed:.0f}/s, {baseline / elapsed:.1f}x"
+            )
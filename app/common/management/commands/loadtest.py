@@ -0,0 +1,97 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from app.common.loadtest import (
+    LoadTestReport,
+    login_cookies,
+    run_http,
+    run_in_process,
+    start_server,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send requests as a logged in user to the ASGI application, in-process or over HTTP, "
+        "and report the throughput, the latency histogram and the queries per request"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--path", default="/", help="Path and query string to request")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument(
+            "--warmup", type=int, default=10, help="Requests sent first and left out of the report"
+        )
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument("--url", help="Base URL of a running server, in-process by default")
+        target.add_argument(
+            "--start-server",
+            action="store_true",
+            help="Start gunicorn with uvicorn workers on --port and load it over HTTP",
+        )
+        parser.add_argument("--workers", type=int, default=4, help="Workers of --start-server")
+        parser.add_argument("--port", type=int, default=8001, help="Port of --start-server")
+        parser.add_argument(
+            "--host", default="localhost", help="Host header of in-process requests"
+        )
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Also write the report as JSON to this file, - for the standard output",
+        )
+
+    def load(
+        self, cookies: dict[str, str], base_url: str | None, /, **options: Any
+    ) -> LoadTestReport:
+        if base_url is None:
+            run_in_process(
+                options["path"], cookies, options["warmup"], options["concurrency"], options["host"]
+            )
+            return run_in_process(
+                options["path"],
+                cookies,
+                options["requests"],
+                options["concurrency"],
+                options["host"],
+            )
+        url = base_url.rstrip("/") + options["path"]
+        run_http(url, cookies, options["warmup"], options["concurrency"])
+        return run_http(url, cookies, options["requests"], options["concurrency"])
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        cookies = login_cookies()
+        if options["start_server"]:
+            with start_server(workers=options["workers"], port=options["port"]) as url:
+                report = self.load(cookies, url, **options)
+        else:
+            report = self.load(cookies, options["url"], **options)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(report.samples)} requests to {report.target} with concurrency "
+                f"{report.concurrency} in {report.seconds:.2f} seconds, "
+                f"{report.requests_per_second:.1f} requests/s"
+            )
+        )
+        latency = ", ".join(f"p{q} {report.latency(q) * 1000:.1f} ms" for q in (50, 95, 99))
+        self.stdout.write(f"Latency: {latency}")
+        statuses = ", ".join(f"{status}: {count}" for status, count in report.statuses().items())
+        self.stdout.write(f"Statuses: {statuses}")
+        if queries := report.queries():
+            self.stdout.write(
+                f"Queries per request: mean {sum(queries) / len(queries):.1f}, max {max(queries)}"
+            )
+
+        most = max(count for _, count in report.histogram())
+        for bound, count in report.histogram():
+            bar = "#" * round(40 * count / most) if most else ""
+            self.stdout.write(f"<= {bound:>7} ms {count:>7} {bar}")
+
+        if options["json_path"] == "-":
+            self.stdout.write(json.dumps(report.as_dict(), indent=2))
+        elif options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump(report.as_dict(), file, indent=2)
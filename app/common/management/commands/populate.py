@@ -0,0 +1,104 @@
+import json
+import os
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from app.common.populate import (
+    populate_async,
+    populate_chunks,
+    populate_processes,
+    populate_threads,
+    Settings,
+)
+from app.common.populate.report import merge_stats, peak_rss, PopulateReport, TableStats
+from app.common.populate.settings import add_settings_arguments, settings_from_options
+
+DEFAULT_WORKERS = {"threads": 4, "async": 4, "processes": os.cpu_count() or 1, "chunks": 1}
+ENGINES = tuple(DEFAULT_WORKERS)
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate the database with generated data and report the rows created "
+        "and the time it took per table"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--engine", choices=ENGINES, default="threads")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Threads, tasks or processes: 4 by default, the number of CPUs for processes",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the processes engine")
+        parser.add_argument(
+            "--chunk-size", type=int, default=10_000, help="Rows per chunk of the chunks engine"
+        )
+        parser.add_argument("--run", default="default", help="Run of the chunks engine to resume")
+        parser.add_argument(
+            "--restart", action="store_true", help="Start the run of the chunks engine over"
+        )
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Also write the report as JSON to this file, - for the standard output",
+        )
+        add_settings_arguments(parser)
+
+    def populate(
+        self, engine: str, settings: Settings, workers: int, /, **options: Any
+    ) -> dict[str, TableStats]:
+        if engine == "threads":
+            return populate_threads(settings, threads_count=workers)
+        if engine == "async":
+            return populate_async(settings, tasks_count=workers)
+        if engine == "processes":
+            reports = populate_processes(settings, processes_count=workers, seed=options["seed"])
+            return merge_stats(report.tables for report in reports)
+        checkpoints = populate_chunks(
+            settings,
+            run=options["run"],
+            chunk_size=options["chunk_size"],
+            restart=options["restart"],
+        )
+        return {
+            checkpoint.stage: TableStats(rows=checkpoint.rows, seconds=checkpoint.seconds)
+            for checkpoint in checkpoints
+        }
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        engine = options["engine"]
+        settings = settings_from_options(options)
+
+        workers = options.pop("workers") or DEFAULT_WORKERS[engine]
+
+        _start = time.perf_counter()
+        stages = self.populate(engine, settings, workers, **options)
+        report = PopulateReport(
+            engine=engine,
+            workers=workers,
+            settings=settings,
+            seconds=time.perf_counter() - _start,
+            peak_rss=peak_rss(),
+            stages=stages,
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report.rows} rows with {engine} in {report.seconds:.2f} seconds, "
+                f"{report.rows / report.seconds:.0f}/s, peak RSS {report.peak_rss / 2**20:.1f} MiB"
+            )
+        )
+        self.stdout.write(f"{'stage':<12}{'rows':>12}{'seconds':>10}{'rows/s':>12}")
+        for stage, stats in report.stages.items():
+            self.stdout.write(
+                f"{stage:<12}{stats.rows:>12}{stats.seconds:>10.2f}{stats.rows_per_second:>12.0f}"
+            )
+
+        if options["json_path"] == "-":
+            self.stdout.write(json.dumps(report.as_dict(), indent=2))
+        elif options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump(report.as_dict(), file, indent=2)
@@ -0,0 +1,81 @@
+"""
+Prometheus metrics of the application, served at ``/metrics``.
+
+Gunicorn runs every worker in a process of its own. With the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable set, the workers write their
+metrics to memory-mapped files in that directory and the one serving
+``/metrics`` adds up the files of all of them, so every scrape reports the
+whole container rather than a random worker. ``api/gunicorn.conf.py`` empties
+the directory on start and forgets the gauges of exited workers.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+from collections.abc import Callable
+from typing import Any, ParamSpec, TypeVar
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    generate_latest,
+    Histogram,
+    multiprocess,
+    REGISTRY,
+)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests, by URL name",
+    ["view", "method", "status"],
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of named database queries, fetching the rows included",
+    ["query"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "Lookups of cached values, by cache tier and result",
+    ["cache", "tier", "result"],
+)
+POOL_STATS = Gauge(
+    "db_pool_stats",
+    "psycopg_pool statistics of the connection pools, summed over live workers",
+    ["pool", "stat"],
+    multiprocess_mode="livesum",
+)
+
+
+def timed_query(func: Callable[P, T]) -> Callable[P, T]:
+    """
+    Observe the duration of every call in `QUERY_DURATION`, under the name of the function.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        with QUERY_DURATION.labels(func.__name__).time():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def set_pool_stats(pool: str, stats: dict[str, int]) -> None:
+    for stat, value in stats.items():
+        POOL_STATS.labels(pool, stat).set(value)
+
+
+def render_metrics() -> bytes:
+    """
+    Return the metrics of all the workers in the Prometheus text format.
+    """
+    registry: Any = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return bytes(generate_latest(registry))
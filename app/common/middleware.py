@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from loguru import logger
+
+from app.common.db import collect_queries, QueryStats
+from app.common.metrics import REQUEST_DURATION
+
+# Longest slowest statement logged, queries with huge IN lists are cut
+MAX_LOGGED_SQL = 1000
+
+# Methods labelled as they are, any other one counts as "other"
+HTTP_METHODS = frozenset(
+    {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"}
+)
+
+
+def server_timing(stats: QueryStats, seconds: float) -> str:
+    """
+    Return the `Server-Timing` metrics of a request, durations in milliseconds.
+    """
+    return ", ".join(
+        [
+            f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"',
+            f"db-slowest;dur={stats.slowest_seconds * 1000:.2f}",
+            f"app;dur={seconds * 1000:.2f}",
+        ]
+    )
+
+
+class QueryTimingMiddleware:
+    """
+    Collect the queries of a sample of the requests (`QUERY_TIMING_SAMPLE_RATE`):
+    their count, total time, rows and slowest statement are sent in the
+    `Server-Timing` header and logged as structured fields.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        self.get_response = get_response
+        self.sample_rate: float = settings.QUERY_TIMING_SAMPLE_RATE
+        self._is_async = iscoroutinefunction(get_response)
+        if self._is_async:
+            markcoroutinefunction(self)
+
+    def _sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase | Awaitable[HttpResponseBase]:
+        if self._is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            response: HttpResponseBase = self.get_response(request)
+            return response
+
+        _start = time.perf_counter()
+        with collect_queries() as stats:
+            response = self.get_response(request)
+        self._report(request, response, stats, time.perf_counter() - _start)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        if not self._sampled():
+            response: HttpResponseBase = await self.get_response(request)
+            return response
+
+        _start = time.perf_counter()
+        with collect_queries() as stats:
+            response = await self.get_response(request)
+        self._report(request, response, stats, time.perf_counter() - _start)
+        return response
+
+    def _report(
+        self, request: HttpRequest, response: HttpResponseBase, stats: QueryStats, seconds: float
+    ) -> None:
+        timing = server_timing(stats, seconds)
+        if "Server-Timing" in response:
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        logger.bind(
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            queries=stats.count,
+            sql_ms=round(stats.seconds * 1000, 2),
+            rows=stats.rows,
+            slowest_sql=stats.slowest_sql[:MAX_LOGGED_SQL],
+            slowest_sql_ms=round(stats.slowest_seconds * 1000, 2),
+            duration_ms=round(seconds * 1000, 2),
+        ).info(
+            "{} {} ran {} queries in {:.2f} ms",
+            request.method,
+            request.path,
+            stats.count,
+            stats.seconds * 1000,
+        )
+
+
+class RequestMetricsMiddleware:
+    """
+    Observe the duration of every request in `REQUEST_DURATION`,
+    labelled with the name of the URL it was routed to.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        self.get_response = get_response
+        self._is_async = iscoroutinefunction(get_response)
+        if self._is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase | Awaitable[HttpResponseBase]:
+        if self._is_async:
+            return self.__acall__(request)
+        _start = time.perf_counter()
+        response: HttpResponseBase = self.get_response(request)
+        self._observe(request, response, time.perf_counter() - _start)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        _start = time.perf_counter()
+        response: HttpResponseBase = await self.get_response(request)
+        self._observe(request, response, time.perf_counter() - _start)
+        return response
+
+    def _observe(self, request: HttpRequest, response: HttpResponseBase, seconds: float) -> None:
+        match = request.resolver_match
+        # URL names rather than paths, so that every id in a path does not make a time series
+        view = match.view_name if match else "unresolved"
+        # Clients choose the method, so arbitrary ones would make time series too
+        method = request.method if request.method in HTTP_METHODS else "other"
+        REQUEST_DURATION.labels(view, method, response.status_code).observe(seconds)
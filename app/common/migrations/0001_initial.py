@@ -0,0 +1,41 @@
+# Generated by Django 4.2.5 on 2026-10-17 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="PopulateCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("run", models.CharField(max_length=100)),
+                ("stage", models.CharField(max_length=32)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("done", models.PositiveIntegerField(default=0)),
+                ("rows", models.BigIntegerField(default=0)),
+                ("seconds", models.FloatField(default=0)),
+            ],
+            options={
+                "verbose_name": "Populate Checkpoint",
+                "verbose_name_plural": "Populate Checkpoints",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="populatecheckpoint",
+            constraint=models.UniqueConstraint(
+                fields=("run", "stage"), name="populate_checkpoint_uniq"
+            ),
+        ),
+    ]
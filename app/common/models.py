@@ -2,6 +2,8 @@
 Common models for all apps, mostly abstract models.
 """
 
+from typing import final
+
 from django.db import models
 from django_stubs_ext.db.models import TypedModelMeta
 
@@ -12,3 +14,60 @@ class TimeStampMixin(models.Model):
 
     class Meta(TypedModelMeta):
         abstract = True
+
+
+@final
+class PopulateCheckpointManager(models.Manager["PopulateCheckpoint"]):
+    def advance(
+        self, run: str, stage: str, total: int, done: int, rows: int, seconds: float
+    ) -> None:
+        """
+        Add a chunk of `done` units and `rows` rows to the progress of the stage.
+
+        Must be called in the transaction of the chunk, so that the chunk
+        and its checkpoint are committed together.
+        """
+        checkpoint, _ = self.select_for_update().get_or_create(run=run, stage=stage)
+        checkpoint.total = total
+        checkpoint.done += done
+        checkpoint.rows += rows
+        checkpoint.seconds += seconds
+        checkpoint.save()
+
+
+@final
+class PopulateCheckpoint(TimeStampMixin):
+    """
+    Progress of a stage of a chunked populate run, see `populate_chunks`.
+
+    `done` counts the units of the stage (categories, customers) created so far,
+    `rows` and `seconds` the rows of all tables inserted for them and the time it took.
+    """
+
+    objects: PopulateCheckpointManager = PopulateCheckpointManager()
+
+    run = models.CharField(max_length=100)
+    stage = models.CharField(max_length=32)
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    seconds = models.FloatField(default=0)
+
+    class Meta(TypedModelMeta):
+        verbose_name = "Populate Checkpoint"
+        verbose_name_plural = "Populate Checkpoints"
+
+        constraints = [
+            models.UniqueConstraint(fields=["run", "stage"], name="populate_checkpoint_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.run}: {self.stage} {self.done}/{self.total}"
+
+    @property
+    def is_done(self) -> bool:
+        return self.done >= self.total
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
@@ -7,7 +7,9 @@ Run Django shell:
 
 Import populate module:
 
-        >>> from app.common.populate import populate_threads, populate_async, Settings
+        >>> from app.common.populate import (
+        ...     populate_threads, populate_async, populate_chunks, populate_processes, Settings
+        ... )
 
 Create settings object:
 
@@ -27,6 +29,15 @@ Or run populate_async:
 
                 >>> populate_async(settings, tasks_count=4)
 
+Or run populate_processes, one process per CPU by default:
+
+                >>> populate_processes(settings, processes_count=8, seed=42)
+
+Or run populate_chunks, which inserts chunks of about 10 000 rows and resumes
+the run `name` where it stopped when called again:
+
+                >>> populate_chunks(settings, run="name", chunk_size=10_000)
+
 You can also call the script with default settings:
 
                     >>> populate_threads()
@@ -48,10 +59,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(BASE_DIR))
 
 from app.common.populate.script_async import populate_async  # noqa: E402
+from app.common.populate.script_chunks import populate_chunks  # noqa: E402
+from app.common.populate.script_processes import populate_processes  # noqa: E402
 from app.common.populate.script_threads import populate_threads  # noqa: E402
 from app.common.populate.settings import Settings  # noqa: E402
 
 __all__ = [
+    "populate_chunks",
+    "populate_processes",
     "populate_threads",
     "populate_async",
     "Settings",
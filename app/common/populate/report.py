@@ -0,0 +1,89 @@
+import datetime as dt
+import resource
+import sys
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from app.common.populate.settings import Settings
+
+# The order in which the populators create the tables
+TABLES = ("categories", "products", "customers", "carts", "cart_items")
+
+
+@dataclass(frozen=True)
+class TableStats:
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def merge_stats(stats: Iterable[dict[str, TableStats]]) -> dict[str, TableStats]:
+    """
+    Merge the stats of workers running in parallel: their rows add up
+    and the wall time of a table is the one of the slowest worker.
+    """
+    merged: dict[str, TableStats] = {}
+    for worker_stats in stats:
+        for table, table_stats in worker_stats.items():
+            total = merged.get(table, TableStats(rows=0, seconds=0.0))
+            merged[table] = TableStats(
+                rows=total.rows + table_stats.rows,
+                seconds=max(total.seconds, table_stats.seconds),
+            )
+    return dict(sorted(merged.items(), key=lambda item: _table_order(item[0])))
+
+
+def _table_order(table: str) -> int:
+    return TABLES.index(table) if table in TABLES else len(TABLES)
+
+
+def peak_rss() -> int:
+    """
+    Return the peak resident set size of this process and its children, in bytes.
+    """
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class PopulateReport:
+    engine: str
+    workers: int
+    settings: Settings
+    seconds: float
+    peak_rss: int
+    created_at: dt.datetime = field(default_factory=lambda: dt.datetime.now(tz=dt.timezone.utc))
+    # Tables, or stages of several tables for populate_chunks
+    stages: dict[str, TableStats] = field(default_factory=dict)
+
+    @property
+    def rows(self) -> int:
+        return sum(stats.rows for stats in self.stages.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "created_at": self.created_at.isoformat(),
+            "engine": self.engine,
+            "workers": self.workers,
+            "settings": asdict(self.settings),
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "rows_per_second": self.rows / self.seconds if self.seconds else 0.0,
+            "peak_rss": self.peak_rss,
+            "stages": {
+                stage: {
+                    "rows": stats.rows,
+                    "seconds": stats.seconds,
+                    "rows_per_second": stats.rows_per_second,
+                }
+                for stage, stats in self.stages.items()
+            },
+        }
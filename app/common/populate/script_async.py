@@ -1,31 +1,58 @@
 import asyncio
 import datetime as dt
 import time
+from collections.abc import Awaitable, Callable
 from contextlib import suppress
+from dataclasses import replace
+from typing import TypeVar
 
+import numpy as np
 import uvloop
 from asgiref.sync import sync_to_async
 from django import db
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from faker import Faker
 from loguru import logger
 
-from app.common.populate.settings import Settings
+from app.common.db import abulk_load, aclose_pools, acopy_rows, areserve_pks, supports_copy
+from app.common.populate.report import merge_stats, TableStats
+from app.common.populate.settings import CART_FIELDS, CART_ITEM_FIELDS, Settings
 from app.common.utils import (
+    ArrayBakery,
     create_admin,
     create_faker,
     get_last_day_of_month,
     get_month_ago,
     timeit,
 )
+from app.common.utils.array_bakery import IntArray
 from app.common.utils.bakery import MultiBakery
 from app.customers.models import Cart, CartItem, Customer
-from app.products.models import Category, Product
+from app.products.models import Category, Product, ProductMonthlySales
+
+R = TypeVar("R")
+
+
+@sync_to_async
+def _save_in_savepoint(obj: models.Model) -> None:
+    # Keeps an outer transaction usable after a duplicate name
+    with transaction.atomic():
+        obj.save()
 
 
 class AsyncPopulator:
+    """
+    Populates the database from a task of an event loop.
+
+    On PostgreSQL with psycopg 3, rows are copied over async connections
+    (see `abulk_load`), so every task has its own inserts in flight; `use_copy`
+    is implied. Otherwise the async ORM is used, which runs every query on
+    the same thread, one at a time.
+    """
+
     def __init__(
         self,
         settings: Settings,
@@ -34,8 +61,13 @@ class AsyncPopulator:
     ) -> None:
         self.fake = faker or create_faker()
         self._settings = settings
-        self._baker = MultiBakery(faker=self.fake)
+        self._baker = MultiBakery(faker=self.fake, password_pool_size=settings.password_pool_size)
+        self._array_baker = ArrayBakery(
+            zipf_exponent=settings.zipf_exponent, seasonality=settings.seasonality
+        )
         self._task_name = task_name
+        # Rows created and time spent per table by `populate`
+        self.stats: dict[str, TableStats] = {}
 
     async def create_categories(self, amount: int) -> list[Category]:
         created = 0
@@ -45,14 +77,16 @@ class AsyncPopulator:
             with suppress(IntegrityError):
                 tries += 1
                 category = self._baker.make_category(use_default_faker=(tries > 100))
-                await category.asave()
+                await _save_in_savepoint(category)
                 categories.append(category)
                 created += 1
         return categories
 
     async def create_products(self, categories: list[Category], amount: int) -> list[Product]:
         products = self._baker.make_products(categories=categories, amount=amount)
-        return await Product.objects.abulk_create(products)
+        if supports_copy():
+            return await abulk_load(Product, products)
+        return await Product.objects.abulk_create(products, batch_size=self._settings.batch_size)
 
     async def create_customers(self, amount: int) -> list[Customer]:
         User = get_user_model()
@@ -62,8 +96,15 @@ class AsyncPopulator:
         customers = await loop.run_in_executor(None, self._baker.make_customers, User, amount)
 
         try:
-            await User.objects.abulk_create([customer.user for customer in customers])
-            return await Customer.objects.abulk_create(customers, ignore_conflicts=True)
+            if supports_copy():
+                await abulk_load(User, [customer.user for customer in customers])
+                return await abulk_load(Customer, customers, ignore_conflicts=True)
+            await User.objects.abulk_create(
+                [customer.user for customer in customers], batch_size=self._settings.batch_size
+            )
+            return await Customer.objects.abulk_create(
+                customers, ignore_conflicts=True, batch_size=self._settings.batch_size
+            )
         except IntegrityError:
             if await sync_to_async(Customer.objects.count)() < amount:
                 raise
@@ -87,76 +128,172 @@ class AsyncPopulator:
         max_date = max_date or get_last_day_of_month(now)
         min_date = min_date or get_month_ago(now)
 
-        return await Cart.objects.abulk_create(
-            self._baker.make_carts(
-                customers=customers,
-                carts_per_customer=carts_per_customer,
-                min_date=min_date,
-                max_date=max_date,
-            )
+        carts = self._baker.make_carts(
+            customers=customers,
+            carts_per_customer=carts_per_customer,
+            min_date=min_date,
+            max_date=max_date,
         )
+        if supports_copy():
+            return await abulk_load(Cart, carts)
+        return await Cart.objects.abulk_create(carts, batch_size=self._settings.batch_size)
 
     async def create_cart_items(
         self,
         carts: list[Cart],
         products: list[Product],
         cart_items_per_cart: int = 10,
-    ) -> None:
+    ) -> int:
+        """
+        Create random items in every cart and return how many were created.
+        """
+        if supports_copy():
+            rows = self._baker.make_cart_item_rows(
+                carts=carts,
+                products=products,
+                cart_items_per_cart=cart_items_per_cart,
+            )
+            return await acopy_rows(CartItem, CART_ITEM_FIELDS, rows)
         items = self._baker.make_cart_items(
             carts=carts,
             products=products,
             cart_items_per_cart=cart_items_per_cart,
         )
-        await CartItem.objects.abulk_create(items, ignore_conflicts=True)
+        return len(
+            await CartItem.objects.abulk_create(
+                items, ignore_conflicts=True, batch_size=self._settings.batch_size
+            )
+        )
 
-    async def populate(self) -> None:
-        logger.info("Task #{} spawned", self._task_name)
-        _start = time.perf_counter()
+    async def create_cart_columns(
+        self,
+        customers: list[Customer],
+        carts_per_customer: int,
+        min_date: dt.datetime | None = None,
+        max_date: dt.datetime | None = None,
+    ) -> IntArray:
+        """
+        Like `create_carts`, but generate the carts with NumPy and return their ids.
+        """
+        now = timezone.now()
+        max_date = max_date or get_last_day_of_month(now)
+        min_date = min_date or get_month_ago(now)
 
-        logger.debug(
-            "Task {} creating {} categories", self._task_name, self._settings.categories_count
+        columns = self._array_baker.make_cart_columns(
+            customer_ids=np.array([customer.pk for customer in customers], dtype=np.int64),
+            carts_per_customer=carts_per_customer,
+            min_date=min_date,
+            max_date=max_date,
         )
-        categories = await self.create_categories(amount=self._settings.categories_count)
+        if not supports_copy():
+            # Without sequences to reserve ids from, the database has to return them
+            carts = await Cart.objects.abulk_create(
+                [
+                    Cart(customer_id=customer_id, is_purchased=purchased, purchased_at=at)
+                    for customer_id, purchased, at in zip(
+                        columns.customer_id.tolist(),
+                        columns.is_purchased.tolist(),
+                        columns.purchased_at_datetimes(),
+                    )
+                ],
+                batch_size=self._settings.batch_size,
+            )
+            return np.array([cart.pk for cart in carts], dtype=np.int64)
 
-        logger.debug(
-            "Task #{} creating {} products",
-            self._task_name,
-            self._settings.products_per_category_count,
-        )
-        products = await self.create_products(
-            categories=categories,
-            amount=self._settings.products_per_category_count,
-        )
+        ids = await areserve_pks(Cart, len(columns))
+        await acopy_rows(Cart, CART_FIELDS, columns.rows(ids, created_at=now))
+        return np.array(ids, dtype=np.int64)
 
-        logger.debug(
-            "Task #{} creating {} customers", self._task_name, self._settings.customers_count
+    async def create_cart_item_columns(
+        self,
+        cart_ids: IntArray,
+        products: list[Product],
+        cart_items_per_cart: int = 10,
+    ) -> int:
+        """
+        Like `create_cart_items`, but generate the items with NumPy
+        and stream them to the database without model instances.
+        """
+        rows = self._array_baker.iter_cart_item_rows(
+            cart_ids=cart_ids,
+            product_ids=np.array([product.pk for product in products], dtype=np.int64),
+            cart_items_per_cart=cart_items_per_cart,
         )
-        customers = await self.create_customers(amount=self._settings.customers_count)
+        return await acopy_rows(CartItem, CART_ITEM_FIELDS, rows)
 
+    async def _timed(
+        self, table: str, create: Callable[[], Awaitable[R]], rows: Callable[[R], int]
+    ) -> R:
+        _start = time.perf_counter()
+        result = await create()
+        self.stats[table] = TableStats(rows=rows(result), seconds=time.perf_counter() - _start)
         logger.debug(
-            "Task #{} creating {} carts",
+            "Task #{} created {} {} in {:.2f} seconds",
             self._task_name,
-            self._settings.carts_per_customer_count * self._settings.customers_count,
-        )
-        carts = await self.create_carts(
-            customers=customers,
-            carts_per_customer=self._settings.carts_per_customer_count,
+            self.stats[table].rows,
+            table,
+            self.stats[table].seconds,
         )
+        return result
 
-        logger.debug(
-            "Task #{} creating {} cart items",
-            self._task_name,
-            self._settings.cart_items_per_cart_count * self._settings.carts_per_customer_count,
+    async def populate(self) -> dict[str, TableStats]:
+        logger.info("Task #{} spawned", self._task_name)
+        _start = time.perf_counter()
+        settings = self._settings
+
+        categories = await self._timed(
+            "categories", lambda: self.create_categories(amount=settings.categories_count), len
         )
-        await self.create_cart_items(
-            carts=carts,
-            products=products,
-            cart_items_per_cart=self._settings.cart_items_per_cart_count,
+        products = await self._timed(
+            "products",
+            lambda: self.create_products(
+                categories=categories, amount=settings.products_per_category_count
+            ),
+            len,
+        )
+        customers = await self._timed(
+            "customers", lambda: self.create_customers(amount=settings.customers_count), len
         )
 
+        if settings.generator == "numpy":
+            cart_ids = await self._timed(
+                "carts",
+                lambda: self.create_cart_columns(
+                    customers=customers, carts_per_customer=settings.carts_per_customer_count
+                ),
+                len,
+            )
+            await self._timed(
+                "cart_items",
+                lambda: self.create_cart_item_columns(
+                    cart_ids=cart_ids,
+                    products=products,
+                    cart_items_per_cart=settings.cart_items_per_cart_count,
+                ),
+                int,
+            )
+        else:
+            carts = await self._timed(
+                "carts",
+                lambda: self.create_carts(
+                    customers=customers, carts_per_customer=settings.carts_per_customer_count
+                ),
+                len,
+            )
+            await self._timed(
+                "cart_items",
+                lambda: self.create_cart_items(
+                    carts=carts,
+                    products=products,
+                    cart_items_per_cart=settings.cart_items_per_cart_count,
+                ),
+                int,
+            )
+
         logger.info(
             "Task #{} finished in {:.2f} seconds", self._task_name, time.perf_counter() - _start
         )
+        return self.stats
 
 
 class AsyncPopulatorPool:
@@ -170,41 +307,51 @@ class AsyncPopulatorPool:
         self._settings = settings
         self._tasks_count = tasks_count
 
-    async def populate(self) -> None:
+    async def populate(self) -> dict[str, TableStats]:
         categories_per_task = self._settings.categories_count // self._tasks_count
         customers_per_task = self._settings.customers_count // self._tasks_count
 
-        settings = Settings(
+        settings = replace(
+            self._settings,
             categories_count=categories_per_task,
-            products_per_category_count=self._settings.products_per_category_count,
             customers_count=customers_per_task,
-            carts_per_customer_count=self._settings.carts_per_customer_count,
-            cart_items_per_cart_count=self._settings.cart_items_per_cart_count,
         )
         populators = [
             self._populator(settings=settings, task_name=str(task_name))
             for task_name in range(1, self._tasks_count + 1)
         ]
-        await asyncio.gather(*[p.populate() for p in populators])
+        return merge_stats(await asyncio.gather(*[p.populate() for p in populators]))
 
 
-async def main(settings: Settings, tasks_count: int) -> None:
+async def main(settings: Settings, tasks_count: int) -> dict[str, TableStats]:
     await sync_to_async(db.connections.close_all)()
 
     with suppress(Exception):
         await sync_to_async(create_admin)()
 
+    last_item_pk = await sync_to_async(CartItem.objects.last_pk)()
     workers = AsyncPopulatorPool(
         populator=AsyncPopulator, settings=settings, tasks_count=tasks_count
     )
-    await workers.populate()
+    try:
+        stats = await workers.populate()
+    finally:
+        # The pools of the event loop would outlive it
+        await aclose_pools()
+
+    # Carts are bulk created as already purchased, so the purchase times of the items
+    # of the run and the rollup are set once at the end
+    await sync_to_async(CartItem.objects.filter(pk__gt=last_item_pk).sync_purchased_at)()
+    await sync_to_async(ProductMonthlySales.objects.rebuild)(Cart.objects.monthly_sales())
+    return stats
 
 
 @timeit
-def populate_async(settings: Settings | None = None, tasks_count: int = 4) -> None:
+def populate_async(settings: Settings | None = None, tasks_count: int = 4) -> dict[str, TableStats]:
     """
     Create the admin user, categories, products, customers, carts and cart items
+    and return the rows created per table by all the tasks.
     """
     settings = settings or Settings()
     uvloop.install()
-    asyncio.run(main(settings=settings, tasks_count=tasks_count))
+    return asyncio.run(main(settings=settings, tasks_count=tasks_count))
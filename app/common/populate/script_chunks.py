@@ -0,0 +1,212 @@
+import time
+from collections.abc import Callable, Iterator
+from contextlib import suppress
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.utils import IntegrityError
+from faker import Faker
+from loguru import logger
+
+from app.common.db import bulk_load
+from app.common.models import PopulateCheckpoint
+from app.common.populate.script_threads import Populator
+from app.common.populate.settings import Settings
+from app.common.utils import create_admin, timeit
+from app.customers.models import Cart, CartItem, Customer
+from app.products.models import Product, ProductMonthlySales
+
+# Generated usernames may already be taken, a chunk is then generated again
+CUSTOMERS_RETRIES = 3
+
+
+@dataclass(frozen=True)
+class Progress:
+    run: str
+    stage: str
+    done: int
+    total: int
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def eta(self) -> float:
+        """
+        Seconds left to finish the stage at the speed so far.
+        """
+        return (self.total - self.done) * self.seconds / self.done if self.done else 0.0
+
+
+class ChunkPopulator(Populator):
+    """
+    Populates the database in chunks of about `chunk_size` rows.
+
+    The catalog stage creates categories with their products, then the customers
+    stage creates customers with their carts and cart items. Every chunk is
+    created in a transaction which also advances the `PopulateCheckpoint` of its
+    stage, so running the same `run` again resumes after the last committed chunk.
+
+    Only the products ids and one chunk are held in memory at a time.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        run: str = "default",
+        chunk_size: int = 10_000,
+        faker: Faker | None = None,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__(settings=settings, faker=faker, seed=seed)
+        self._run = run
+        self._chunk_size = chunk_size
+
+    def _units_per_chunk(self, rows_per_unit: int) -> int:
+        return max(1, self._chunk_size // max(1, rows_per_unit))
+
+    def create_catalog_chunk(self, amount: int) -> int:
+        """
+        Create `amount` categories with their products and return the number of rows.
+        """
+        categories = self.create_categories(amount=amount)
+        products = self.create_products(
+            categories=categories, amount=self._settings.products_per_category_count
+        )
+        return len(categories) + len(products)
+
+    def create_customers_chunk(self, amount: int, products: list[Product]) -> int:
+        """
+        Create `amount` customers with their carts and cart items
+        and return the number of rows.
+        """
+        User = get_user_model()
+        for attempt in range(1, CUSTOMERS_RETRIES + 1):
+            customers = self._baker.make_customers(User, amount)
+            try:
+                with transaction.atomic():
+                    if self._settings.use_copy:
+                        bulk_load(User, [customer.user for customer in customers])
+                        bulk_load(Customer, customers)
+                    else:
+                        User.objects.bulk_create(
+                            [customer.user for customer in customers],
+                            batch_size=self._settings.batch_size,
+                        )
+                        Customer.objects.bulk_create(
+                            customers, batch_size=self._settings.batch_size
+                        )
+                break
+            except IntegrityError:
+                if attempt == CUSTOMERS_RETRIES:
+                    raise
+                logger.warning(
+                    "[{}] Usernames already taken, generating the chunk again", self._run
+                )
+
+        last_item_pk = CartItem.objects.last_pk()
+        carts, items = self.create_carts_and_items(customers=customers, products=products)
+        # In the transaction of the chunk, so that resumed runs have it too
+        CartItem.objects.filter(pk__gt=last_item_pk).sync_purchased_at()
+        # Every customer has a user
+        return 2 * len(customers) + carts + items
+
+    def run_stage(
+        self, stage: str, total: int, units_per_chunk: int, create: Callable[[int], int]
+    ) -> Iterator[Progress]:
+        """
+        Create the units of the stage left after its checkpoint, a chunk at a time,
+        and yield the progress after every chunk.
+        """
+        checkpoint = PopulateCheckpoint.objects.filter(run=self._run, stage=stage).first()
+        done = checkpoint.done if checkpoint else 0
+        rows = checkpoint.rows if checkpoint else 0
+        seconds = checkpoint.seconds if checkpoint else 0.0
+        if done:
+            logger.info("[{}] Resuming {} after {}/{}", self._run, stage, done, total)
+
+        while done < total:
+            amount = min(units_per_chunk, total - done)
+            _start = time.perf_counter()
+            with transaction.atomic():
+                created = create(amount)
+                elapsed = time.perf_counter() - _start
+                PopulateCheckpoint.objects.advance(
+                    run=self._run,
+                    stage=stage,
+                    total=total,
+                    done=amount,
+                    rows=created,
+                    seconds=elapsed,
+                )
+            done, rows, seconds = done + amount, rows + created, seconds + elapsed
+
+            progress = Progress(
+                run=self._run, stage=stage, done=done, total=total, rows=rows, seconds=seconds
+            )
+            logger.info(
+                "[{}] {}: {}/{}, {} rows at {:.0f}/s (this chunk {:.0f}/s), {:.0f}s left",
+                self._run,
+                stage,
+                done,
+                total,
+                rows,
+                progress.rows_per_second,
+                created / elapsed if elapsed else 0.0,
+                progress.eta,
+            )
+            yield progress
+
+    def populate(self) -> Iterator[Progress]:
+        settings = self._settings
+        yield from self.run_stage(
+            "catalog",
+            total=settings.categories_count,
+            units_per_chunk=self._units_per_chunk(settings.products_per_category_count),
+            create=self.create_catalog_chunk,
+        )
+
+        products = list(Product.objects.only("pk"))
+        yield from self.run_stage(
+            "customers",
+            total=settings.customers_count,
+            units_per_chunk=self._units_per_chunk(
+                settings.carts_per_customer_count * settings.cart_items_per_cart_count
+            ),
+            create=lambda amount: self.create_customers_chunk(amount, products=products),
+        )
+
+
+@timeit
+def populate_chunks(
+    settings: Settings | None = None,
+    run: str = "default",
+    chunk_size: int = 10_000,
+    restart: bool = False,
+) -> list[PopulateCheckpoint]:
+    """
+    Create the admin user, categories, products, customers, carts and cart items
+    in chunks of about `chunk_size` rows, with bounded memory.
+
+    Progress is saved per chunk under the name `run`: calling the function again
+    after a crash resumes the run, unless `restart` is set.
+    """
+    settings = settings or Settings()
+
+    # The admin already exists when resuming a run
+    with suppress(Exception), transaction.atomic():
+        create_admin()
+
+    if restart:
+        PopulateCheckpoint.objects.filter(run=run).delete()
+
+    for _ in ChunkPopulator(settings=settings, run=run, chunk_size=chunk_size).populate():
+        pass
+
+    # Carts are bulk created as already purchased, so the rollup is set once at the end
+    ProductMonthlySales.objects.rebuild(Cart.objects.monthly_sales())
+    return list(PopulateCheckpoint.objects.filter(run=run).order_by("pk"))
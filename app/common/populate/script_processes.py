@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass, field, replace
+
+import django
+from django import db
+from loguru import logger
+
+from app.common.populate.report import TABLES, TableStats
+from app.common.populate.script_threads import Populator
+from app.common.populate.settings import Settings
+from app.common.utils import create_admin, create_faker, timeit
+from app.customers.models import Cart, CartItem
+from app.products.models import ProductMonthlySales
+
+
+@dataclass
+class WorkerReport:
+    worker: int
+    seed: int
+    pid: int = field(default_factory=os.getpid)
+    tables: dict[str, TableStats] = field(default_factory=dict)
+
+
+class ProcessPopulator(Populator):
+    """
+    Populates one shard of the data in a worker process.
+
+    Faker, the `random` module and the NumPy generator are seeded with `seed`,
+    so a worker always generates the same data for the same settings.
+    """
+
+    def __init__(self, settings: Settings, worker: int, seed: int) -> None:
+        faker = create_faker()
+        faker.seed_instance(seed)
+        random.seed(seed)
+        super().__init__(settings=settings, faker=faker, seed=seed)
+        self._report = WorkerReport(worker=worker, seed=seed)
+
+    @property
+    def label(self) -> str:
+        return f"Worker #{self._report.worker}"
+
+    def populate(self) -> WorkerReport:
+        self._report.tables = self.create_all()
+        return self._report
+
+
+def _shard(total: int, shards: int, index: int) -> int:
+    """
+    Return the part of `total` the shard `index` out of `shards` is responsible for.
+    """
+    return total // shards + (index < total % shards)
+
+
+def run_populator(settings: Settings, worker: int, seed: int) -> WorkerReport:
+    try:
+        return ProcessPopulator(settings=settings, worker=worker, seed=seed).populate()
+    finally:
+        db.connections.close_all()
+
+
+def log_summary(reports: list[WorkerReport]) -> None:
+    """
+    Log the rows per second of every worker and of all of them, per table.
+    """
+    for report in sorted(reports, key=lambda report: report.worker):
+        logger.info(
+            "Worker #{} (pid {}, seed {}): {}",
+            report.worker,
+            report.pid,
+            report.seed,
+            ", ".join(
+                f"{table} {stats.rows} rows at {stats.rows_per_second:.0f}/s"
+                for table, stats in report.tables.items()
+            ),
+        )
+    for table in TABLES:
+        stats = [report.tables[table] for report in reports if table in report.tables]
+        logger.info(
+            "All workers, {}: {} rows at {:.0f}/s",
+            table,
+            sum(table_stats.rows for table_stats in stats),
+            # Workers run in parallel, so their throughputs add up
+            sum(table_stats.rows_per_second for table_stats in stats),
+        )
+
+
+@timeit
+def populate_processes(
+    settings: Settings | None = None,
+    processes_count: int | None = None,
+    seed: int = 0,
+) -> list[WorkerReport]:
+    """
+    Create the admin user, categories, products, customers, carts and cart items,
+    generating the data in parallel processes.
+
+    Categories and customers are split between `processes_count` workers
+    (the number of CPUs by default); every worker has its own database
+    connection and uses the seed `seed + worker`.
+    """
+    settings = settings or Settings()
+    processes_count = processes_count or os.cpu_count() or 1
+
+    with suppress(Exception):
+        create_admin()
+    last_item_pk = CartItem.objects.last_pk()
+    # Workers must not share the connections of this process
+    db.connections.close_all()
+
+    with ProcessPoolExecutor(
+        max_workers=processes_count,
+        mp_context=multiprocessing.get_context("spawn"),
+        # Spawned workers start from scratch and must load Django before the models
+        initializer=django.setup,
+    ) as executor:
+        futures = [
+            executor.submit(
+                run_populator,
+                replace(
+                    settings,
+                    categories_count=_shard(settings.categories_count, processes_count, worker),
+                    customers_count=_shard(settings.customers_count, processes_count, worker),
+                ),
+                worker,
+                seed + worker,
+            )
+            for worker in range(processes_count)
+        ]
+        reports = [future.result() for future in futures]
+    log_summary(reports)
+
+    # Carts are bulk created as already purchased, so the purchase times of the items
+    # of the run and the rollup are set once at the end
+    CartItem.objects.filter(pk__gt=last_item_pk).sync_purchased_at()
+    ProductMonthlySales.objects.rebuild(Cart.objects.monthly_sales())
+    return reports
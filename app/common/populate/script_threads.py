@@ -1,26 +1,37 @@
 import datetime as dt
 import threading
 import time
+from collections.abc import Callable
 from contextlib import suppress
+from dataclasses import replace
+from typing import TypeVar
 
+import numpy as np
 from django import db
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from faker import Faker
 from loguru import logger
 
-from app.common.populate.settings import Settings
+from app.common.db import bulk_load, copy_rows, reserve_pks, supports_copy
+from app.common.populate.report import merge_stats, TableStats
+from app.common.populate.settings import CART_FIELDS, CART_ITEM_FIELDS, Settings
 from app.common.utils import (
+    ArrayBakery,
     create_admin,
     create_faker,
     get_last_day_of_month,
     get_month_ago,
     timeit,
 )
+from app.common.utils.array_bakery import IntArray
 from app.common.utils.bakery import MultiBakery
 from app.customers.models import Cart, CartItem, Customer
-from app.products.models import Category, Product
+from app.products.models import Category, Product, ProductMonthlySales
+
+R = TypeVar("R")
 
 
 class Populator:
@@ -28,17 +39,26 @@ class Populator:
         self,
         settings: Settings,
         faker: Faker | None = None,
+        seed: int | None = None,
     ) -> None:
         self.fake = faker or create_faker()
         self._settings = settings
-        self._baker = MultiBakery(faker=self.fake)
+        self._baker = MultiBakery(faker=self.fake, password_pool_size=settings.password_pool_size)
+        self._array_baker = ArrayBakery(
+            seed=seed,
+            zipf_exponent=settings.zipf_exponent,
+            seasonality=settings.seasonality,
+        )
+        # Rows created and time spent per table by `populate`
+        self.stats: dict[str, TableStats] = {}
 
     def create_categories(self, amount: int) -> list[Category]:
         created = 0
         tries = 0
         categories = []
         while created < amount:
-            with suppress(IntegrityError):
+            # The savepoint keeps an outer transaction usable after a duplicate name
+            with suppress(IntegrityError), transaction.atomic():
                 tries += 1
                 category = self._baker.make_category(use_default_faker=(tries > 100))
                 category.save()
@@ -48,15 +68,24 @@ class Populator:
 
     def create_products(self, categories: list[Category], amount: int) -> list[Product]:
         products = self._baker.make_products(categories=categories, amount=amount)
-        return Product.objects.bulk_create(products)
+        if self._settings.use_copy:
+            return bulk_load(Product, products)
+        return Product.objects.bulk_create(products, batch_size=self._settings.batch_size)
 
     def create_customers(self, amount: int) -> list[Customer]:
         User = get_user_model()
         customers = self._baker.make_customers(User, amount)
 
         try:
-            User.objects.bulk_create([customer.user for customer in customers])
-            return Customer.objects.bulk_create(customers, ignore_conflicts=True)
+            if self._settings.use_copy:
+                bulk_load(User, [customer.user for customer in customers])
+                return bulk_load(Customer, customers, ignore_conflicts=True)
+            User.objects.bulk_create(
+                [customer.user for customer in customers], batch_size=self._settings.batch_size
+            )
+            return Customer.objects.bulk_create(
+                customers, ignore_conflicts=True, batch_size=self._settings.batch_size
+            )
         except IntegrityError:
             if Customer.objects.count() < amount:
                 raise
@@ -73,96 +102,236 @@ class Populator:
         max_date = max_date or get_last_day_of_month(now)
         min_date = min_date or get_month_ago(now)
 
-        return Cart.objects.bulk_create(
-            self._baker.make_carts(
-                customers=customers,
-                carts_per_customer=carts_per_customer,
-                min_date=min_date,
-                max_date=max_date,
-            )
+        carts = self._baker.make_carts(
+            customers=customers,
+            carts_per_customer=carts_per_customer,
+            min_date=min_date,
+            max_date=max_date,
         )
+        if self._settings.use_copy:
+            return bulk_load(Cart, carts)
+        return Cart.objects.bulk_create(carts, batch_size=self._settings.batch_size)
 
     def create_cart_items(
         self,
         carts: list[Cart],
         products: list[Product],
         cart_items_per_cart: int = 10,
-    ) -> None:
+    ) -> int:
+        """
+        Create random items in every cart and return how many were created.
+        """
+        if self._settings.use_copy:
+            rows = self._baker.make_cart_item_rows(
+                carts=carts,
+                products=products,
+                cart_items_per_cart=cart_items_per_cart,
+            )
+            return copy_rows(CartItem, CART_ITEM_FIELDS, rows)
         items = self._baker.make_cart_items(
             carts=carts,
             products=products,
             cart_items_per_cart=cart_items_per_cart,
         )
-        CartItem.objects.bulk_create(items, ignore_conflicts=True)
-
+        return len(
+            CartItem.objects.bulk_create(
+                items, ignore_conflicts=True, batch_size=self._settings.batch_size
+            )
+        )
 
-class ThreadPopulator(Populator):
-    def __init__(
+    def create_cart_columns(
         self,
-        settings: Settings,
-        thread_name: str,
-        faker: Faker | None = None,
-    ) -> None:
-        super().__init__(settings=settings, faker=faker)
-        self._thread_name = thread_name
+        customers: list[Customer],
+        carts_per_customer: int,
+        min_date: dt.datetime | None = None,
+        max_date: dt.datetime | None = None,
+    ) -> IntArray:
+        """
+        Like `create_carts`, but generate the carts with NumPy and return their ids.
+        """
+        now = timezone.now()
+        max_date = max_date or get_last_day_of_month(now)
+        min_date = min_date or get_month_ago(now)
 
-    def populate(self) -> None:
-        logger.info("Thread #{} spawned", self._thread_name)
+        columns = self._array_baker.make_cart_columns(
+            customer_ids=np.array([customer.pk for customer in customers], dtype=np.int64),
+            carts_per_customer=carts_per_customer,
+            min_date=min_date,
+            max_date=max_date,
+        )
+        if not supports_copy():
+            # Without sequences to reserve ids from, the database has to return them
+            carts = Cart.objects.bulk_create(
+                [
+                    Cart(customer_id=customer_id, is_purchased=purchased, purchased_at=at)
+                    for customer_id, purchased, at in zip(
+                        columns.customer_id.tolist(),
+                        columns.is_purchased.tolist(),
+                        columns.purchased_at_datetimes(),
+                    )
+                ],
+                batch_size=self._settings.batch_size,
+            )
+            return np.array([cart.pk for cart in carts], dtype=np.int64)
 
-        _start = time.perf_counter()
+        ids = reserve_pks(Cart, len(columns))
+        copy_rows(Cart, CART_FIELDS, columns.rows(ids, created_at=now))
+        return np.array(ids, dtype=np.int64)
 
-        logger.debug(
-            "Thread {} creating {} categories", self._thread_name, self._settings.categories_count
+    def create_cart_item_columns(
+        self,
+        cart_ids: IntArray,
+        products: list[Product],
+        cart_items_per_cart: int = 10,
+    ) -> int:
+        """
+        Like `create_cart_items`, but generate the items with NumPy
+        and stream them to the database without model instances.
+        """
+        rows = self._array_baker.iter_cart_item_rows(
+            cart_ids=cart_ids,
+            product_ids=np.array([product.pk for product in products], dtype=np.int64),
+            cart_items_per_cart=cart_items_per_cart,
         )
-        categories = self.create_categories(amount=self._settings.categories_count)
+        return copy_rows(CartItem, CART_ITEM_FIELDS, rows)
 
+    @property
+    def label(self) -> str:
+        return type(self).__name__
+
+    def _timed(self, table: str, create: Callable[[], R], rows: Callable[[R], int]) -> R:
+        _start = time.perf_counter()
+        result = create()
+        self.stats[table] = TableStats(rows=rows(result), seconds=time.perf_counter() - _start)
         logger.debug(
-            "Thread #{} creating {} products",
-            self._thread_name,
-            self._settings.products_per_category_count,
+            "{} created {} {} in {:.2f} seconds",
+            self.label,
+            self.stats[table].rows,
+            table,
+            self.stats[table].seconds,
         )
-        products = self.create_products(
-            categories=categories,
-            amount=self._settings.products_per_category_count,
+        return result
+
+    def create_all(self) -> dict[str, TableStats]:
+        """
+        Create all the tables and return the rows created and the time it took per table.
+        """
+        settings = self._settings
+        categories = self._timed(
+            "categories", lambda: self.create_categories(amount=settings.categories_count), len
         )
-
-        logger.debug(
-            "Thread #{} creating {} customers", self._thread_name, self._settings.customers_count
+        products = self._timed(
+            "products",
+            lambda: self.create_products(
+                categories=categories, amount=settings.products_per_category_count
+            ),
+            len,
         )
-        customers = self.create_customers(amount=self._settings.customers_count)
-
-        logger.debug(
-            "Thread #{} creating {} carts",
-            self._thread_name,
-            self._settings.carts_per_customer_count * self._settings.customers_count,
+        customers = self._timed(
+            "customers", lambda: self.create_customers(amount=settings.customers_count), len
         )
-        carts = self.create_carts(
-            customers=customers,
-            carts_per_customer=self._settings.carts_per_customer_count,
+        if settings.generator == "numpy":
+            cart_ids = self._timed(
+                "carts",
+                lambda: self.create_cart_columns(
+                    customers=customers, carts_per_customer=settings.carts_per_customer_count
+                ),
+                len,
+            )
+            self._timed(
+                "cart_items",
+                lambda: self.create_cart_item_columns(
+                    cart_ids=cart_ids,
+                    products=products,
+                    cart_items_per_cart=settings.cart_items_per_cart_count,
+                ),
+                int,
+            )
+            return self.stats
+
+        carts = self._timed(
+            "carts",
+            lambda: self.create_carts(
+                customers=customers, carts_per_customer=settings.carts_per_customer_count
+            ),
+            len,
+        )
+        self._timed(
+            "cart_items",
+            lambda: self.create_cart_items(
+                carts=carts,
+                products=products,
+                cart_items_per_cart=settings.cart_items_per_cart_count,
+            ),
+            int,
         )
+        return self.stats
 
-        logger.debug(
-            "Thread #{} creating {} cart items",
-            self._thread_name,
-            self._settings.cart_items_per_cart_count * self._settings.carts_per_customer_count,
+    def create_carts_and_items(
+        self,
+        customers: list[Customer],
+        products: list[Product],
+    ) -> tuple[int, int]:
+        """
+        Create the carts of the customers and their items with the configured
+        generator and return how many carts and items were created.
+        """
+        settings = self._settings
+        if settings.generator == "numpy":
+            cart_ids = self.create_cart_columns(
+                customers=customers, carts_per_customer=settings.carts_per_customer_count
+            )
+            return len(cart_ids), self.create_cart_item_columns(
+                cart_ids=cart_ids,
+                products=products,
+                cart_items_per_cart=settings.cart_items_per_cart_count,
+            )
+        carts = self.create_carts(
+            customers=customers, carts_per_customer=settings.carts_per_customer_count
         )
-        self.create_cart_items(
+        return len(carts), self.create_cart_items(
             carts=carts,
             products=products,
-            cart_items_per_cart=self._settings.cart_items_per_cart_count,
+            cart_items_per_cart=settings.cart_items_per_cart_count,
         )
 
-        logger.info(
-            "Thread #{} finished in {:.2f} seconds", self._thread_name, time.perf_counter() - _start
-        )
+
+class ThreadPopulator(Populator):
+    def __init__(
+        self,
+        settings: Settings,
+        thread_name: str,
+        faker: Faker | None = None,
+    ) -> None:
+        super().__init__(settings=settings, faker=faker)
+        self._thread_name = thread_name
+
+    @property
+    def label(self) -> str:
+        return f"Thread #{self._thread_name}"
+
+    def populate(self) -> dict[str, TableStats]:
+        logger.info("{} spawned", self.label)
+        _start = time.perf_counter()
+        stats = self.create_all()
+        logger.info("{} finished in {:.2f} seconds", self.label, time.perf_counter() - _start)
+        return stats
 
 
-def run_populator(settings: Settings, thread_name: str) -> None:
+def run_populator(
+    populator: type[ThreadPopulator],
+    settings: Settings,
+    thread_name: str,
+    results: list[dict[str, TableStats]],
+) -> None:
     try:
-        ThreadPopulator(settings=settings, thread_name=thread_name).populate()
+        results.append(populator(settings=settings, thread_name=thread_name).populate())
     except Exception as exc:
         logger.error("Thread #{} failed with exception", thread_name)
         logger.exception(exc)
+    finally:
+        # Give the connection of the thread back, to the pool if there is one
+        db.connection.close()
 
 
 class ThreadsPopulator:
@@ -176,7 +345,7 @@ class ThreadsPopulator:
         self._settings = settings
         self._threads_count = threads_count
 
-    def populate(self) -> None:
+    def populate(self) -> dict[str, TableStats]:
         categories_per_thread = self._settings.categories_count // self._threads_count
         products_per_category_per_thread = (
             self._settings.products_per_category_count // self._threads_count
@@ -184,26 +353,33 @@ class ThreadsPopulator:
         customers_per_thread = self._settings.customers_count // self._threads_count
 
         threads: list[threading.Thread] = []
-        settings = Settings(
+        results: list[dict[str, TableStats]] = []
+        settings = replace(
+            self._settings,
             categories_count=categories_per_thread,
             products_per_category_count=products_per_category_per_thread,
             customers_count=customers_per_thread,
-            carts_per_customer_count=self._settings.carts_per_customer_count,
-            cart_items_per_cart_count=self._settings.cart_items_per_cart_count,
         )
         for thread_name in range(self._threads_count):
-            thread = threading.Thread(target=run_populator, args=(settings, thread_name))
+            thread = threading.Thread(
+                target=run_populator,
+                args=(self._populator, settings, str(thread_name), results),
+            )
             thread.start()
             threads.append(thread)
 
         for thread in threads:
             thread.join()
+        return merge_stats(results)
 
 
 @timeit
-def populate_threads(settings: Settings | None = None, threads_count: int = 4) -> None:
+def populate_threads(
+    settings: Settings | None = None, threads_count: int = 4
+) -> dict[str, TableStats]:
     """
     Create the admin user, categories, products, customers, carts and cart items
+    and return the rows created per table by all the threads.
     """
 
     settings = settings or Settings()
@@ -213,8 +389,15 @@ def populate_threads(settings: Settings | None = None, threads_count: int = 4) -
     with suppress(Exception):
         create_admin()
 
-    ThreadsPopulator(
+    last_item_pk = CartItem.objects.last_pk()
+    stats = ThreadsPopulator(
         populator=ThreadPopulator,
         settings=settings,
         threads_count=threads_count,
     ).populate()
+
+    # Carts are bulk created as already purchased, so the purchase times of the items
+    # of the run and the rollup are set once at the end
+    CartItem.objects.filter(pk__gt=last_item_pk).sync_purchased_at()
+    ProductMonthlySales.objects.rebuild(Cart.objects.monthly_sales())
+    return stats
@@ -1,4 +1,12 @@
-from dataclasses import dataclass
+import argparse
+import types
+from dataclasses import dataclass, fields
+from typing import Any, get_args, get_origin, get_type_hints, Literal
+
+# Columns of the cart rows streamed with COPY, see Populator.create_cart_columns
+CART_FIELDS = ("id", "customer_id", "is_purchased", "purchased_at", "created_at", "updated_at")
+# Columns of the cart item rows streamed with COPY, see MultiBakery.make_cart_item_rows
+CART_ITEM_FIELDS = ("cart_id", "product_id", "quantity")
 
 
 @dataclass(frozen=True)
@@ -12,3 +20,45 @@ class Settings:
     customers_count: int = 100
     carts_per_customer_count: int = 5
     cart_items_per_cart_count: int = 10
+    # Load rows with COPY on PostgreSQL instead of bulk_create
+    use_copy: bool = False
+    # Rows per INSERT statement of bulk_create, all of them in one by default
+    batch_size: int | None = None
+    # Hash only that many passwords and share them between users, 0 to hash all of them
+    password_pool_size: int = 0
+    # Generate carts and cart items row by row with Faker, or by columns with NumPy
+    generator: Literal["faker", "numpy"] = "faker"
+    # NumPy generator only, see ArrayBakery
+    zipf_exponent: float = 0.0
+    seasonality: float = 0.0
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add an option per field of `Settings` to the parser of a management command.
+    """
+    group = parser.add_argument_group("settings", "Fields of app.common.populate.Settings")
+    hints = get_type_hints(Settings)
+    for settings_field in fields(Settings):
+        hint = hints[settings_field.name]
+        flag = f"--{settings_field.name.replace('_', '-')}"
+        kwargs: dict[str, Any] = {"default": settings_field.default}
+        if isinstance(hint, types.UnionType):
+            # Optional values, None is their default
+            (hint,) = set(get_args(hint)) - {types.NoneType}
+        if hint is bool:
+            kwargs["action"] = argparse.BooleanOptionalAction
+        elif get_origin(hint) is Literal:
+            kwargs["choices"] = get_args(hint)
+        else:
+            kwargs["type"] = hint
+        group.add_argument(flag, **kwargs)
+
+
+def settings_from_options(options: dict[str, Any]) -> Settings:
+    """
+    Build `Settings` from the options added by `add_settings_arguments`.
+    """
+    return Settings(
+        **{settings_field.name: options[settings_field.name] for settings_field in fields(Settings)}
+    )
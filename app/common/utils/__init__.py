@@ -1,3 +1,4 @@
+from .array_bakery import ArrayBakery
 from .bakery import MultiBakery, SingleBakery
 from .utils import (
     create_admin,
@@ -6,17 +7,20 @@ from .utils import (
     get_month_ago,
     get_month_name,
     P,
+    percentile,
     T,
     timeit,
 )
 
 __all__ = [
+    "ArrayBakery",
     "create_admin",
     "create_faker",
     "get_last_day_of_month",
     "get_month_ago",
     "get_month_name",
     "P",
+    "percentile",
     "T",
     "timeit",
     "MultiBakery",
@@ -0,0 +1,177 @@
+import datetime as dt
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from itertools import chain, repeat
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+IntArray = npt.NDArray[np.int64]
+
+_DAY_SECONDS = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class CartColumns:
+    customer_id: IntArray
+    is_purchased: npt.NDArray[np.bool_]
+    # Seconds since the epoch, only meaningful where `is_purchased`
+    purchased_at: IntArray
+
+    def __len__(self) -> int:
+        return len(self.customer_id)
+
+    def purchased_at_datetimes(self) -> list[dt.datetime | None]:
+        return [
+            dt.datetime.fromtimestamp(timestamp, tz=dt.timezone.utc) if purchased else None
+            for timestamp, purchased in zip(self.purchased_at.tolist(), self.is_purchased.tolist())
+        ]
+
+    def rows(self, ids: Sequence[int], created_at: dt.datetime) -> Iterator[tuple[Any, ...]]:
+        """
+        Yield `(id, customer_id, is_purchased, purchased_at, created_at, updated_at)` rows.
+        """
+        return zip(
+            ids,
+            self.customer_id.tolist(),
+            self.is_purchased.tolist(),
+            self.purchased_at_datetimes(),
+            repeat(created_at),
+            repeat(created_at),
+        )
+
+
+@dataclass(frozen=True)
+class CartItemColumns:
+    cart_id: IntArray
+    product_id: IntArray
+    quantity: IntArray
+
+    def __len__(self) -> int:
+        return len(self.cart_id)
+
+    def rows(self) -> Iterator[tuple[int, int, int]]:
+        # `tolist()` converts to Python ints in C, which database drivers can adapt
+        return zip(self.cart_id.tolist(), self.product_id.tolist(), self.quantity.tolist())
+
+
+class ArrayBakery:
+    """
+    Generates carts and cart items a whole column at a time with NumPy,
+    as an alternative to building model instances row by row with `MultiBakery`.
+
+    Follows the same distributions as `MultiBakery` (1 to n + 1 carts per customer
+    and items per cart, 1 in 5 carts not purchased, 1 to 10 items of a product),
+    except for:
+
+    - product popularity: every product is equally likely with `zipf_exponent=0`,
+      otherwise the k-th most popular product is picked with a probability
+      proportional to `1 / k ** zipf_exponent`;
+    - purchase dates: uniform with `seasonality=0`, otherwise the density follows
+      a yearly cosine peaking on `peak_day` (day of the year), `seasonality`
+      being its relative amplitude, between 0 and 1.
+    """
+
+    def __init__(
+        self,
+        seed: int | None = None,
+        zipf_exponent: float = 0.0,
+        seasonality: float = 0.0,
+        peak_day: int = 350,
+    ) -> None:
+        if not 0 <= seasonality <= 1:
+            raise ValueError("seasonality must be between 0 and 1")
+        self.rng = np.random.default_rng(seed)
+        self.zipf_exponent = zipf_exponent
+        self.seasonality = seasonality
+        self.peak_day = peak_day
+
+    def product_weights(self, count: int) -> npt.NDArray[np.float64]:
+        """
+        Return the probability of picking each of `count` products.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        if not self.zipf_exponent:
+            return np.full(count, 1 / count)
+        weights: npt.NDArray[np.float64] = 1 / np.arange(1, count + 1) ** self.zipf_exponent
+        # Popularity must not follow the order of the ids
+        self.rng.shuffle(weights)
+        weights /= weights.sum()
+        return weights
+
+    def purchase_times(self, size: int, min_date: dt.datetime, max_date: dt.datetime) -> IntArray:
+        """
+        Draw `size` purchase times between the dates, as seconds since the epoch.
+
+        Both dates are included, so they may be equal.
+        """
+        start, end = int(min_date.timestamp()), int(max_date.timestamp())
+        if end < start:
+            raise ValueError(f"max_date {max_date} is before min_date {min_date}")
+        if not self.seasonality:
+            return self.rng.integers(start, end + 1, size=size)
+
+        # Pick a day with the seasonal weights, then a uniform time of that day;
+        # the last day may be cut short by `max_date`, and weighs less
+        days = np.arange(start, end + 1, _DAY_SECONDS)
+        lengths = np.minimum(_DAY_SECONDS, end + 1 - days)
+        day_of_year = (days // _DAY_SECONDS) % 365.25
+        weights = 1 + self.seasonality * np.cos(2 * np.pi * (day_of_year - self.peak_day) / 365.25)
+        weights *= lengths
+        picked = self.rng.choice(len(days), size=size, p=weights / weights.sum())
+        return days[picked] + self.rng.integers(0, lengths[picked])
+
+    def make_cart_columns(
+        self,
+        customer_ids: IntArray,
+        carts_per_customer: int,
+        min_date: dt.datetime,
+        max_date: dt.datetime,
+    ) -> CartColumns:
+        counts = self.rng.integers(1, carts_per_customer + 2, size=len(customer_ids))
+        size = int(counts.sum())
+        return CartColumns(
+            customer_id=np.repeat(customer_ids, counts),
+            is_purchased=self.rng.random(size) > 0.2,
+            purchased_at=self.purchase_times(size, min_date, max_date),
+        )
+
+    def make_cart_item_columns(
+        self,
+        cart_ids: IntArray,
+        product_ids: IntArray,
+        cart_items_per_cart: int = 10,
+    ) -> CartItemColumns:
+        if not len(product_ids):
+            raise ValueError("Cart items need at least one product")
+        counts = self.rng.integers(1, cart_items_per_cart + 2, size=len(cart_ids))
+        size = int(counts.sum())
+        return CartItemColumns(
+            cart_id=np.repeat(cart_ids, counts),
+            product_id=self.rng.choice(
+                product_ids, size=size, p=self.product_weights(len(product_ids))
+            ),
+            quantity=self.rng.integers(1, 11, size=size),
+        )
+
+    def iter_cart_item_rows(
+        self,
+        cart_ids: IntArray,
+        product_ids: IntArray,
+        cart_items_per_cart: int = 10,
+        chunk_size: int = 10_000,
+    ) -> Iterator[tuple[int, int, int]]:
+        """
+        Yield `(cart_id, product_id, quantity)` rows, generated `chunk_size` carts at a time.
+        """
+        chunks = np.array_split(cart_ids, range(chunk_size, len(cart_ids), chunk_size))
+        return chain.from_iterable(
+            self.make_cart_item_columns(
+                cart_ids=chunk,
+                product_ids=product_ids,
+                cart_items_per_cart=cart_items_per_cart,
+            ).rows()
+            for chunk in chunks
+        )
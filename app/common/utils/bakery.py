@@ -1,5 +1,7 @@
 import datetime as dt
 import random
+import secrets
+from collections.abc import Iterator
 
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
@@ -10,8 +12,27 @@ from app.products.models import Category, Product
 
 
 class SingleBakery:
-    def __init__(self, faker: Faker) -> None:
+    """
+    Makes unsaved model instances with random data.
+
+    Hashing a password with the default hasher takes tens of milliseconds by design,
+    which makes users the slowest objects to make. With `password_pool_size`,
+    only that many passwords are hashed and users pick one of the hashes at random,
+    so generated users share passwords (and salts) and must never be real accounts.
+    """
+
+    def __init__(self, faker: Faker, password_pool_size: int = 0) -> None:
         self.fake = faker
+        self.password_pool_size = password_pool_size
+        self._password_hashes: list[str] = []
+
+    def make_password_hash(self) -> str:
+        if not self.password_pool_size:
+            return make_password(self.fake.password())
+        if len(self._password_hashes) < self.password_pool_size:
+            self._password_hashes.append(make_password(self.fake.password()))
+            return self._password_hashes[-1]
+        return random.choice(self._password_hashes)
 
     def make_category(self, use_default_faker: bool = False) -> Category:
         if use_default_faker:
@@ -30,9 +51,11 @@ class SingleBakery:
 
     def make_user(self, user_model: type[User]) -> User:
         return user_model(
-            username=self.fake.user_name(),
+            # Faker soon repeats user names, a random suffix keeps them unique
+            # across the workers and runs of a populate
+            username=f"{self.fake.user_name()}_{secrets.token_hex(6)}",
             email=self.fake.email(),
-            password=make_password(self.fake.password()),
+            password=self.make_password_hash(),
             is_active=True,
         )
 
@@ -70,12 +93,6 @@ class SingleBakery:
 
 
 class MultiBakery(SingleBakery):
-    def __init__(
-        self,
-        faker: Faker,
-    ) -> None:
-        self.fake = faker
-
     def make_products(self, categories: list[Category], amount: int) -> list[Product]:
         return [
             self.make_product(category=category)
@@ -114,3 +131,17 @@ class MultiBakery(SingleBakery):
                 for _ in range(random.randint(1, cart_items_per_cart + 1))
             ]
         return cart_items
+
+    def make_cart_item_rows(
+        self,
+        carts: list[Cart],
+        products: list[Product],
+        cart_items_per_cart: int = 10,
+    ) -> Iterator[tuple[int, int, int]]:
+        """
+        Like `make_cart_items`, but lazily yield `(cart_id, product_id, quantity)` rows.
+        """
+        product_ids = [product.pk for product in products]
+        for cart in carts:
+            for _ in range(random.randint(1, cart_items_per_cart + 1)):
+                yield cart.pk, random.choice(product_ids), random.randint(1, 10)
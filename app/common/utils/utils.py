@@ -1,8 +1,9 @@
 import calendar
 import datetime as dt
+import math
 import os
 import time
-from typing import Callable, ParamSpec, TypeVar
+from typing import Callable, ParamSpec, Sequence, TypeVar
 
 import faker_commerce
 from django.contrib.auth import get_user_model
@@ -62,3 +63,14 @@ def create_admin() -> None:
         os.environ.get("DJANGO_SUPERUSER_EMAIL", "admin@mail.com"),
         os.environ.get("DJANGO_SUPERUSER_PASSWORD", "admin"),
     )
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """
+    Return the nearest-rank `q`-th percentile of the samples.
+    """
+    if not samples:
+        raise ValueError("Can not take a percentile of no samples")
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
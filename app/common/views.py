@@ -1,7 +1,36 @@
-from django.http import HttpRequest, HttpResponse
+import functools
+from typing import Any, Awaitable, Callable, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
+from django.http.response import HttpResponseBase
 from django.shortcuts import render
 from django.urls import Resolver404
 from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.common.metrics import render_metrics
+
+R = TypeVar("R", bound=HttpResponseBase)
+
+
+def alogin_required(
+    view: Callable[..., Awaitable[R]]
+) -> Callable[..., Awaitable[R | HttpResponseRedirect]]:
+    """
+    `login_required` for async views, which Django 4.2 does not support:
+    loading the user from the session is a blocking query.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> R | HttpResponseRedirect:
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
 
 
 def _log_request(request: HttpRequest, status_code: int) -> None:
@@ -21,3 +50,10 @@ def handler404(
 def handler500(request: HttpRequest) -> HttpResponse:
     _log_request(request, 500)
     return render(request, "errors/50x.html")
+
+
+def metrics(request: HttpRequest) -> HttpResponse:  # noqa: U100
+    """
+    Serve the Prometheus metrics of all the workers.
+    """
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,33 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Max, Min
+
+from app.customers.models import CartItem
+
+
+class Command(BaseCommand):
+    help = "Copy the purchase time of the carts to their items"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Items updated per statement, each in a transaction of its own",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        _start = time.perf_counter()
+        bounds = CartItem.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        updated = 0
+        if bounds["first"] is not None:
+            batch_size = options["batch_size"]
+            for start in range(bounds["first"], bounds["last"] + 1, batch_size):
+                batch = CartItem.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                updated += batch.sync_purchased_at()
+        elapsed = time.perf_counter() - _start
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated {updated} cart items in {elapsed:.2f} seconds")
+        )
@@ -0,0 +1,69 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.utils import timezone
+
+from app.customers import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Partition the cart items by purchase month (PostgreSQL only): "
+        "create the partitions of the next months and detach the old ones"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Turn the plain table into a partitioned one first, locking it meanwhile",
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            metavar="MONTHS",
+            help="Create the partitions of the current month and MONTHS more",
+        )
+        parser.add_argument(
+            "--retain",
+            type=int,
+            metavar="MONTHS",
+            help="Detach the partitions older than the last MONTHS, the current one included",
+        )
+        parser.add_argument(
+            "--archive-schema",
+            default="archive",
+            help="Schema the detached partitions are moved to",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop the detached partitions instead of archiving them",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning is only supported on PostgreSQL")
+        if options["retain"] is not None and options["retain"] < 2:
+            raise CommandError("--retain must keep at least the two months of the sales page")
+
+        today = timezone.now().date()
+        with connection.cursor() as cursor:
+            partitioned = partitions.is_partitioned(cursor)
+        if not partitioned:
+            if not options["convert"]:
+                raise CommandError(f"{partitions.TABLE} is not partitioned, run with --convert")
+            copied = partitions.convert(ahead=options["ahead"], today=today)
+            self.stdout.write(self.style.SUCCESS(f"Partitioned {partitions.TABLE}: {copied} rows"))
+
+        for name in partitions.ensure_partitions(ahead=options["ahead"], today=today):
+            self.stdout.write(self.style.SUCCESS(f"Created {name}"))
+
+        if options["retain"] is not None:
+            archive_schema = None if options["drop"] else options["archive_schema"]
+            detached = partitions.detach_partitions(options["retain"], today, archive_schema)
+            for name in detached:
+                where = f"archived to {archive_schema}" if archive_schema else "dropped"
+                self.stdout.write(self.style.WARNING(f"Detached {name}, {where}"))
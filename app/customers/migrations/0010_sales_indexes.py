@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("customers", "0009_alter_cart_customer"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="cartitem",
+            name="cartitem_cart_idx",
+        ),
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(
+                condition=models.Q(("is_purchased", True)),
+                fields=["purchased_at"],
+                name="cart_purchased_at_paid_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(
+                fields=["cart"], include=("product", "quantity"), name="cartitem_cart_covering_idx"
+            ),
+        ),
+    ]
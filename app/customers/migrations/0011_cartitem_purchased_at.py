@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("customers", "0010_sales_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitem",
+            name="purchased_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(
+                condition=models.Q(("purchased_at__isnull", False)),
+                fields=["purchased_at"],
+                include=("product", "quantity"),
+                name="cartitem_purchased_at_idx",
+            ),
+        ),
+    ]
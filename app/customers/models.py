@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any, final
+from collections.abc import Iterable
+from typing import Any, cast, final
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
 from django_stubs_ext.db.models import TypedModelMeta
 
 from app.common.models import TimeStampMixin
+from app.products.models import MonthlySales, ProductMonthlySales
 
 
 @final
@@ -27,12 +31,116 @@ class Customer(TimeStampMixin):
         verbose_name_plural = "Customers"
 
 
+class CartItemQuerySet(models.QuerySet["CartItem"]):
+    def monthly_sales(self) -> Iterable[MonthlySales]:
+        """
+        Return the quantity sold per product and purchase month for the purchased items.
+        """
+        sales = (
+            self.filter(purchased_at__isnull=False)
+            .values(
+                "product_id",
+                year=ExtractYear("purchased_at"),
+                month=ExtractMonth("purchased_at"),
+            )
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "year", "month", "total")
+            .order_by()
+        )
+        return cast(Iterable[MonthlySales], sales)
+
+    def delete(self) -> tuple[int, dict[str, int]]:
+        """
+        Delete the items and take the purchased ones out of the `ProductMonthlySales` rollup.
+        """
+        with transaction.atomic():
+            ProductMonthlySales.objects.remove(self.monthly_sales())
+            return super().delete()
+
+    def last_pk(self) -> int:
+        """
+        Return the largest primary key, `0` without items.
+
+        Items inserted afterwards have larger keys, so `filter(pk__gt=last_pk)`
+        selects them from the primary key index.
+        """
+        last: int | None = self.aggregate(last=models.Max("pk"))["last"]
+        return last or 0
+
+    def sync_purchased_at(self) -> int:
+        """
+        Copy the purchase time of their carts to the items, `None` for the unpurchased ones.
+
+        Returns the number of updated items.
+        """
+        return self.update(
+            purchased_at=Subquery(
+                Cart.objects.filter(pk=OuterRef("cart_id"), is_purchased=True).values(
+                    "purchased_at"
+                )[:1]
+            )
+        )
+
+
 @final
 class CartItem(models.Model):
+    objects = CartItemQuerySet.as_manager()
+
     cart = models.ForeignKey("Cart", on_delete=models.CASCADE, related_name="cart_items")
     product = models.ForeignKey("products.Product", on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    # `Cart.purchased_at` of purchased carts, so that sales are summed without joining the carts.
+    # Kept in sync by `Cart.save` and `CartQuerySet.purchase`; bulk inserts of items
+    # are followed by `sync_purchased_at` of the new ones (`pk__gt=last_pk()`),
+    # see the populate scripts and the `backfill_purchased_at` command.
+    purchased_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Take the purchase time of the cart and, once it is purchased,
+        apply the change of the item to the `ProductMonthlySales` rollup.
+
+        A new item costs no extra query when its cart is already loaded;
+        the previous row of an existing one is loaded with its cart, in one query.
+        Bulk inserts skip all of this: follow them with `sync_purchased_at`
+        and an update of the rollup.
+        """
+        with transaction.atomic():
+            previous = (
+                None
+                if self._state.adding
+                else CartItem.objects.select_related("cart").filter(pk=self.pk).first()
+            )
+            cart = (
+                previous.cart
+                if previous is not None and previous.cart_id == self.cart_id
+                else self.cart
+            )
+            self.purchased_at = cart.purchased_at if cart.is_purchased else None
+            super().save(*args, **kwargs)
+            sales, previous_sales = (
+                self.monthly_sales(),
+                previous.monthly_sales() if previous else [],
+            )
+            if sales != previous_sales:
+                ProductMonthlySales.objects.remove(previous_sales)
+                ProductMonthlySales.objects.add(sales)
+
+    def delete(self, *args: Any, **kwargs: Any) -> tuple[int, dict[str, int]]:
+        with transaction.atomic():
+            ProductMonthlySales.objects.remove(self.monthly_sales())
+            return super().delete(*args, **kwargs)
+
+    def monthly_sales(self) -> list[MonthlySales]:
+        """
+        Return what the item adds to the rollup, nothing until its cart is purchased.
+        """
+        if self.purchased_at is None:
+            return []
+        purchased_at = self.purchased_at.astimezone(dt.timezone.utc)
+        return [MonthlySales(self.product_id, purchased_at.year, purchased_at.month, self.quantity)]
+
     def __str__(self) -> str:
         return f"{self.cart} -> {self.quantity} {self.product.name}"
 
@@ -42,12 +150,69 @@ class CartItem(models.Model):
 
         indexes = [
             models.Index(fields=["product"], name="cartitem_product_idx"),
-            models.Index(fields=["cart"], name="cartitem_cart_idx"),
+            # Sales are summed from this index alone (an index-only scan) on PostgreSQL
+            models.Index(
+                fields=["cart"], include=["product", "quantity"], name="cartitem_cart_covering_idx"
+            ),
+            # Sales of a month are range scanned from this index alone on PostgreSQL
+            models.Index(
+                fields=["purchased_at"],
+                include=["product", "quantity"],
+                condition=models.Q(purchased_at__isnull=False),
+                name="cartitem_purchased_at_idx",
+            ),
         ]
 
 
+class CartQuerySet(models.QuerySet["Cart"]):
+    def monthly_sales(self) -> Iterable[MonthlySales]:
+        """
+        Return the quantity sold per product and purchase month for the purchased carts.
+        """
+        sales = (
+            CartItem.objects.filter(cart__in=self.filter(is_purchased=True))
+            .values(
+                "product_id",
+                year=ExtractYear("cart__purchased_at"),
+                month=ExtractMonth("cart__purchased_at"),
+            )
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "year", "month", "total")
+            .order_by()
+        )
+        return cast(Iterable[MonthlySales], sales)
+
+    def delete(self) -> tuple[int, dict[str, int]]:
+        """
+        Delete the carts and take the purchased ones out of the `ProductMonthlySales` rollup.
+        """
+        with transaction.atomic():
+            ProductMonthlySales.objects.remove(self.monthly_sales())
+            return super().delete()
+
+    def purchase(self, purchased_at: dt.datetime | None = None) -> int:
+        """
+        Mark all unpurchased carts as purchased in bulk and update the monthly sales rollup.
+
+        Returns the number of purchased carts.
+        """
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        purchased_at = purchased_at or now
+        with transaction.atomic():
+            cart_ids = list(
+                self.filter(is_purchased=False).select_for_update().values_list("pk", flat=True)
+            )
+            carts = Cart.objects.filter(pk__in=cart_ids)
+            purchased = carts.update(is_purchased=True, purchased_at=purchased_at, updated_at=now)
+            CartItem.objects.filter(cart_id__in=cart_ids).update(purchased_at=purchased_at)
+            ProductMonthlySales.objects.add(carts.monthly_sales())
+        return purchased
+
+
 @final
 class Cart(TimeStampMixin):
+    objects = CartQuerySet.as_manager()
+
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="carts")
     items = models.ManyToManyField("products.Product", through=CartItem, related_name="carts")
 
@@ -59,12 +224,32 @@ class Cart(TimeStampMixin):
         If the cart `is_purchased`, set the `purchased_at` field to the current datetime.
 
         If the cart is not purchased, set the `purchased_at` field to None.
+
+        Whenever the purchase state changes, the cart items are moved
+        in or out of the `ProductMonthlySales` rollup and their `purchased_at` is updated.
+        Deleted carts leave the rollup with their items, see `app.customers.signals`.
         """
         if self.is_purchased and not self.purchased_at:
             self.purchased_at = dt.datetime.now(tz=dt.timezone.utc)
         elif self.purchased_at and not self.is_purchased:
             self.purchased_at = None
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            previous = (
+                Cart.objects.filter(pk=self.pk, is_purchased=True)
+                .values_list("purchased_at", flat=True)
+                .first()
+                if self.pk
+                else None
+            )
+            changed = previous != self.purchased_at
+            if changed and previous is not None:
+                ProductMonthlySales.objects.remove(Cart.objects.filter(pk=self.pk).monthly_sales())
+            super().save(*args, **kwargs)
+            if changed:
+                self.cart_items.update(purchased_at=self.purchased_at)
+            if changed and self.is_purchased:
+                ProductMonthlySales.objects.add(Cart.objects.filter(pk=self.pk).monthly_sales())
 
     def __str__(self) -> str:
         return f"{self.customer}'s cart {'(unpaid)' if not self.is_purchased else ''}"
@@ -72,3 +257,12 @@ class Cart(TimeStampMixin):
     class Meta(TypedModelMeta):
         verbose_name = "Cart"
         verbose_name_plural = "Carts"
+
+        indexes = [
+            # Only purchased carts are ever looked up by purchase time
+            models.Index(
+                fields=["purchased_at"],
+                condition=models.Q(is_purchased=True),
+                name="cart_purchased_at_paid_idx",
+            ),
+        ]
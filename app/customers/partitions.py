@@ -0,0 +1,259 @@
+"""
+Range partitioning of the cart items by purchase month, PostgreSQL only.
+
+The live sales aggregate reads the cart items of two months by the purchase
+time copied from their cart, so with ``customers_cartitem`` partitioned by it
+the other months are pruned from the plan, and vacuum and index maintenance
+work on a month at a time. Items of carts not purchased yet have no purchase
+time and are kept in the default partition; PostgreSQL moves them to their
+month when the cart is purchased. Items bought in a month without a partition
+land in the default one too, until :func:`ensure_partitions` creates it.
+
+Partitioning is optional: :func:`convert` turns the table created by the
+migrations into a partitioned one with the same columns, indexes and foreign
+keys, and the views reading it. A partitioned table can not have a primary
+key without the partition key, so every partition has one of its own on
+``id``, unique across all of them since the ids come from a single sequence.
+
+``customers_cart`` is not partitioned: the foreign key of the items needs its
+``id`` to be unique on its own.
+
+The migrations are left as they are and keep describing a plain table: see the
+README for the schema changes that no longer apply once it is converted.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+from collections.abc import Iterable
+
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+
+from app.customers.models import CartItem
+
+TABLE = CartItem._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(?P<year>\d{{4}})_(?P<month>\d{{2}})$")
+
+
+def month_start(day: dt.date) -> dt.date:
+    return dt.date(day.year, day.month, 1)
+
+
+def add_months(month: dt.date, months: int) -> dt.date:
+    index = month.year * 12 + month.month - 1 + months
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: dt.date) -> str:
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> dt.date | None:
+    match = PARTITION_RE.match(name)
+    return dt.date(int(match["year"]), int(match["month"]), 1) if match else None
+
+
+def missing_months(partitions: Iterable[str], first: dt.date, last: dt.date) -> list[dt.date]:
+    """
+    Return the months from `first` to `last`, both included, without a partition.
+    """
+    existing = {partition_month(name) for name in partitions}
+    months = []
+    month = month_start(first)
+    while month <= last:
+        if month not in existing:
+            months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def expired_partitions(partitions: Iterable[str], today: dt.date, retain: int) -> list[str]:
+    """
+    Return the partitions of the months before the `retain` months up to `today`.
+    """
+    oldest_kept = add_months(month_start(today), 1 - retain)
+    return sorted(
+        name
+        for name in partitions
+        if (month := partition_month(name)) is not None and month < oldest_kept
+    )
+
+
+def is_partitioned(cursor: CursorWrapper) -> bool:
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [TABLE])
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def list_partitions(cursor: CursorWrapper) -> list[str]:
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        INNER JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = %s::regclass
+        ORDER BY child.relname
+        """,
+        [TABLE],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def _create_partition(cursor: CursorWrapper, name: str, bounds: str) -> None:
+    quote = connection.ops.quote_name
+    cursor.execute(f"CREATE TABLE {quote(name)} PARTITION OF {quote(TABLE)} {bounds}")
+    cursor.execute(f"ALTER TABLE {quote(name)} ADD PRIMARY KEY (id)")
+
+
+def create_partitions(cursor: CursorWrapper, months: Iterable[dt.date]) -> list[str]:
+    """
+    Create the partitions of the months, moving their rows out of the default partition.
+    """
+    quote = connection.ops.quote_name
+    table, default, moved = quote(TABLE), quote(DEFAULT_PARTITION), quote(f"{TABLE}_moved")
+    created = []
+    for month in months:
+        name = partition_name(month)
+        # Months are in UTC, as the bounds of the sales aggregates
+        start, end = (f"'{day.isoformat()} 00:00:00+00'" for day in (month, add_months(month, 1)))
+        in_month = f"purchased_at >= {start} AND purchased_at < {end}"
+        # A partition can not be created while the default one holds rows of its range
+        cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {default} WHERE {in_month})")
+        (misplaced,) = cursor.fetchone()
+        if misplaced:
+            cursor.execute(f"CREATE TEMPORARY TABLE {moved} (LIKE {table}) ON COMMIT DROP")
+            cursor.execute(
+                f"WITH misplaced AS (DELETE FROM {default} WHERE {in_month} RETURNING *)"
+                f" INSERT INTO {moved} SELECT * FROM misplaced"
+            )
+        _create_partition(cursor, name, f"FOR VALUES FROM ({start}) TO ({end})")
+        if misplaced:
+            cursor.execute(f"INSERT INTO {table} SELECT * FROM {moved}")
+            cursor.execute(f"DROP TABLE {moved}")
+        created.append(name)
+    return created
+
+
+def ensure_partitions(ahead: int, today: dt.date) -> list[str]:
+    """
+    Create the partitions missing from the current month to `ahead` months later.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        months = missing_months(
+            list_partitions(cursor), month_start(today), add_months(month_start(today), ahead)
+        )
+        return create_partitions(cursor, months)
+
+
+def convert(ahead: int, today: dt.date) -> int:
+    """
+    Replace the cart items table with a partitioned one holding the same rows.
+
+    The table is locked meanwhile. The views reading it, such as the monthly
+    sales materialized view, are dropped and created again on the new table.
+    Returns the number of copied rows.
+    """
+    quote = connection.ops.quote_name
+    table, old_table, sequence = quote(TABLE), quote(f"{TABLE}_unpartitioned"), f"{TABLE}_id_seq"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        # Django's foreign keys are deferred, and a table with pending checks can not be dropped
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index"
+            " WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [TABLE],
+        )
+        indexes = [definition for (definition,) in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint"
+            " WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT DISTINCT dependent.relname
+                ,dependent.relkind = 'm'
+                ,pg_get_viewdef(dependent.oid)
+            FROM pg_depend
+            INNER JOIN pg_rewrite ON pg_rewrite.oid = pg_depend.objid
+            INNER JOIN pg_class dependent ON dependent.oid = pg_rewrite.ev_class
+            WHERE pg_depend.classid = 'pg_rewrite'::regclass
+                AND pg_depend.refobjid = %s::regclass
+                AND dependent.oid <> pg_depend.refobjid
+            """,
+            [TABLE],
+        )
+        views = cursor.fetchall()
+        view_indexes: list[str] = []
+        for name, _, _ in views:
+            cursor.execute(
+                "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass",
+                [name],
+            )
+            view_indexes.extend(definition for (definition,) in cursor.fetchall())
+        cursor.execute(f"SELECT MIN(purchased_at) FROM {table}")
+        (first_purchase,) = cursor.fetchone()
+
+        # The views would keep reading the old table, which can not be dropped before them
+        for name, materialized, _ in views:
+            kind = "MATERIALIZED VIEW" if materialized else "VIEW"
+            cursor.execute(f"DROP {kind} {quote(name)}")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            " PARTITION BY RANGE (purchased_at)"
+        )
+        _create_partition(cursor, DEFAULT_PARTITION, "DEFAULT")
+        first = month_start(first_purchase.date() if first_purchase else today)
+        create_partitions(cursor, missing_months([], first, add_months(month_start(today), ahead)))
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+        copied: int = cursor.rowcount
+        # Dropping the old table frees the names of its indexes, constraints and sequence
+        cursor.execute(f"DROP TABLE {old_table}")
+
+        # Partitioned tables have no identity columns before PostgreSQL 17
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {table}.id")
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE(MAX(id), 0) + 1, false) FROM {table}")
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote(name)} {definition}")
+        for name, materialized, definition in views:
+            kind = "MATERIALIZED VIEW" if materialized else "VIEW"
+            cursor.execute(f"CREATE {kind} {quote(name)} AS {definition}")
+        for definition in view_indexes:
+            cursor.execute(definition)
+    return copied
+
+
+def detach_partitions(retain: int, today: dt.date, archive_schema: str | None) -> list[str]:
+    """
+    Detach the partitions of the months before the `retain` months up to `today`.
+
+    Detached partitions are moved to `archive_schema`, without their foreign
+    keys so that carts and products can still be deleted, or dropped if it is `None`.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        expired = expired_partitions(list_partitions(cursor), today, retain)
+        if expired and archive_schema:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(archive_schema)}")
+        for name in expired:
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+            if not archive_schema:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+                continue
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [name],
+            )
+            for (constraint,) in cursor.fetchall():
+                cursor.execute(f"ALTER TABLE {quote(name)} DROP CONSTRAINT {quote(constraint)}")
+            cursor.execute(f"ALTER TABLE {quote(name)} SET SCHEMA {quote(archive_schema)}")
+    return expired
@@ -0,0 +1,20 @@
+from typing import Any
+
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from app.customers.models import Cart, CartQuerySet
+from app.products.models import ProductMonthlySales
+
+
+@receiver(pre_delete, sender=Cart)
+def remove_deleted_cart_sales(instance: Cart, origin: Any, **kwargs: Any) -> None:  # noqa: U100
+    """
+    Take the sales of a purchased cart out of the rollup, including when its
+    customer is deleted; `CartQuerySet.delete` handles its carts all at once.
+
+    The items of a deleted product take nothing out: its rollup rows go with it.
+    """
+    if isinstance(origin, CartQuerySet) or not instance.is_purchased:
+        return
+    ProductMonthlySales.objects.remove(Cart.objects.filter(pk=instance.pk).monthly_sales())
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Category, Product
+from .models import Category, Product, ProductMonthlySales, SalesViewRefresh
 
 
 class CategoryAdmin(admin.ModelAdmin):
@@ -11,5 +11,15 @@ class ProductAdmin(admin.ModelAdmin):
     ...
 
 
+class ProductMonthlySalesAdmin(admin.ModelAdmin):
+    ...
+
+
+class SalesViewRefreshAdmin(admin.ModelAdmin):
+    ...
+
+
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Product, ProductAdmin)
+admin.site.register(ProductMonthlySales, ProductMonthlySalesAdmin)
+admin.site.register(SalesViewRefresh, SalesViewRefreshAdmin)
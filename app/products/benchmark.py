@@ -0,0 +1,213 @@
+"""
+Timings of the `ProductManager` backends on the data of the current database.
+
+Every backend is called straight, bypassing `products_cache`, first on a new
+session (cold: no prepared statement, no cached plan) and then repeatedly on
+the same one (warm). With a pool, the connection handed out again is reset with
+``DISCARD ALL``. The shared buffers and the OS page cache
+are not dropped between runs, so a cold run measures the cost of a new
+session rather than of reading the tables from disk.
+
+On PostgreSQL the last query of every backend is also run with
+``EXPLAIN (ANALYZE, BUFFERS)`` to tell where its time goes.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from django.db import connection
+
+from app.common.db import capture_sql, prepared_statements
+from app.common.utils import percentile
+from app.customers.models import Cart, CartItem
+from app.products.models import Product, ProductRow
+from app.products.pagination import ProductsPage
+
+# Backend -> name of its `ProductManager` method
+BACKENDS = {
+    "raw_pg": "get_products_raw_pg",
+    "orm_fallback": "get_products_orm_fallback",
+    "rollup": "get_products_rollup",
+    "matview": "get_products_matview",
+}
+POSTGRESQL_BACKENDS = ("raw_pg", "matview")
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass(frozen=True)
+class Timings:
+    # Seconds of every run
+    samples: list[float]
+
+    def percentiles(self) -> dict[str, float]:
+        return {f"p{q}": percentile(self.samples, q) for q in PERCENTILES}
+
+
+@dataclass
+class BackendBenchmark:
+    backend: str
+    rows: int
+    cold: Timings
+    warm: Timings
+    explain: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "rows": self.rows,
+            "cold": {**self.cold.percentiles(), "samples": self.cold.samples},
+            "warm": {**self.warm.percentiles(), "samples": self.warm.samples},
+            "explain": self.explain,
+        }
+
+
+def get_backend(backend: str) -> Callable[..., list[ProductRow]]:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend in POSTGRESQL_BACKENDS and connection.vendor != "postgresql":
+        raise ValueError(f"The {backend} backend requires PostgreSQL")
+    method: Callable[..., list[ProductRow]] = getattr(Product.objects, BACKENDS[backend])
+    return method
+
+
+def _timed(call: Callable[[], list[ProductRow]]) -> tuple[float, list[ProductRow]]:
+    _start = time.perf_counter()
+    rows = call()
+    return time.perf_counter() - _start, rows
+
+
+def _new_session() -> None:
+    connection.close()
+    if connection.vendor != "postgresql":
+        return
+    # A pooled connection keeps its prepared statements once given back
+    with connection.cursor() as cursor:
+        cursor.execute("DISCARD ALL")
+    prepared_statements.discard(connection.connection)
+
+
+def explain(call: Callable[[], list[ProductRow]]) -> list[str]:
+    """
+    Return the ``EXPLAIN (ANALYZE, BUFFERS)`` plan of the last query of the call.
+    """
+    if connection.vendor != "postgresql":
+        return []
+    sql = capture_sql(call)
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+        return [line for (line,) in cursor.fetchall()]
+
+
+def benchmark_backend(
+    backend: str,
+    year: int,
+    month: int,
+    page: ProductsPage | None = None,
+    cold_runs: int = 3,
+    warm_runs: int = 20,
+    with_explain: bool = True,
+) -> BackendBenchmark:
+    get_products = get_backend(backend)
+
+    def call() -> list[ProductRow]:
+        return get_products(year=year, month=month, page=page)
+
+    cold = []
+    rows: list[ProductRow] = []
+    for _ in range(cold_runs):
+        _new_session()
+        seconds, rows = _timed(call)
+        cold.append(seconds)
+
+    # The first call prepares the statements of the connection
+    call()
+    warm = []
+    for _ in range(warm_runs):
+        seconds, rows = _timed(call)
+        warm.append(seconds)
+
+    return BackendBenchmark(
+        backend=backend,
+        rows=len(rows),
+        cold=Timings(samples=cold),
+        warm=Timings(samples=warm),
+        explain=explain(call) if with_explain else [],
+    )
+
+
+@dataclass(frozen=True)
+class Regression:
+    backend: str
+    metric: str
+    baseline: float
+    seconds: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.backend}: {self.metric} {self.seconds * 1000:.1f} ms, "
+            f"baseline {self.baseline * 1000:.1f} ms (+{self.seconds / self.baseline - 1:.0%})"
+        )
+
+
+def save_baseline(
+    path: Path, benchmarks: Sequence[BackendBenchmark], dataset: dict[str, int]
+) -> None:
+    baseline = {
+        "dataset": dataset,
+        "backends": {
+            benchmark.backend: {
+                "cold": benchmark.cold.percentiles(),
+                "warm": benchmark.warm.percentiles(),
+            }
+            for benchmark in benchmarks
+        },
+    }
+    path.write_text(json.dumps(baseline, indent=2))
+
+
+def find_regressions(
+    baseline: dict[str, Any],
+    benchmarks: Sequence[BackendBenchmark],
+    tolerance: float = 0.2,
+    metric: str = "warm.p95",
+) -> list[Regression]:
+    """
+    Return the backends whose `metric` is more than `tolerance` slower than in the baseline.
+
+    Backends missing from the baseline are not compared.
+    """
+    stage, name = metric.split(".")
+    regressions = []
+    for benchmark in benchmarks:
+        stored = baseline["backends"].get(benchmark.backend)
+        if stored is None:
+            continue
+        timings: Timings = getattr(benchmark, stage)
+        seconds = timings.percentiles()[name]
+        if seconds > stored[stage][name] * (1 + tolerance):
+            regressions.append(
+                Regression(
+                    backend=benchmark.backend,
+                    metric=metric,
+                    baseline=stored[stage][name],
+                    seconds=seconds,
+                )
+            )
+    return regressions
+
+
+def dataset_size() -> dict[str, int]:
+    """
+    Return the number of rows of the tables the backends aggregate.
+    """
+    return {
+        "products": Product.objects.count(),
+        "carts": Cart.objects.count(),
+        "cart_items": CartItem.objects.count(),
+    }
@@ -0,0 +1,123 @@
+"""
+Whether the monthly sales aggregates are run with the indexes made for them.
+
+The live backends range scan ``customers.CartItem`` by the purchase time
+copied from the carts, on a partial index that includes ``product_id`` and
+``quantity`` so that a month of sales is summed with an index-only scan.
+``customers.Cart`` has a partial index on the purchase time of the purchased
+carts and ``customers.CartItem`` a covering one on ``cart_id``, for the queries
+still joining the carts. The planner is free to ignore all of them: the plans
+of the live backends are read here to tell whether it does on the data of the
+database.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from django.db import connection
+
+from app.common.db import capture_sql, explain_plan, QueryPlan
+from app.customers.models import Cart, CartItem
+from app.products.models import Product
+
+# Index -> table of the indexes of the sales aggregate
+SALES_INDEXES = {
+    "cartitem_purchased_at_idx": CartItem._meta.db_table,
+    "cart_purchased_at_paid_idx": Cart._meta.db_table,
+    "cartitem_cart_covering_idx": CartItem._meta.db_table,
+}
+
+
+@dataclass(frozen=True)
+class IndexUsage:
+    index: str
+    # Query -> how the index is scanned by its plan
+    scans: dict[str, str]
+    # Scans of the index since the statistics were reset, PostgreSQL only
+    idx_scan: int | None = None
+    size: str | None = None
+
+    @property
+    def used(self) -> bool:
+        return bool(self.scans)
+
+
+def sales_queries(year: int, month: int) -> dict[str, Callable[[], Any]]:
+    """
+    Return the live backends of the database, by name.
+    """
+    queries: dict[str, Callable[[], Any]] = {
+        "orm_fallback": lambda: Product.objects.get_products_orm_fallback(year=year, month=month),
+    }
+    if connection.vendor == "postgresql":
+        queries["raw_pg"] = lambda: Product.objects.get_products_raw_pg(year=year, month=month)
+    return queries
+
+
+def explain_sales_queries(year: int, month: int, analyze: bool = False) -> dict[str, QueryPlan]:
+    return {
+        name: explain_plan(capture_sql(call), analyze=analyze)
+        for name, call in sales_queries(year, month).items()
+    }
+
+
+def _parent_indexes() -> dict[str, str]:
+    """
+    Return the index of the partitioned table every index of a partition belongs to.
+    """
+    if connection.vendor != "postgresql":
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, parent.relname
+            FROM pg_inherits
+            INNER JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            INNER JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            WHERE child.relkind = 'i'
+            """
+        )
+        return dict(cursor.fetchall())
+
+
+def _index_stats() -> dict[str, tuple[int, str]]:
+    if connection.vendor != "postgresql":
+        return {}
+    # The indexes of the partitions are added up under the index of the partitioned table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT COALESCE(parent.relname, stats.indexrelname) AS name
+                ,SUM(stats.idx_scan)
+                ,pg_size_pretty(SUM(pg_relation_size(stats.indexrelid)))
+            FROM pg_stat_user_indexes stats
+            LEFT JOIN pg_inherits ON pg_inherits.inhrelid = stats.indexrelid
+            LEFT JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            WHERE COALESCE(parent.relname, stats.indexrelname) = ANY(%s)
+            GROUP BY 1
+            """,
+            [list(SALES_INDEXES)],
+        )
+        return {name: (int(idx_scan), size) for name, idx_scan, size in cursor.fetchall()}
+
+
+def index_usage(plans: dict[str, QueryPlan]) -> list[IndexUsage]:
+    stats, parents = _index_stats(), _parent_indexes()
+    scans: dict[str, dict[str, str]] = {index: {} for index in SALES_INDEXES}
+    for name, plan in plans.items():
+        for index, scan in plan.indexes.items():
+            index = parents.get(index, index)
+            if index in scans:
+                scans[index].setdefault(name, scan)
+    return [
+        IndexUsage(
+            index=index,
+            scans=scans[index],
+            idx_scan=stats[index][0] if index in stats else None,
+            size=stats[index][1] if index in stats else None,
+        )
+        for index in SALES_INDEXES
+    ]
@@ -0,0 +1,59 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from app.products.indexes import explain_sales_queries, index_usage, SALES_INDEXES
+
+
+class Command(BaseCommand):
+    help = (
+        "Explain the monthly sales aggregate and report whether it is run "
+        "with the purchase-time indexes of the carts"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--year", type=int, help="The current one by default")
+        parser.add_argument("--month", type=int, help="The current one by default")
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries with EXPLAIN ANALYZE on PostgreSQL to show actual timings",
+        )
+        parser.add_argument(
+            "--fail-unused",
+            action="store_true",
+            help="Exit with an error if one of the indexes is used by no query",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        today = timezone.now()
+        year, month = options["year"] or today.year, options["month"] or today.month
+
+        try:
+            plans = explain_sales_queries(year, month, analyze=options["analyze"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        for name, plan in plans.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({year}-{month:02d})"))
+            for line in plan.lines:
+                self.stdout.write(f"  {line}")
+            if plan.seq_scans:
+                self.stdout.write(f"  Full scans: {', '.join(sorted(plan.seq_scans))}")
+
+        unused = []
+        for usage in index_usage(plans):
+            stats = f" ({usage.idx_scan} scans, {usage.size})" if usage.size else ""
+            if usage.used:
+                scans = ", ".join(f"{name}: {scan}" for name, scan in usage.scans.items())
+                self.stdout.write(self.style.SUCCESS(f"{usage.index}{stats} used by {scans}"))
+            else:
+                unused.append(usage.index)
+                table = SALES_INDEXES[usage.index]
+                self.stdout.write(
+                    self.style.WARNING(f"{usage.index}{stats} on {table} is used by no query")
+                )
+
+        if unused and options["fail_unused"]:
+            raise CommandError(f"Unused indexes: {', '.join(unused)}")
@@ -0,0 +1,19 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from app.customers.models import Cart
+from app.products.models import ProductMonthlySales
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product monthly sales rollup from all purchased carts"
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        _start = time.perf_counter()
+        created = ProductMonthlySales.objects.rebuild(Cart.objects.monthly_sales())
+        elapsed = time.perf_counter() - _start
+        self.stdout.write(
+            self.style.SUCCESS(f"Created {created} monthly sales rows in {elapsed:.2f} seconds")
+        )
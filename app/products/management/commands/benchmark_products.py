@@ -0,0 +1,172 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.utils import timezone
+
+from app.common.populate import populate_threads
+from app.common.populate.settings import add_settings_arguments, settings_from_options
+from app.products.benchmark import (
+    BackendBenchmark,
+    BACKENDS,
+    benchmark_backend,
+    dataset_size,
+    find_regressions,
+    PERCENTILES,
+    POSTGRESQL_BACKENDS,
+    save_baseline,
+)
+from app.products.models import SalesViewRefresh
+from app.products.pagination import ProductsPage
+
+METRICS = tuple(f"{stage}.p{q}" for stage in ("cold", "warm") for q in PERCENTILES)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the ProductManager backends cold and warm at p50/p95/p99 "
+        "and fail if one got slower than a stored baseline"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--backends",
+            nargs="+",
+            choices=BACKENDS,
+            help="All the backends the database supports by default",
+        )
+        parser.add_argument("--year", type=int, help="The current one by default")
+        parser.add_argument("--month", type=int, help="The current one by default")
+        parser.add_argument("--limit", type=int, help="Products per page, all of them by default")
+        parser.add_argument("--cold-runs", type=int, default=3)
+        parser.add_argument("--warm-runs", type=int, default=20)
+        parser.add_argument(
+            "--explain",
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help=(
+                "Capture EXPLAIN (ANALYZE, BUFFERS) of every backend on PostgreSQL, "
+                "printed with -v 2 and written to --json"
+            ),
+        )
+        parser.add_argument(
+            "--populate",
+            action="store_true",
+            help="Seed the database with populate_threads and the settings below first",
+        )
+        parser.add_argument("--baseline", type=Path, help="JSON file of the timings to compare to")
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the timings to --baseline instead of comparing them",
+        )
+        parser.add_argument("--metric", choices=METRICS, default="warm.p95")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="How much slower than the baseline a backend may get, 0.2 for 20%%",
+        )
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Also write the timings as JSON to this file, - for the standard output",
+        )
+        add_settings_arguments(parser)
+
+    def seed(self, options: dict[str, Any]) -> None:
+        populate_threads(settings_from_options(options))
+        if connection.vendor == "postgresql":
+            # Fresh planner statistics, as autovacuum would eventually collect
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            SalesViewRefresh.objects.refresh(concurrently=False)
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline requires --baseline")
+
+        backends = options["backends"] or [
+            backend
+            for backend in BACKENDS
+            if connection.vendor == "postgresql" or backend not in POSTGRESQL_BACKENDS
+        ]
+        if options["populate"]:
+            self.seed(options)
+
+        now = timezone.now()
+        year, month = options["year"] or now.year, options["month"] or now.month
+        dataset = dataset_size()
+        tables = ", ".join(f"{rows} {table}" for table, rows in dataset.items())
+        self.stdout.write(f"{connection.vendor}, {year}-{month:02d}, {tables}")
+
+        benchmarks = []
+        for backend in backends:
+            try:
+                benchmark = benchmark_backend(
+                    backend,
+                    year=year,
+                    month=month,
+                    page=ProductsPage(limit=options["limit"]),
+                    cold_runs=options["cold_runs"],
+                    warm_runs=options["warm_runs"],
+                    with_explain=options["explain"],
+                )
+            except ValueError as exc:
+                raise CommandError(exc) from exc
+            benchmarks.append(benchmark)
+
+        header = "".join(f"{metric:>11}" for metric in METRICS)
+        self.stdout.write(f"{'backend (ms)':<14}{header}")
+        for benchmark in benchmarks:
+            timings = [
+                getattr(benchmark, stage).percentiles()[f"p{q}"] * 1000
+                for stage in ("cold", "warm")
+                for q in PERCENTILES
+            ]
+            self.stdout.write(
+                f"{benchmark.backend:<14}" + "".join(f"{ms:>11.1f}" for ms in timings)
+            )
+            for line in benchmark.explain if options["verbosity"] > 1 else []:
+                self.stdout.write(f"    {line}")
+
+        if options["json_path"] == "-":
+            self.stdout.write(
+                json.dumps([benchmark.as_dict() for benchmark in benchmarks], indent=2)
+            )
+        elif options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump([benchmark.as_dict() for benchmark in benchmarks], file, indent=2)
+
+        if options["save_baseline"]:
+            save_baseline(options["baseline"], benchmarks, dataset)
+            self.stdout.write(self.style.SUCCESS(f"Saved the baseline to {options['baseline']}"))
+        elif options["baseline"]:
+            self.compare(options["baseline"], benchmarks, dataset, **options)
+
+    def compare(
+        self,
+        path: Path,
+        benchmarks: list[BackendBenchmark],
+        dataset: dict[str, int],
+        /,
+        **options: Any,
+    ) -> None:
+        baseline = json.loads(path.read_text())
+        if baseline["dataset"] != dataset:
+            self.stderr.write(
+                self.style.WARNING(
+                    f"The baseline was taken on another dataset: {baseline['dataset']}"
+                )
+            )
+
+        regressions = find_regressions(
+            baseline, benchmarks, tolerance=options["tolerance"], metric=options["metric"]
+        )
+        if regressions:
+            lines = "\n".join(str(regression) for regression in regressions)
+            raise CommandError(f"Slower than the baseline:\n{lines}")
+        self.stdout.write(self.style.SUCCESS(f"No backend is slower than {path}"))
@@ -0,0 +1,37 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+
+from app.products.models import SalesViewRefresh
+
+
+class Command(BaseCommand):
+    help = "Refresh the monthly sales materialized view (PostgreSQL only)"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--no-concurrently",
+            action="store_false",
+            dest="concurrently",
+            help="Use a plain refresh, faster but blocks readers of the view",
+        )
+        parser.add_argument(
+            "--every",
+            type=int,
+            default=0,
+            metavar="SECONDS",
+            help="Keep running and refresh the view every SECONDS",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: U100
+        if connection.vendor != "postgresql":
+            raise CommandError("Materialized views are only supported on PostgreSQL")
+
+        while True:
+            refresh = SalesViewRefresh.objects.refresh(concurrently=options["concurrently"])
+            self.stdout.write(self.style.SUCCESS(f"Refreshed sales view: {refresh}"))
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.5 on 2026-10-17 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductMonthlySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                ("quantity", models.BigIntegerField(default=0)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_sales",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Monthly Sales",
+                "verbose_name_plural": "Product Monthly Sales",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productmonthlysales",
+            constraint=models.UniqueConstraint(
+                fields=("product", "year", "month"), name="product_monthly_sales_uniq"
+            ),
+        ),
+    ]
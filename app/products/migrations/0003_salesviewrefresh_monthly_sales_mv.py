@@ -0,0 +1,70 @@
+# Generated by Django 4.2.5 on 2026-10-17 20:02
+
+import datetime as dt
+
+from django.db import migrations, models
+
+CREATE_MONTHLY_SALES_VIEW = """
+CREATE MATERIALIZED VIEW products_monthly_sales_mv AS
+SELECT items.product_id
+    ,date_trunc('month', cart.purchased_at AT TIME ZONE 'UTC')::DATE AS month
+    ,SUM(items.quantity)::BIGINT AS quantity
+FROM customers_cartitem items
+INNER JOIN customers_cart cart ON cart.id = items.cart_id
+WHERE cart.is_purchased = TRUE
+GROUP BY 1, 2
+"""
+
+CREATE_MONTHLY_SALES_VIEW_INDEX = """
+CREATE UNIQUE INDEX products_monthly_sales_mv_uniq
+ON products_monthly_sales_mv (month, product_id)
+"""
+
+DROP_MONTHLY_SALES_VIEW = "DROP MATERIALIZED VIEW IF EXISTS products_monthly_sales_mv"
+
+
+def create_monthly_sales_view(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(CREATE_MONTHLY_SALES_VIEW)
+    schema_editor.execute(CREATE_MONTHLY_SALES_VIEW_INDEX)
+    apps.get_model("products", "SalesViewRefresh").objects.create(
+        refreshed_at=dt.datetime.now(tz=dt.timezone.utc),
+        duration=0,
+        concurrently=False,
+    )
+
+
+def drop_monthly_sales_view(apps, schema_editor):  # noqa: U100
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(DROP_MONTHLY_SALES_VIEW)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("customers", "0009_alter_cart_customer"),
+        ("products", "0002_productmonthlysales_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SalesViewRefresh",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("refreshed_at", models.DateTimeField(db_index=True)),
+                ("duration", models.FloatField()),
+                ("concurrently", models.BooleanField()),
+            ],
+            options={
+                "verbose_name": "Sales View Refresh",
+                "verbose_name_plural": "Sales View Refreshes",
+            },
+        ),
+        migrations.RunPython(create_monthly_sales_view, drop_monthly_sales_view),
+    ]
@@ -2,15 +2,50 @@ from __future__ import annotations
 
 import calendar
 import datetime as dt
-from typing import cast, final, NamedTuple
-
-from django.db import connection, models
-from django.db.models import Q, Sum
+import json
+import sys
+import time
+import zlib
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from decimal import Decimal
+from itertools import islice
+from typing import Any, cast, final, NamedTuple, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django_stubs_ext import ValuesQuerySet
 from django_stubs_ext.db.models import TypedModelMeta
 from djmoney.models.fields import MoneyField
 from loguru import logger
 
+from app.common.cache import LocalCache, VersionedCache
+from app.common.db import (
+    afetchall,
+    async_connection,
+    has_pool,
+    prepared_statements,
+    PreparedStatement,
+)
+from app.common.metrics import QUERY_DURATION, timed_query
 from app.common.models import TimeStampMixin
+from app.products.pagination import ProductsPage
+from app.products.queries import (
+    GET_PRODUCTS,
+    GET_PRODUCTS_MATVIEW,
+    paginated,
+    ranked,
+    REFRESH_MONTHLY_SALES_VIEW,
+    REFRESH_MONTHLY_SALES_VIEW_CONCURRENTLY,
+)
+from app.products.ranking import Ranking, top_rows
+from app.products.series import Granularity, period_starts, SalesSeries
 
 
 class ProductRow(NamedTuple):
@@ -18,15 +53,96 @@ class ProductRow(NamedTuple):
     name: str
     category: str
     is_active: bool
-    price: float
+    price: Decimal
     last_month_sales: int
     current_month_sales: int
 
 
+class MonthlySales(NamedTuple):
+    product_id: int
+    year: int
+    month: int
+    quantity: int
+
+
+# Aggregates of `ProductManager.get_products_aggr`, invalidated on every change of
+# the products, the categories or the monthly sales
+products_cache = VersionedCache(
+    "products",
+    local=LocalCache(
+        max_entries=settings.PRODUCTS_LOCAL_CACHE_MAX_ENTRIES,
+        max_bytes=settings.PRODUCTS_LOCAL_CACHE_MAX_BYTES,
+    ),
+    version_check_interval=settings.PRODUCTS_CACHE_VERSION_CHECK_INTERVAL,
+)
+
+
+def _dump_rows(rows: list[ProductRow]) -> bytes:
+    return zlib.compress(json.dumps(rows, cls=DjangoJSONEncoder, separators=(",", ":")).encode())
+
+
+def _rows_size(rows: list[ProductRow]) -> int:
+    """
+    Estimate the memory held by decoded rows, from up to 100 of them.
+
+    The compressed JSON they are cached as is dozens of times smaller.
+    """
+    sample = rows[:: max(1, len(rows) // 100)]
+    sample_size = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample
+    )
+    return sys.getsizeof(rows) + sample_size * len(rows) // max(1, len(sample))
+
+
+def _load_rows(data: bytes) -> list[ProductRow]:
+    return [
+        ProductRow(pk, name, category, is_active, Decimal(str(price)), last_month, current_month)
+        for pk, name, category, is_active, price, last_month, current_month in json.loads(
+            zlib.decompress(data)
+        )
+    ]
+
+
+_CatalogModel = TypeVar("_CatalogModel", bound=models.Model)
+
+
+class CatalogQuerySet(models.QuerySet[_CatalogModel]):
+    """
+    Invalidates `products_cache` on the bulk writes of products and categories,
+    which send no `post_save` signal for `app.products.signals` to handle.
+    """
+
+    def update(self, **kwargs: Any) -> int:
+        updated = super().update(**kwargs)
+        if updated:
+            products_cache.bump_on_commit()
+        return updated
+
+    def bulk_create(self, *args: Any, **kwargs: Any) -> list[_CatalogModel]:
+        created = super().bulk_create(*args, **kwargs)
+        if created:
+            products_cache.bump_on_commit()
+        return created
+
+    def bulk_update(self, *args: Any, **kwargs: Any) -> int:
+        updated = super().bulk_update(*args, **kwargs)
+        if updated:
+            products_cache.bump_on_commit()
+        return updated
+
+
+@final
+class CategoryManager(models.Manager["Category"]):
+    def get_queryset(self) -> CatalogQuerySet[Category]:
+        return CatalogQuerySet(self.model, using=self._db)
+
+
 @final
 class Category(TimeStampMixin):
     name = models.CharField(max_length=100, unique=True)
 
+    objects: CategoryManager = CategoryManager()
+
     class Meta(TypedModelMeta):
         verbose_name = "Category"
         verbose_name_plural = "Categories"
@@ -52,6 +168,9 @@ class ProductManager(models.Manager["Product"]):
         purchased in the current month
     """
 
+    def get_queryset(self) -> CatalogQuerySet[Product]:
+        return CatalogQuerySet(self.model, using=self._db)
+
     def _get_dt_to_filter(self, year: int, month: int) -> list[dt.datetime]:
         """
         Get a list of datetime to filter monthly sales by.
@@ -66,18 +185,15 @@ class ProductManager(models.Manager["Product"]):
         Returns
         -------
         list[dt.datetime]
-            A list of date_from, date_to, previous_month_from, previous_month_to
+            A list of date_from, date_to, previous_month_from, previous_month_to.
+            The `_from` bounds are inclusive, the `_to` bounds are exclusive.
         """
-        d_fmt = "{0:>02}.{1:>02}.{2}"
-        date_from = dt.datetime.strptime(d_fmt.format(1, month, year), "%d.%m.%Y")
+        date_from = dt.datetime(year, month, 1, tzinfo=dt.timezone.utc)
         _last_day_of_month = calendar.monthrange(year, month)[1]
-        date_to = dt.datetime.strptime(d_fmt.format(_last_day_of_month, month, year), "%d.%m.%Y")
+        date_to = date_from + dt.timedelta(days=_last_day_of_month)
 
-        date_from = date_from.replace(tzinfo=dt.timezone.utc)
-        date_to = date_to.replace(tzinfo=dt.timezone.utc)
-
-        previous_month_to = date_from - dt.timedelta(days=1)
-        previous_month_from = previous_month_to.replace(day=1)
+        previous_month_to = date_from
+        previous_month_from = (date_from - dt.timedelta(days=1)).replace(day=1)
 
         return [date_from, date_to, previous_month_from, previous_month_to]
 
@@ -87,15 +203,65 @@ class ProductManager(models.Manager["Product"]):
         """
         return Sum(
             "cartitem__quantity",
-            filter=Q(
-                cartitem__cart__purchased_at__gte=dt_from,
-                cartitem__cart__purchased_at__lte=dt_to,
-                cartitem__cart__is_purchased=True,
-            ),
+            # Only items of purchased carts have a `purchased_at`, so the carts are not joined
+            filter=Q(cartitem__purchased_at__gte=dt_from, cartitem__purchased_at__lt=dt_to),
             default=0,
         )
 
-    def get_products_orm_fallback(self, year: int, month: int) -> list[ProductRow]:
+    def _paginate(
+        self, products: ValuesQuerySet[Product, tuple[Any, ...]], page: ProductsPage
+    ) -> list[ProductRow]:
+        """
+        Apply the search, ordering, keyset cursor and limits of the page to an ORM query.
+        """
+        key = {"category": "category__name"}.get(page.sort_key, page.sort_key)
+        lookup = "lt" if page.descending else "gt"
+
+        if page.search:
+            products = products.filter(
+                Q(name__icontains=page.search) | Q(category__name__icontains=page.search)
+            )
+
+        if page.after is not None:
+            value, pk = page.after
+            products = products.filter(
+                Q(**{f"{key}__{lookup}": value}) | Q(**{key: value, f"id__{lookup}": pk})
+            )
+
+        products = products.order_by(*([f"-{key}", "-id"] if page.descending else [key, "id"]))
+        start, end = page.offset, None if page.limit is None else page.offset + page.limit
+        return cast(list[ProductRow], list(products[start:end]))
+
+    def _page_params(self, page: ProductsPage) -> list[Any]:
+        """
+        Return the parameters `queries.paginated` statements expect after the query ones.
+        """
+        search = [page.search_pattern] * 2 if page.search else []
+        return [*search, *(page.after or ()), page.limit, page.offset]
+
+    def _paginated(self, statement: PreparedStatement, page: ProductsPage) -> PreparedStatement:
+        return paginated(
+            statement,
+            page.order_by,
+            keyset=page.after is not None,
+            search=bool(page.search),
+        )
+
+    def count_products(self, search: str = "") -> int:
+        """
+        Count the products matching the search, see `ProductsPage.search`.
+        """
+        products = Product.objects.all()
+        if search:
+            products = products.filter(
+                Q(name__icontains=search) | Q(category__name__icontains=search)
+            )
+        return products.count()
+
+    @timed_query
+    def get_products_orm_fallback(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
         """
         Parameters
         ----------
@@ -103,6 +269,8 @@ class ProductManager(models.Manager["Product"]):
             The year to filter monthly sales by.
         month : int
             The month to filter monthly sales by.
+        page : ProductsPage | None
+            The ordering and the slice of products to return, all products by id by default.
 
         Returns
         -------
@@ -115,23 +283,25 @@ class ProductManager(models.Manager["Product"]):
                 the sum of the quantity of all cart items
                 purchased in the current month
         """
+        return self._paginate(self._orm_fallback_products(year, month), page or ProductsPage())
 
+    def _orm_fallback_products(
+        self, year: int, month: int
+    ) -> ValuesQuerySet[Product, tuple[Any, ...]]:
         date_from, date_to, previous_month_from, previous_month_to = self._get_dt_to_filter(
             year=year, month=month
         )
 
-        products = (
+        return (
             Product.objects.prefetch_related("category", "cartitem_set__cart")
             .annotate(
-                last_month_sales=self._month_sales_queryset(date_from, date_to),
-                current_month_sales=self._month_sales_queryset(
-                    previous_month_from, previous_month_to
-                ),
+                last_month_sales=self._month_sales_queryset(previous_month_from, previous_month_to),
+                current_month_sales=self._month_sales_queryset(date_from, date_to),
             )
             .values_list(
                 "id",
                 "name",
-                "category",
+                "category__name",
                 "is_active",
                 "price",
                 "last_month_sales",
@@ -139,86 +309,139 @@ class ProductManager(models.Manager["Product"]):
             )
             .all()
         )
-        return cast(list[ProductRow], products)
 
-    def get_products_raw_pg(self, year: int, month: int) -> list[ProductRow]:
+    @timed_query
+    def get_products_raw_pg(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
         with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                PREPARE get_products(TIMESTAMP, TIMESTAMP, TIMESTAMP, TIMESTAMP) AS
-                WITH paid_carts AS (
-                        SELECT cart.id
-                            ,cart.purchased_at
-                        FROM customers_cart cart
-                        WHERE cart.is_purchased = TRUE
-                        )
-                    ,this_month_carts AS (
-                        SELECT c.id
-                        FROM paid_carts c
-                        WHERE c.purchased_at >= $1
-                            AND c.purchased_at < $2
-                        )
-                    ,previous_month_carts AS (
-                        SELECT c.id
-                        FROM paid_carts c
-                        WHERE c.purchased_at >= $3
-                            AND c.purchased_at < $4
-                        )
-                    ,category_names AS (
-                        SELECT c.id
-                            ,c.NAME
-                        FROM products_category c
-                        )
-                    ,this_month_items AS (
-                        SELECT items.product_id
-                            ,SUM(items.quantity) AS total
-                        FROM customers_cartitem items
-                        WHERE EXISTS (
-                                SELECT
-                                FROM this_month_carts c
-                                WHERE c.id = items.cart_id
-                                )
-                        GROUP BY items.product_id
-                        )
-                    ,previous_month_items AS (
-                        SELECT items.product_id
-                            ,SUM(items.quantity) AS total
-                        FROM customers_cartitem items
-                        WHERE EXISTS (
-                                SELECT
-                                FROM previous_month_carts c
-                                WHERE c.id = items.cart_id
-                                )
-                        GROUP BY items.product_id
-                        )
-
-                SELECT p.*
-                    ,c.NAME
-                FROM (
-                    SELECT p.*
-                        ,COALESCE(tm.total, 0)
-                    FROM (
-                        SELECT p.id
-                            ,p.NAME
-                            ,p.category_id
-                            ,p.is_active
-                            ,p.price
-                            ,COALESCE(pm.total, 0)
-                        FROM products_product p
-                        LEFT JOIN previous_month_items pm ON p.id = pm.product_id
-                        ) p
-                    LEFT JOIN this_month_items tm ON p.id = tm.product_id
-                    ) p
-                LEFT JOIN category_names c ON p.category_id = c.id;
-                """,
+            prepared_statements.execute(
+                cursor, *self._raw_query("live", year, month, page or ProductsPage())
             )
-            cursor.execute(
-                "EXECUTE get_products(%s, %s, %s, %s);",
-                self._get_dt_to_filter(year=year, month=month),
+            return cast(list[ProductRow], cursor.fetchall())
+
+    def get_products_live(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
+        """
+        Aggregate monthly sales straight from the purchased carts.
+
+        Uses the raw SQL query on PostgreSQL and the ORM on any other backend.
+        """
+        match connection.vendor:
+            case "postgresql":
+                return self.get_products_raw_pg(year=year, month=month, page=page)
+            case _:
+                logger.warning(
+                    "[{}] Unsupported database backend. Falling back to ORM", connection.vendor
+                )
+                return self.get_products_orm_fallback(year=year, month=month, page=page)
+
+    def _rollup_sales(self, year: int, month: int) -> Coalesce:
+        """
+        Return the quantity stored in the monthly sales rollup for the given month and year.
+        """
+        return Coalesce(
+            Subquery(
+                ProductMonthlySales.objects.filter(
+                    product=OuterRef("pk"), year=year, month=month
+                ).values("quantity")[:1]
+            ),
+            0,
+        )
+
+    @timed_query
+    def get_products_rollup(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
+        """
+        Read monthly sales from the `ProductMonthlySales` rollup.
+
+        Only two rollup rows are looked up per product, so the cost of the query
+        does not depend on the number of carts.
+        """
+        return self._paginate(self._rollup_products(year, month), page or ProductsPage())
+
+    def _rollup_products(self, year: int, month: int) -> ValuesQuerySet[Product, tuple[Any, ...]]:
+        date_from, _, previous_month_from, _ = self._get_dt_to_filter(year=year, month=month)
+
+        return Product.objects.annotate(
+            last_month_sales=self._rollup_sales(
+                previous_month_from.year, previous_month_from.month
+            ),
+            current_month_sales=self._rollup_sales(date_from.year, date_from.month),
+        ).values_list(
+            "id",
+            "name",
+            "category__name",
+            "is_active",
+            "price",
+            "last_month_sales",
+            "current_month_sales",
+        )
+
+    @timed_query
+    def get_products_matview(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
+        """
+        Read monthly sales from the PostgreSQL materialized view.
+
+        The data is as fresh as the last `refresh_sales_view` run,
+        see `get_sales_as_of`.
+        """
+        with connection.cursor() as cursor:
+            prepared_statements.execute(
+                cursor, *self._raw_query("matview", year, month, page or ProductsPage())
             )
             return cast(list[ProductRow], cursor.fetchall())
 
-    def get_products_aggr(self, year: int, month: int) -> list[ProductRow]:
+    def _raw_query(
+        self, backend: str, year: int, month: int, page: ProductsPage
+    ) -> tuple[PreparedStatement, list[Any]]:
+        """
+        Return the PostgreSQL statement of the `live` or `matview` backend and its parameters.
+        """
+        statement, params = self._raw_statement(backend, year, month)
+        return self._paginated(statement, page), [*params, *self._page_params(page)]
+
+    def _raw_statement(
+        self, backend: str, year: int, month: int
+    ) -> tuple[PreparedStatement, list[Any]]:
+        """
+        Return the unpaginated statement of the `live` or `matview` backend and its parameters.
+        """
+        if backend == "matview":
+            date_from, _, previous_month_from, _ = self._get_dt_to_filter(year=year, month=month)
+            return GET_PRODUCTS_MATVIEW, [previous_month_from.date(), date_from.date()]
+        return GET_PRODUCTS, [*self._get_dt_to_filter(year=year, month=month)]
+
+    def _get_backend(self) -> str:
+        backend: str = settings.PRODUCTS_AGGREGATION_BACKEND
+        if backend not in ("rollup", "matview", "live"):
+            raise ImproperlyConfigured(f"Unknown PRODUCTS_AGGREGATION_BACKEND: {backend}")
+        if backend == "matview" and connection.vendor != "postgresql":
+            logger.warning(
+                "[{}] Materialized view requires PostgreSQL. Falling back to rollup",
+                connection.vendor,
+            )
+            return "rollup"
+        return backend
+
+    def get_sales_as_of(self) -> dt.datetime | None:
+        """
+        Return the moment the sales returned by `get_products_aggr` were computed at.
+
+        `None` means the data is always up to date; otherwise the response
+        may be stale by up to `now - get_sales_as_of()`.
+        """
+        if self._get_backend() != "matview":
+            return None
+        return SalesViewRefresh.objects.last_refreshed_at()
+
+    def get_products_aggr(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
         """
         Get a list of products with the following annotations:
         - last_month_sales:
@@ -234,6 +457,9 @@ class ProductManager(models.Manager["Product"]):
             The year to filter monthly sales by.
         month : int
             The month to filter monthly sales by.
+        page : ProductsPage | None
+            The ordering and the slice of products to return, all products by id by default.
+            Both are applied by the database.
 
         Returns
         -------
@@ -247,16 +473,190 @@ class ProductManager(models.Manager["Product"]):
                 purchased in the current month
         """
 
-        logger.debug("[{}] Querying products for {}/{}", connection.vendor, month, year)
+        backend = self._get_backend()
+        _page = page or ProductsPage()
+        timeout: int = settings.PRODUCTS_CACHE_TIMEOUT
+        if not timeout:
+            return self._query_products_aggr(backend, year, month, _page)
+
+        return products_cache.get_or_set(
+            f"aggr:{backend}:{year}:{month}:{_page.cache_key}",
+            lambda: self._query_products_aggr(backend, year, month, _page),
+            dumps=_dump_rows,
+            loads=_load_rows,
+            timeout=timeout,
+            sizeof=_rows_size,
+        )
 
-        match connection.vendor:
-            case "postgresql":
-                return self.get_products_raw_pg(year=year, month=month)
+    async def aget_products_aggr(
+        self, year: int, month: int, page: ProductsPage | None = None
+    ) -> list[ProductRow]:
+        """
+        Async `get_products_aggr`.
+
+        On PostgreSQL with a connection pool, the `live` and `matview` backends run
+        their raw query over a pooled async psycopg connection, without taking a thread;
+        otherwise the query is run in a thread.
+        """
+        backend = self._get_backend()
+        if backend == "rollup" or connection.vendor != "postgresql" or not has_pool():
+            return await sync_to_async(self.get_products_aggr)(year=year, month=month, page=page)
+
+        _page = page or ProductsPage()
+        timeout: int = settings.PRODUCTS_CACHE_TIMEOUT
+        if not timeout:
+            return await self._aquery_products_aggr(backend, year, month, _page)
+
+        return await products_cache.aget_or_set(
+            f"aggr:{backend}:{year}:{month}:{_page.cache_key}",
+            lambda: self._aquery_products_aggr(backend, year, month, _page),
+            dumps=_dump_rows,
+            loads=_load_rows,
+            timeout=timeout,
+            sizeof=_rows_size,
+        )
+
+    def get_top_products(
+        self,
+        year: int,
+        month: int,
+        n: int = 10,
+        by: Ranking = "sellers",
+        per_category: bool = False,
+    ) -> list[ProductRow]:
+        """
+        Parameters
+        ----------
+        year : int
+            The year to filter monthly sales by.
+        month : int
+            The month to filter monthly sales by.
+        n : int
+            The number of products to return, in each category if `per_category` is set.
+        by : Ranking
+            `sellers` ranks by the sales of the month,
+            `movers` by how much they changed since the previous month.
+        per_category : bool
+            Rank the products of every category apart, categories are ordered by name.
+
+        Returns
+        -------
+        list[ProductRow]
+            The products of `get_products_aggr`, highest ranked first.
+        """
+        backend = self._get_backend()
+        timeout: int = settings.PRODUCTS_CACHE_TIMEOUT
+        if not timeout:
+            return self._query_top_products(backend, year, month, n, by, per_category)
+
+        return products_cache.get_or_set(
+            f"top:{backend}:{year}:{month}:{n}:{by}:{int(per_category)}",
+            lambda: self._query_top_products(backend, year, month, n, by, per_category),
+            dumps=_dump_rows,
+            loads=_load_rows,
+            timeout=timeout,
+            sizeof=_rows_size,
+        )
+
+    def _query_top_products(
+        self, backend: str, year: int, month: int, n: int, by: Ranking, per_category: bool
+    ) -> list[ProductRow]:
+        with QUERY_DURATION.labels(f"get_top_products_{backend}").time():
+            if backend in ("live", "matview") and connection.vendor == "postgresql":
+                statement, params = self._raw_statement(backend, year, month)
+                with connection.cursor() as cursor:
+                    prepared_statements.execute(
+                        cursor, ranked(statement, by, per_category), [*params, n]
+                    )
+                    return cast(list[ProductRow], cursor.fetchall())
+
+            products = (
+                self._rollup_products(year, month)
+                if backend == "rollup"
+                else self._orm_fallback_products(year, month)
+            )
+            # Streamed, only the top rows are kept
+            rows = top_rows(products.iterator(chunk_size=2000), n, by, per_category)
+            return cast(list[ProductRow], rows)
+
+    @timed_query
+    def sales_series(
+        self,
+        start: dt.date,
+        end: dt.date,
+        granularity: Granularity = "day",
+        products: Sequence[int] | None = None,
+    ) -> SalesSeries:
+        """
+        Parameters
+        ----------
+        start : dt.date
+            The day in the first period, which starts at midnight UTC on its day, Monday or 1st.
+        end : dt.date
+            The day after the last one, excluded: the last period is cut there.
+        granularity : Granularity
+            The length of the periods: a day, a week or a month.
+        products : Sequence[int] | None
+            The ids of the products, in the order of the rows; all of them by id by default.
+
+        Returns
+        -------
+        SalesSeries
+            The quantity of every product sold in every period,
+            summed by the database in a single grouped query.
+        """
+        periods = period_starts(start, end, granularity)
+        product_ids = (
+            list(products)
+            if products is not None
+            else list(self.order_by("id").values_list("id", flat=True))
+        )
+        if not periods or not product_ids:
+            return SalesSeries.from_totals(granularity, periods, product_ids, [])
+
+        utc = dt.timezone.utc
+        items = apps.get_model("customers", "CartItem").objects.filter(
+            purchased_at__gte=dt.datetime.combine(periods[0], dt.time(), tzinfo=utc),
+            purchased_at__lt=dt.datetime.combine(end, dt.time(), tzinfo=utc),
+        )
+        if products is not None:
+            items = items.filter(product_id__in=product_ids)
+        totals = (
+            items.values("product_id", period=Trunc("purchased_at", granularity, tzinfo=utc))
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "period", "total")
+            .order_by()
+        )
+        return SalesSeries.from_totals(
+            granularity,
+            periods,
+            product_ids,
+            ((product_id, period.date(), total) for product_id, period, total in totals),
+        )
+
+    async def _aquery_products_aggr(
+        self, backend: str, year: int, month: int, page: ProductsPage
+    ) -> list[ProductRow]:
+        logger.debug("[async] Querying products for {}/{} from {}", month, year, backend)
+        with QUERY_DURATION.labels(f"aget_products_{backend}").time():
+            async with async_connection() as conn:
+                rows = await afetchall(conn, *self._raw_query(backend, year, month, page))
+        return cast(list[ProductRow], rows)
+
+    def _query_products_aggr(
+        self, backend: str, year: int, month: int, page: ProductsPage
+    ) -> list[ProductRow]:
+        logger.debug(
+            "[{}] Querying products for {}/{} from {}", connection.vendor, month, year, backend
+        )
+
+        match backend:
+            case "matview":
+                return self.get_products_matview(year=year, month=month, page=page)
+            case "live":
+                return self.get_products_live(year=year, month=month, page=page)
             case _:
-                logger.warning(
-                    "[{}] Unsupported database backend. Falling back to ORM", connection.vendor
-                )
-                return self.get_products_orm_fallback(year=year, month=month)
+                return self.get_products_rollup(year=year, month=month, page=page)
 
 
 @final
@@ -274,3 +674,163 @@ class Product(TimeStampMixin):
 
     def __str__(self) -> str:
         return f"[{self.category}] {self.name}"
+
+
+@final
+class ProductMonthlySalesManager(models.Manager["ProductMonthlySales"]):
+    """
+    Keeps the `ProductMonthlySales` rollup in sync with purchased carts.
+    """
+
+    batch_size = 5000
+
+    def add(self, sales: Iterable[MonthlySales], sign: int = 1) -> None:
+        """
+        Increment (or, with `sign=-1`, decrement) the rollup by the given sales.
+
+        Rows are upserted with a single `INSERT ... ON CONFLICT` statement, which
+        both PostgreSQL and SQLite support, so concurrent purchases never lose
+        an update.
+        """
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} ({qn('product_id')}, {qn('year')}, {qn('month')}, "
+            f"{qn('quantity')}) VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT ({qn('product_id')}, {qn('year')}, {qn('month')}) "
+            f"DO UPDATE SET {qn('quantity')} = {table}.{qn('quantity')} + EXCLUDED.{qn('quantity')}"
+        )
+        params = [
+            (product_id, year, month, sign * quantity)
+            for product_id, year, month, quantity in sales
+        ]
+        if not params:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        products_cache.bump_on_commit()
+
+    def remove(self, sales: Iterable[MonthlySales]) -> None:
+        """
+        Decrement the rollup by sales it counts.
+
+        The sales are added up per product and month and, as in `add`, written
+        with a single statement. Only the existing rows are updated.
+        """
+        totals: Counter[tuple[int, int, int]] = Counter()
+        for product_id, year, month, quantity in sales:
+            totals[product_id, year, month] += quantity
+        if not totals:
+            return
+        qn = connection.ops.quote_name
+        sql = (
+            f"UPDATE {qn(self.model._meta.db_table)} "
+            f"SET {qn('quantity')} = {qn('quantity')} - %s "
+            f"WHERE {qn('product_id')} = %s AND {qn('year')} = %s AND {qn('month')} = %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(quantity, *key) for key, quantity in totals.items()])
+        products_cache.bump_on_commit()
+
+    def rebuild(self, sales: Iterable[MonthlySales]) -> int:
+        """
+        Replace the whole rollup with the given sales.
+
+        Returns the number of rows created.
+        """
+        created = 0
+        rows = (
+            self.model(product_id=product_id, year=year, month=month, quantity=quantity)
+            for product_id, year, month, quantity in sales
+        )
+        with transaction.atomic():
+            self.all().delete()
+            while batch := list(islice(rows, self.batch_size)):
+                self.bulk_create(batch)
+                created += len(batch)
+            products_cache.bump_on_commit()
+        return created
+
+
+@final
+class ProductMonthlySales(models.Model):
+    """
+    Total quantity of a product sold in a calendar month (UTC).
+
+    Maintained incrementally by `Cart.save()`, `CartItem.save()`, `CartQuerySet.purchase()`
+    and the deletion of carts and cart items, and rebuilt from scratch by the
+    `backfill_monthly_sales` command. Bulk `update()` and `bulk_create()` of cart items
+    are not counted: run the command after them, as `populate` does.
+    """
+
+    objects: ProductMonthlySalesManager = ProductMonthlySalesManager()
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="monthly_sales")
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    quantity = models.BigIntegerField(default=0)
+
+    class Meta(TypedModelMeta):
+        verbose_name = "Product Monthly Sales"
+        verbose_name_plural = "Product Monthly Sales"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "year", "month"], name="product_monthly_sales_uniq"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product_id} {self.month:>02}/{self.year}: {self.quantity}"
+
+
+@final
+class SalesViewRefreshManager(models.Manager["SalesViewRefresh"]):
+    def refresh(self, concurrently: bool = True) -> SalesViewRefresh:
+        """
+        Refresh the monthly sales materialized view and log the run.
+
+        A concurrent refresh does not block readers of the view,
+        at the cost of being slower than a plain one.
+        """
+        _start = time.perf_counter()
+        refreshed_at = dt.datetime.now(tz=dt.timezone.utc)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                REFRESH_MONTHLY_SALES_VIEW_CONCURRENTLY
+                if concurrently
+                else REFRESH_MONTHLY_SALES_VIEW
+            )
+        products_cache.bump_on_commit()
+        return self.create(
+            refreshed_at=refreshed_at,
+            duration=time.perf_counter() - _start,
+            concurrently=concurrently,
+        )
+
+    def last_refreshed_at(self) -> dt.datetime | None:
+        last: dt.datetime | None = self.aggregate(last=models.Max("refreshed_at"))["last"]
+        return last
+
+
+@final
+class SalesViewRefresh(models.Model):
+    """
+    A run of `REFRESH MATERIALIZED VIEW` on the monthly sales view.
+
+    `refreshed_at` is taken before the refresh starts, so it is a lower bound
+    of the data freshness.
+    """
+
+    objects: SalesViewRefreshManager = SalesViewRefreshManager()
+
+    refreshed_at = models.DateTimeField(db_index=True)
+    duration = models.FloatField()
+    concurrently = models.BooleanField()
+
+    class Meta(TypedModelMeta):
+        verbose_name = "Sales View Refresh"
+        verbose_name_plural = "Sales View Refreshes"
+
+    def __str__(self) -> str:
+        return f"{self.refreshed_at:%Y-%m-%d %H:%M:%S} ({self.duration:.2f}s)"
@@ -0,0 +1,99 @@
+"""
+Sorting and pagination of the products aggregates.
+
+Every `ProductManager` backend pushes a `ProductsPage` into SQL: rows are
+ordered by one of the `ProductRow` fields (with the product id as a tiebreaker)
+and cut either with `LIMIT/OFFSET` or, for deep pages, with a keyset cursor
+pointing at the last row of the previous page.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+from collections.abc import Sequence
+from dataclasses import astuple, dataclass
+from typing import Any
+
+# Sort key -> position of the column in a `ProductRow`
+SORT_KEYS = {
+    "id": 0,
+    "name": 1,
+    "category": 2,
+    "price": 4,
+    "last_month_sales": 5,
+    "current_month_sales": 6,
+}
+
+
+@dataclass(frozen=True)
+class ProductsPage:
+    """
+    Parameters
+    ----------
+    order_by : str
+        One of `SORT_KEYS`, prefixed with `-` for descending order.
+    limit : int | None
+        The maximum number of rows to return, `None` for all of them.
+    offset : int
+        The number of rows to skip, can not be combined with `after`.
+    after : tuple[Any, int] | None
+        Keyset cursor: the sort value and the id of the last row of the previous page.
+    search : str
+        Only keep products whose name or category name contains it, case insensitive.
+    """
+
+    order_by: str = "id"
+    limit: int | None = None
+    offset: int = 0
+    after: tuple[Any, int] | None = None
+    search: str = ""
+
+    def __post_init__(self) -> None:
+        if self.sort_key not in SORT_KEYS:
+            raise ValueError(f"Can not order products by {self.order_by!r}")
+        if self.limit is not None and self.limit < 0:
+            raise ValueError("limit must not be negative")
+        if self.offset < 0:
+            raise ValueError("offset must not be negative")
+        if self.after is not None and self.offset:
+            raise ValueError("offset and after can not be used together")
+
+    @property
+    def sort_key(self) -> str:
+        return self.order_by.removeprefix("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.order_by.startswith("-")
+
+    @property
+    def search_pattern(self) -> str:
+        """
+        The `search` as a LIKE pattern, with the LIKE wildcards escaped.
+        """
+        escaped = self.search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    @property
+    def cache_key(self) -> str:
+        """
+        A short digest identifying the page, to be used in cache keys.
+        """
+        return hashlib.blake2b(repr(astuple(self)).encode(), digest_size=16).hexdigest()
+
+    def cursor_for(self, row: Sequence[Any]) -> str:
+        """
+        Return the opaque keyset cursor pointing right after the given `ProductRow`.
+        """
+        payload = json.dumps([row[SORT_KEYS[self.sort_key]], row[0]], default=str).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[Any, int]:
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return value, int(pk)
+        except (ValueError, TypeError) as exc:
+            raise ValueError(f"Invalid cursor {cursor!r}") from exc
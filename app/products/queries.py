@@ -0,0 +1,171 @@
+"""
+Raw SQL statements used by :class:`app.products.models.ProductManager`.
+
+Every statement selecting products returns the `ProductRow` columns,
+under the same names, so it can be wrapped by `paginated`.
+"""
+
+import functools
+
+from app.common.db import PreparedStatement
+from app.products.pagination import ProductsPage
+from app.products.ranking import RANK_EXPRESSIONS
+
+# Cart items carry the purchase time of their cart, only once it is purchased,
+# so a month of sales is a range scan of `cartitem_purchased_at_idx`. The bounds
+# have the type of the column, so that the months of a partitioned table
+# (see `app.customers.partitions`) are pruned when the statement is planned.
+GET_PRODUCTS = PreparedStatement(
+    name="get_products",
+    arg_types=("TIMESTAMPTZ", "TIMESTAMPTZ", "TIMESTAMPTZ", "TIMESTAMPTZ"),
+    sql="""
+    WITH this_month_items AS (
+            SELECT items.product_id
+                ,SUM(items.quantity) AS total
+            FROM customers_cartitem items
+            WHERE items.purchased_at >= %s
+                AND items.purchased_at < %s
+            GROUP BY items.product_id
+            )
+        ,previous_month_items AS (
+            SELECT items.product_id
+                ,SUM(items.quantity) AS total
+            FROM customers_cartitem items
+            WHERE items.purchased_at >= %s
+                AND items.purchased_at < %s
+            GROUP BY items.product_id
+            )
+
+    SELECT p.id
+        ,p.NAME AS name
+        ,c.NAME AS category
+        ,p.is_active
+        ,p.price
+        ,COALESCE(pm.total, 0) AS last_month_sales
+        ,COALESCE(tm.total, 0) AS current_month_sales
+    FROM products_product p
+    INNER JOIN products_category c ON c.id = p.category_id
+    LEFT JOIN previous_month_items pm ON p.id = pm.product_id
+    LEFT JOIN this_month_items tm ON p.id = tm.product_id
+    """,
+)
+
+# Per-product, per-month sums of purchased cart items, see the products 0003 migration.
+# The unique index on (month, product_id) allows REFRESH MATERIALIZED VIEW CONCURRENTLY.
+MONTHLY_SALES_VIEW = "products_monthly_sales_mv"
+
+REFRESH_MONTHLY_SALES_VIEW = f"REFRESH MATERIALIZED VIEW {MONTHLY_SALES_VIEW}"
+
+REFRESH_MONTHLY_SALES_VIEW_CONCURRENTLY = (
+    f"REFRESH MATERIALIZED VIEW CONCURRENTLY {MONTHLY_SALES_VIEW}"
+)
+
+GET_PRODUCTS_MATVIEW = PreparedStatement(
+    name="get_products_matview",
+    arg_types=("DATE", "DATE"),
+    sql=f"""
+    SELECT p.id
+        ,p.NAME AS name
+        ,c.NAME AS category
+        ,p.is_active
+        ,p.price
+        ,COALESCE(pm.quantity, 0) AS last_month_sales
+        ,COALESCE(tm.quantity, 0) AS current_month_sales
+    FROM products_product p
+    INNER JOIN products_category c ON c.id = p.category_id
+    LEFT JOIN {MONTHLY_SALES_VIEW} pm ON pm.product_id = p.id
+        AND pm.month = %s
+    LEFT JOIN {MONTHLY_SALES_VIEW} tm ON tm.product_id = p.id
+        AND tm.month = %s
+    """,
+)
+
+_SORT_KEY_TYPES = {
+    "id": "BIGINT",
+    "name": "TEXT",
+    "category": "TEXT",
+    "price": "NUMERIC",
+    "last_month_sales": "BIGINT",
+    "current_month_sales": "BIGINT",
+}
+
+
+@functools.cache
+def paginated(
+    statement: PreparedStatement,
+    order_by: str,
+    keyset: bool = False,
+    search: bool = False,
+) -> PreparedStatement:
+    """
+    Wrap a products statement with a search filter, ORDER BY, LIMIT and OFFSET.
+
+    The returned statement takes the parameters of `statement`, followed by
+    the search pattern (only if `search` is set), the keyset cursor (sort value
+    and id, only if `keyset` is set), the limit and the offset;
+    see `ProductManager._page_params`. Each combination is prepared
+    as a separate statement.
+    """
+    page = ProductsPage(order_by=order_by)
+    key, direction = page.sort_key, "DESC" if page.descending else "ASC"
+    name = f"{statement.name}_{key}_{direction.lower()}"
+    conditions = []
+    arg_types = list(statement.arg_types)
+    if search:
+        conditions.append("(p.name ILIKE %s OR p.category ILIKE %s)")
+        arg_types += ["TEXT", "TEXT"]
+        name += "_search"
+    if keyset:
+        conditions.append(f"(p.{key}, p.id) {'<' if page.descending else '>'} (%s, %s)")
+        arg_types += [_SORT_KEY_TYPES[key], "BIGINT"]
+        name += "_keyset"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return PreparedStatement(
+        name=name,
+        arg_types=(*arg_types, "BIGINT", "BIGINT"),
+        sql=f"""
+    SELECT p.*
+    FROM ({statement.sql}) p
+    {where}
+    ORDER BY p.{key} {direction}
+        ,p.id {direction}
+    LIMIT %s
+    OFFSET %s
+    """,
+    )
+
+
+@functools.cache
+def ranked(statement: PreparedStatement, by: str, per_category: bool = False) -> PreparedStatement:
+    """
+    Wrap a products statement to keep the products ranked first by `RANK_EXPRESSIONS[by]`,
+    in each category (ordered by name) if `per_category` is set.
+
+    The returned statement takes the parameters of `statement`, followed by
+    the number of products to keep.
+    """
+    partition = "PARTITION BY p.category " if per_category else ""
+    order = "r.category, r.rank" if per_category else "r.rank"
+    name = f"{statement.name}_top_{by}{'_per_category' if per_category else ''}"
+
+    return PreparedStatement(
+        name=name,
+        arg_types=(*statement.arg_types, "BIGINT"),
+        sql=f"""
+    SELECT r.id
+        ,r.name
+        ,r.category
+        ,r.is_active
+        ,r.price
+        ,r.last_month_sales
+        ,r.current_month_sales
+    FROM (
+        SELECT p.*
+            ,ROW_NUMBER() OVER ({partition}ORDER BY {RANK_EXPRESSIONS[by]} DESC, p.id) AS rank
+        FROM ({statement.sql}) p
+        ) r
+    WHERE r.rank <= %s
+    ORDER BY {order}
+    """,
+    )
@@ -0,0 +1,61 @@
+"""
+Top products of a month: the best sellers and the biggest movers.
+
+On PostgreSQL the `live` and `matview` backends rank the products in SQL with
+``ROW_NUMBER()``, see `queries.ranked`. The ORM backends stream their rows
+through `top_rows` instead, which keeps at most `n` of them per category in a
+heap, so memory grows with `n` rather than with the catalog. Both break ties
+by the lowest product id.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections.abc import Callable, Iterable
+from typing import Any, Literal
+
+Ranking = Literal["sellers", "movers"]
+RANKINGS: tuple[Ranking, ...] = ("sellers", "movers")
+
+# Ranking -> SQL expression of a `ProductRow` statement aliased `p`, highest first
+RANK_EXPRESSIONS = {
+    "sellers": "p.current_month_sales",
+    "movers": "ABS(p.current_month_sales - p.last_month_sales)",
+}
+
+# Positions of the columns of a `ProductRow`, the rows of the ORM are plain tuples
+_ID, _CATEGORY, _LAST_MONTH_SALES, _CURRENT_MONTH_SALES = 0, 2, 5, 6
+
+
+def rank_key(by: Ranking) -> Callable[[tuple[Any, ...]], tuple[int, int]]:
+    match by:
+        case "sellers":
+            return lambda row: (row[_CURRENT_MONTH_SALES], -row[_ID])
+        case "movers":
+            return lambda row: (abs(row[_CURRENT_MONTH_SALES] - row[_LAST_MONTH_SALES]), -row[_ID])
+    raise ValueError(f"Unknown ranking {by!r}")
+
+
+def top_rows(
+    rows: Iterable[tuple[Any, ...]], n: int, by: Ranking, per_category: bool = False
+) -> list[tuple[Any, ...]]:
+    """
+    Return the `n` highest ranked rows, by category name then rank if `per_category` is set.
+    """
+    key = rank_key(by)
+    if not per_category:
+        return heapq.nlargest(n, rows, key=key)
+
+    # Category -> min-heap of its best rows so far, the keys are unique thanks to the ids
+    heaps: dict[str, list[tuple[tuple[int, int], tuple[Any, ...]]]] = {}
+    for row in rows:
+        heap = heaps.setdefault(row[_CATEGORY], [])
+        if len(heap) < n:
+            heapq.heappush(heap, (key(row), row))
+        elif n:
+            heapq.heappushpop(heap, (key(row), row))
+    return [
+        row
+        for category in sorted(heaps)
+        for _, row in sorted(heaps[category], key=lambda item: item[0], reverse=True)
+    ]
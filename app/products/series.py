@@ -0,0 +1,145 @@
+"""
+Sales of many products over many periods, as a dense matrix.
+
+`ProductManager.sales_series` sums the cart items of the whole range in a
+single grouped query and fills a `SalesSeries`. Its quantities are one flat
+buffer of 64-bit integers (`array.array`), a row of periods per product, so
+that a year of daily sales of thousands of products takes a few megabytes and
+is handed to NumPy without a copy with `to_numpy`. Periods start at midnight
+UTC, weeks on Mondays, as the months of the sales aggregates.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any, Literal, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+Granularity = Literal["day", "week", "month"]
+GRANULARITIES: tuple[Granularity, ...] = ("day", "week", "month")
+
+
+def period_start(day: dt.date, granularity: Granularity) -> dt.date:
+    match granularity:
+        case "day":
+            return day
+        case "week":
+            return day - dt.timedelta(days=day.weekday())
+        case "month":
+            return day.replace(day=1)
+    raise ValueError(f"Unknown granularity {granularity!r}")
+
+
+def next_period(start: dt.date, granularity: Granularity) -> dt.date:
+    match granularity:
+        case "day":
+            return start + dt.timedelta(days=1)
+        case "week":
+            return start + dt.timedelta(days=7)
+        case "month":
+            return (start + dt.timedelta(days=31)).replace(day=1)
+    raise ValueError(f"Unknown granularity {granularity!r}")
+
+
+def period_starts(start: dt.date, end: dt.date, granularity: Granularity) -> list[dt.date]:
+    """
+    Return the start of every period from the one of `start` up to `end`, excluded.
+    """
+    periods = []
+    period = period_start(start, granularity)
+    while period < end:
+        periods.append(period)
+        try:
+            period = next_period(period, granularity)
+        except OverflowError:
+            # No period starts after `dt.date.max`
+            break
+    return periods
+
+
+def count_periods(start: dt.date, end: dt.date, granularity: Granularity) -> int:
+    """
+    Return the number of `period_starts`, without building them.
+    """
+    first = period_start(start, granularity)
+    if first >= end:
+        return 0
+    match granularity:
+        case "day":
+            return (end - first).days
+        case "week":
+            return -(-(end - first).days // 7)
+        case "month":
+            months = (end.year - first.year) * 12 + end.month - first.month
+            return months + (end.day > 1)
+    raise ValueError(f"Unknown granularity {granularity!r}")
+
+
+@dataclass(frozen=True)
+class SalesSeries:
+    granularity: Granularity
+    periods: list[dt.date]
+    product_ids: array[int]
+    # Quantity sold of every product in every period, row by row
+    quantities: array[int]
+
+    @classmethod
+    def from_totals(
+        cls,
+        granularity: Granularity,
+        periods: list[dt.date],
+        product_ids: Sequence[int],
+        totals: Iterable[tuple[int, dt.date, int]],
+    ) -> SalesSeries:
+        """
+        Build the matrix from `(product_id, period, quantity)` rows, other cells are 0.
+
+        Rows of other products, e.g. created meanwhile, are left out.
+        """
+        rows = {product_id: row for row, product_id in enumerate(product_ids)}
+        columns = {period: column for column, period in enumerate(periods)}
+        quantities = array("q", bytes(8 * len(product_ids) * len(periods)))
+        for product_id, period, quantity in totals:
+            if product_id in rows:
+                quantities[rows[product_id] * len(periods) + columns[period]] = quantity
+        return cls(
+            granularity=granularity,
+            periods=periods,
+            product_ids=array("q", product_ids),
+            quantities=quantities,
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.product_ids), len(self.periods)
+
+    def row(self, product_id: int) -> array[int]:
+        return self._row_at(self.product_ids.index(product_id))
+
+    def _row_at(self, row: int) -> array[int]:
+        start, stop = row * len(self.periods), (row + 1) * len(self.periods)
+        return self.quantities[start:stop]
+
+    def to_numpy(self) -> npt.NDArray[np.int64]:
+        """
+        Return the quantities as a products by periods matrix sharing the buffer.
+
+        NumPy is only needed by this method.
+        """
+        import numpy as np
+
+        return np.frombuffer(self.quantities, dtype=np.int64).reshape(self.shape)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "granularity": self.granularity,
+            "periods": [period.isoformat() for period in self.periods],
+            "product_ids": self.product_ids.tolist(),
+            "quantities": [self._row_at(row).tolist() for row in range(len(self.product_ids))],
+        }
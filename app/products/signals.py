@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.products.models import Category, Product, products_cache
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_products_cache(**kwargs: Any) -> None:  # noqa: U100
+    """
+    Drop the cached products aggregates once the change is committed.
+
+    Bulk writes send no signal and are handled by `CatalogQuerySet` instead.
+    """
+    products_cache.bump_on_commit()
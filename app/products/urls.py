@@ -2,6 +2,10 @@ from django.urls import path
 
 from . import views
 
+# django-stubs does not know about async views yet
 urlpatterns = [
-    path("", views.home, name="home"),
+    path("", views.home, name="home"),  # type: ignore[arg-type]
+    path("products/data/", views.products_data, name="products_data"),  # type: ignore[arg-type]
+    path("products/sales/", views.sales_series, name="sales_series"),  # type: ignore[arg-type]
+    path("products/top/", views.top_products, name="top_products"),  # type: ignore[arg-type]
 ]
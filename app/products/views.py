@@ -1,37 +1,281 @@
 import datetime as dt
 import time
+from typing import cast
 
-from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render
 from loguru import logger
 
 from app.common.utils import get_month_name
-from app.products.models import Product
+from app.common.views import alogin_required
+from app.products.models import Product, ProductRow
+from app.products.pagination import ProductsPage
+from app.products.ranking import Ranking, RANKINGS
+from app.products.series import count_periods, GRANULARITIES, Granularity, SalesSeries
 
+# Matches `data-page-length` of the products table
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 1000
 
-@login_required
-def home(request: HttpRequest) -> HttpResponse:
+# Days of sales series by default, and the most cells (products times periods) served
+DEFAULT_SERIES_DAYS = 30
+MAX_SERIES_CELLS = 1_000_000
+
+DEFAULT_TOP_PRODUCTS = 10
+MAX_TOP_PRODUCTS = 100
+
+# DataTables column index -> sort key, `None` if the column can not be sorted
+DATATABLES_COLUMNS = (
+    "id",
+    "name",
+    "category",
+    None,
+    "price",
+    "last_month_sales",
+    "current_month_sales",
+)
+
+
+def _get_page(request: HttpRequest) -> ProductsPage:
+    """
+    Build the page of products to show from the `order`, `limit`, `offset`,
+    `after` (keyset cursor) and `search` query parameters.
+
+    Raises `ValueError` if any of them is invalid.
+    """
+    after = request.GET.get("after")
+    limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return ProductsPage(
+        order_by=request.GET.get("order", "id"),
+        limit=min(limit, MAX_PAGE_SIZE),
+        offset=int(request.GET.get("offset", 0)),
+        after=ProductsPage.decode_cursor(after) if after else None,
+        search=request.GET.get("search", "").strip(),
+    )
+
+
+def _get_datatables_page(request: HttpRequest) -> ProductsPage:
     """
-    Fetch all products with aggregated data for current month and previous month sales.
+    Build the page of products to show from the DataTables server-side processing
+    parameters (https://datatables.net/manual/server-side).
+
+    Only the first ordering column is taken into account.
+    Raises `ValueError` if any of the parameters is invalid.
+    """
+    column = int(request.GET.get("order[0][column]", 0))
+    if not 0 <= column < len(DATATABLES_COLUMNS) or DATATABLES_COLUMNS[column] is None:
+        raise ValueError(f"Can not order by column {column}")
+    direction = request.GET.get("order[0][dir]", "asc")
+    if direction not in ("asc", "desc"):
+        raise ValueError(f"Unknown order direction {direction!r}")
+
+    length = int(request.GET.get("length", DEFAULT_PAGE_SIZE))
+    return ProductsPage(
+        order_by=f"{'-' if direction == 'desc' else ''}{DATATABLES_COLUMNS[column]}",
+        # DataTables asks for all the rows with a length of -1
+        limit=MAX_PAGE_SIZE if length < 0 else min(length, MAX_PAGE_SIZE),
+        offset=int(request.GET.get("start", 0)),
+        search=request.GET.get("search[value]", "").strip(),
+    )
+
+
+def _count_products(page: ProductsPage) -> tuple[int, int]:
+    """
+    Return the total number of products and the number of products matching the search.
+    """
+    records_total = Product.objects.count_products()
+    if not page.search:
+        return records_total, records_total
+    return records_total, Product.objects.count_products(search=page.search)
+
+
+@sync_to_async
+def _get_page_info(page: ProductsPage) -> tuple[dt.datetime | None, int, int]:
+    """
+    Return when the sales were computed at, and the numbers of products
+    from `_count_products`, in a single trip to the thread pool.
+    """
+    return Product.objects.get_sales_as_of(), *_count_products(page)
+
+
+def _set_staleness(response: HttpResponse, now: dt.datetime, sales_as_of: dt.datetime) -> None:
+    # Seconds since the sales were computed, for dashboards accepting bounded staleness
+    response["X-Sales-Staleness"] = str(int((now - sales_as_of).total_seconds()))
+
+
+@alogin_required
+async def home(request: HttpRequest) -> HttpResponse:
+    """
+    Fetch a page of products with aggregated data for current month and previous month sales.
     """
 
     _start = time.perf_counter()
 
+    try:
+        page = _get_page(request)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
     now = dt.datetime.now(tz=dt.timezone.utc)
     current_year, current_month = now.year, now.month
 
     logger.debug("Query started")
-    products = Product.objects.get_products_aggr(year=current_year, month=current_month)
-    products = products[:100]
+    products = await Product.objects.aget_products_aggr(
+        year=current_year, month=current_month, page=page
+    )
+    sales_as_of, records_total, records_filtered = await _get_page_info(page)
     logger.debug("Query took {:.2f} seconds", time.perf_counter() - _start)
 
-    return render(
+    # Rendering may load the user from the session
+    response = await sync_to_async(render)(
         request,
         "products.html",
         {
             "products": products,
             "last_month": get_month_name(current_month - 1),
             "current_month": get_month_name(current_month),
+            "sales_as_of": sales_as_of,
+            "page": page,
+            "next_after": page.cursor_for(products[-1]) if len(products) == page.limit else None,
+            "order_column": DATATABLES_COLUMNS.index(page.sort_key),
+            "order_dir": "desc" if page.descending else "asc",
+            "records_total": records_total,
+            "records_filtered": records_filtered,
         },
     )
+    if sales_as_of is not None:
+        _set_staleness(response, now, sales_as_of)
+    return response
+
+
+@alogin_required
+async def products_data(request: HttpRequest) -> JsonResponse:
+    """
+    Serve a page of the products table in the DataTables server-side processing format.
+    """
+
+    _start = time.perf_counter()
+
+    try:
+        draw = int(request.GET.get("draw", 0))
+        page = _get_datatables_page(request)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    now = dt.datetime.now(tz=dt.timezone.utc)
+    products = await Product.objects.aget_products_aggr(year=now.year, month=now.month, page=page)
+    sales_as_of, records_total, records_filtered = await _get_page_info(page)
+    logger.debug("Query took {:.2f} seconds", time.perf_counter() - _start)
+
+    response = JsonResponse(
+        {
+            "draw": draw,
+            "recordsTotal": records_total,
+            "recordsFiltered": records_filtered,
+            "data": [list(product) for product in products],
+            "salesAsOf": sales_as_of,
+        }
+    )
+    if sales_as_of is not None:
+        _set_staleness(response, now, sales_as_of)
+    return response
+
+
+def _get_series_params(
+    request: HttpRequest, today: dt.date
+) -> tuple[dt.date, dt.date, Granularity, list[int] | None]:
+    """
+    Read the `start` and `end` ISO dates, the `granularity` and the comma separated
+    `products` ids of a sales series, by default the last `DEFAULT_SERIES_DAYS` days
+    of all the products.
+
+    Raises `ValueError` if any of them is invalid.
+    """
+    end = dt.date.fromisoformat(
+        request.GET.get("end") or (today + dt.timedelta(days=1)).isoformat()
+    )
+    start = dt.date.fromisoformat(
+        request.GET.get("start") or (end - dt.timedelta(days=DEFAULT_SERIES_DAYS)).isoformat()
+    )
+    if start >= end:
+        raise ValueError("start must be before end")
+    granularity = request.GET.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}")
+    products = request.GET.get("products")
+    return (
+        start,
+        end,
+        cast(Granularity, granularity),
+        [int(product_id) for product_id in products.split(",")] if products else None,
+    )
+
+
+@sync_to_async
+def _get_sales_series(
+    start: dt.date, end: dt.date, granularity: Granularity, products: list[int] | None
+) -> SalesSeries:
+    rows = len(products) if products is not None else Product.objects.count_products()
+    # Counted before any period is built, and as one row without products
+    # so that the periods of a huge date range are never built either
+    cells = max(rows, 1) * count_periods(start, end, granularity)
+    if cells > MAX_SERIES_CELLS:
+        raise ValueError(f"{cells} cells requested, at most {MAX_SERIES_CELLS} are served")
+    return Product.objects.sales_series(start, end, granularity=granularity, products=products)
+
+
+@alogin_required
+async def sales_series(request: HttpRequest) -> JsonResponse:
+    """
+    Serve the quantities sold of products per period as columns:
+    the periods, the product ids and a row of quantities per product.
+    """
+    try:
+        params = _get_series_params(request, dt.datetime.now(tz=dt.timezone.utc).date())
+        series = await _get_sales_series(*params)
+    # Dates near `dt.date.min` and `dt.date.max` overflow
+    except (ValueError, OverflowError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(series.as_dict())
+
+
+def _get_top_params(request: HttpRequest) -> tuple[int, Ranking, bool]:
+    """
+    Read the number `n` of products, the ranking `by` and `per_category` of top products.
+
+    Raises `ValueError` if any of them is invalid.
+    """
+    n = int(request.GET.get("n", DEFAULT_TOP_PRODUCTS))
+    if not 0 < n <= MAX_TOP_PRODUCTS:
+        raise ValueError(f"n must be between 1 and {MAX_TOP_PRODUCTS}")
+    by = request.GET.get("by", "sellers")
+    if by not in RANKINGS:
+        raise ValueError(f"Unknown ranking {by!r}")
+    return n, cast(Ranking, by), request.GET.get("per_category", "") in ("1", "true")
+
+
+@alogin_required
+async def top_products(request: HttpRequest) -> JsonResponse:
+    """
+    Serve the best sellers or the biggest movers of the current month, overall or per category.
+    """
+    try:
+        n, by, per_category = _get_top_params(request)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    now = dt.datetime.now(tz=dt.timezone.utc)
+    products = await sync_to_async(Product.objects.get_top_products)(
+        year=now.year, month=now.month, n=n, by=by, per_category=per_category
+    )
+    return JsonResponse(
+        {
+            "by": by,
+            "perCategory": per_category,
+            "columns": list(ProductRow._fields),
+            "data": [list(product) for product in products],
+        }
+    )
@@ -6,7 +6,7 @@ from faker import Faker
 
 from app.common.utils import create_faker, get_month_ago, MultiBakery
 from app.customers.models import Cart, CartItem, Customer
-from app.products.models import Category, Product, ProductRow
+from app.products.models import Category, Product, ProductMonthlySales, ProductRow
 from tests.units.types import Client
 
 
@@ -122,6 +122,8 @@ def cart_items(carts: list[Cart], products: list[Product]) -> list[CartItem]:
                 )
             )
     CartItem.objects.bulk_create(_cart_items)
+    CartItem.objects.sync_purchased_at()
+    ProductMonthlySales.objects.rebuild(Cart.objects.monthly_sales())
     return _cart_items
 
 
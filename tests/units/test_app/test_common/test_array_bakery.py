@@ -0,0 +1,86 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from app.common.utils import ArrayBakery
+
+MIN_DATE = dt.datetime(2023, 1, 1, tzinfo=dt.timezone.utc)
+MAX_DATE = dt.datetime(2023, 12, 31, tzinfo=dt.timezone.utc)
+
+
+def test_make_cart_columns() -> None:
+    baker = ArrayBakery(seed=1)
+    columns = baker.make_cart_columns(
+        customer_ids=np.arange(1, 101), carts_per_customer=3, min_date=MIN_DATE, max_date=MAX_DATE
+    )
+
+    carts_per_customer = np.bincount(columns.customer_id)[1:]
+    assert carts_per_customer.min() >= 1
+    assert carts_per_customer.max() <= 4
+    assert 0.7 < columns.is_purchased.mean() < 0.9
+    assert columns.purchased_at.min() >= MIN_DATE.timestamp()
+    assert columns.purchased_at.max() <= MAX_DATE.timestamp()
+
+
+def test_make_cart_item_columns() -> None:
+    baker = ArrayBakery(seed=1)
+    columns = baker.make_cart_item_columns(
+        cart_ids=np.arange(1, 51), product_ids=np.arange(100, 110), cart_items_per_cart=2
+    )
+
+    assert set(np.unique(columns.cart_id)) == set(range(1, 51))
+    assert set(columns.product_id) <= set(range(100, 110))
+    assert 1 <= columns.quantity.min() <= columns.quantity.max() <= 10
+    rows = list(columns.rows())
+    assert len(rows) == len(columns)
+    assert all(type(value) is int for value in rows[0])
+
+
+def test_zipf_popularity() -> None:
+    weights = ArrayBakery(seed=1, zipf_exponent=1.2).product_weights(1000)
+
+    assert weights.sum() == pytest.approx(1)
+    # The 10 most popular products out of 1000 get about half of the sales
+    assert np.sort(weights)[-10:].sum() > 0.4
+    assert ArrayBakery(seed=1).product_weights(4).tolist() == [0.25] * 4
+
+
+def test_seasonality() -> None:
+    baker = ArrayBakery(seed=1, seasonality=0.9, peak_day=350)
+    times = baker.purchase_times(100_000, MIN_DATE, MAX_DATE)
+
+    months = times.astype("datetime64[s]").astype("datetime64[M]").astype(int) % 12 + 1
+    counts = np.bincount(months, minlength=13)
+    assert counts[12] > 3 * counts[6]
+
+
+def test_seasonality_bounds() -> None:
+    with pytest.raises(ValueError, match="seasonality"):
+        ArrayBakery(seasonality=2)
+
+
+@pytest.mark.parametrize("seasonality", [0, 0.5])
+@pytest.mark.parametrize(
+    "window", [dt.timedelta(0), dt.timedelta(hours=1), dt.timedelta(days=2, hours=3)]
+)
+def test_purchase_times_of_short_windows(seasonality: float, window: dt.timedelta) -> None:
+    start, end = MIN_DATE.timestamp(), (MIN_DATE + window).timestamp()
+    times = ArrayBakery(seed=1, seasonality=seasonality).purchase_times(
+        1000, MIN_DATE, MIN_DATE + window
+    )
+
+    assert times.min() >= start
+    assert times.max() <= end
+    # Spread over the window rather than piled up at its end
+    assert np.unique(times).size > 1 or start == end
+
+
+def test_invalid_arguments() -> None:
+    baker = ArrayBakery(seed=1)
+    with pytest.raises(ValueError, match="before min_date"):
+        baker.purchase_times(10, MAX_DATE, MIN_DATE)
+    with pytest.raises(ValueError, match="at least 1"):
+        baker.product_weights(0)
+    with pytest.raises(ValueError, match="at least one product"):
+        baker.make_cart_item_columns(cart_ids=np.arange(1, 5), product_ids=np.array([]))
@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from faker import Faker
+
+from app.common.utils import MultiBakery
+
+
+def test_password_pool(faker: Faker) -> None:
+    bakery = MultiBakery(faker=faker, password_pool_size=2)
+    users = [bakery.make_user(user_model=User) for _ in range(10)]
+
+    assert len({user.password for user in users}) == 2
+    assert users[0].password.startswith("pbkdf2_sha256$")
+
+
+def test_usernames_are_unique(faker: Faker) -> None:
+    bakery = MultiBakery(faker=faker, password_pool_size=1)
+    users = [bakery.make_user(user_model=User) for _ in range(2000)]
+
+    # Faker alone repeats some user names within 2000 users
+    assert len({user.username for user in users}) == len(users)
+
+
+def test_benchmark_password_hashing() -> None:
+    out = StringIO()
+    call_command("benchmark_password_hashing", customers=3, pool_sizes=[1], stdout=out)
+
+    assert "password_pool_size=1: 3 customers" in out.getvalue()
@@ -0,0 +1,151 @@
+import threading
+from collections.abc import Iterator
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+
+from app.common.cache import LocalCache, VersionedCache
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache() -> Iterator[None]:
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _get(versioned: VersionedCache, compute: "list[int]") -> int:
+    def _compute() -> int:
+        compute.append(1)
+        return len(compute)
+
+    return versioned.get_or_set(
+        "key", _compute, dumps=lambda v: str(v).encode(), loads=lambda d: int(d), timeout=60
+    )
+
+
+def test_get_or_set_caches_until_bump() -> None:
+    versioned = VersionedCache("test")
+    calls: list[int] = []
+    assert _get(versioned, calls) == 1
+    assert _get(versioned, calls) == 1
+
+    versioned.bump()
+    assert _get(versioned, calls) == 2
+
+
+def test_get_or_set_single_flight() -> None:
+    versioned = VersionedCache("test", poll_interval=0.01)
+    started, release = threading.Event(), threading.Event()
+    calls: list[int] = []
+
+    def _slow() -> int:
+        started.set()
+        release.wait(5)
+        calls.append(1)
+        return 42
+
+    owner = threading.Thread(
+        target=versioned.get_or_set,
+        args=("key", _slow, lambda v: str(v).encode(), lambda d: int(d), 60),
+    )
+    owner.start()
+    started.wait(5)
+
+    waiter_result: list[int] = []
+    waiter = threading.Thread(
+        target=lambda: waiter_result.append(
+            versioned.get_or_set(
+                "key", _slow, lambda v: str(v).encode(), lambda d: int(d), timeout=60
+            )
+        )
+    )
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert waiter_result == [42]
+    assert calls == [1]
+
+
+def test_local_cache_limits() -> None:
+    local = LocalCache(max_entries=2, max_bytes=10)
+    local.set("a", 1, size=4, timeout=60)
+    local.set("b", 2, size=4, timeout=60)
+    assert local.get("a") == 1
+    # "b" is the least recently used entry
+    local.set("c", 3, size=4, timeout=60)
+    assert local.get("b") is None
+    assert len(local) == 2
+
+    local.set("d", 4, size=8, timeout=60)
+    assert (local.get("a"), local.get("c"), local.get("d")) == (None, None, 4)
+    assert local.size == 8
+
+    local.set("e", 5, size=11, timeout=60)
+    assert local.get("e") is None
+
+    local.set("f", 6, size=1, timeout=-1)
+    assert local.get("f") is None
+
+
+def test_get_or_set_local() -> None:
+    versioned = VersionedCache("test", local=LocalCache(), version_check_interval=60)
+    other_worker = VersionedCache("test")
+    calls: list[int] = []
+    assert _get(versioned, calls) == 1
+
+    # Served from memory, the shared cache is not even asked for the version
+    other_worker.bump()
+    cache.clear()
+    assert _get(versioned, calls) == 1
+
+    versioned.clear_local()
+    assert _get(versioned, calls) == 2
+
+
+def test_aget_or_set() -> None:
+    versioned = VersionedCache("test", local=LocalCache())
+    calls: list[int] = []
+
+    async def _compute() -> int:
+        calls.append(1)
+        return len(calls)
+
+    def _aget() -> int:
+        return async_to_sync(versioned.aget_or_set)(
+            "key", _compute, dumps=lambda v: str(v).encode(), loads=lambda d: int(d), timeout=60
+        )
+
+    assert _aget() == 1
+    versioned.clear_local()
+    # Read back from the shared cache
+    assert _aget() == 1
+    assert _get(versioned, calls) == 1
+
+    versioned.bump()
+    assert _aget() == 2
+
+
+def test_local_entries_are_sized_by_sizeof() -> None:
+    local = LocalCache(max_bytes=100)
+    versioned = VersionedCache("test", local=local)
+
+    def _set(key: str, size: int) -> None:
+        versioned.get_or_set(
+            key,
+            lambda: key,
+            dumps=str.encode,
+            loads=bytes.decode,
+            timeout=60,
+            sizeof=lambda _: size,
+        )
+
+    _set("small", 60)
+    assert local.size == 60
+    # Too large for the local tier, even though its serialized form is tiny
+    _set("large", 1000)
+    assert local.size == 60
+    assert len(local) == 1
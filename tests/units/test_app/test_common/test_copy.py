@@ -0,0 +1,77 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.utils import timezone
+
+from app.common.db import abulk_load, acopy_rows, bulk_load, copy_rows, supports_copy
+from app.common.populate.report import TABLES
+from app.common.populate.script_async import AsyncPopulator
+from app.common.populate.script_threads import Populator
+from app.common.populate.settings import Settings
+from app.customers.models import CartItem
+from app.products.models import Category, Product
+
+pytestmark = pytest.mark.django_db
+
+FIELDS = ("id", "name", "created_at", "updated_at")
+
+
+def test_bulk_load() -> None:
+    # With COPY on PostgreSQL, bulk_create elsewhere
+    assert supports_copy() == (connection.vendor == "postgresql")
+    categories = bulk_load(Category, [Category(name="Books"), Category(name="Games")])
+    assert all(category.pk for category in categories)
+    assert set(Category.objects.values_list("name", flat=True)) == {"Books", "Games"}
+
+
+def test_copy_rows(categories: list[Category]) -> None:
+    now = timezone.now()
+    rows = [(category.pk, f"Copy {category.pk}", now, now) for category in categories]
+    new_row = (max(category.pk for category in categories) + 1, "New", now, now)
+    assert copy_rows(Category, FIELDS, [*rows, new_row], ignore_conflicts=True) == len(rows) + 1
+    # Conflicting rows are skipped
+    assert not Category.objects.filter(name__startswith="Copy").exists()
+    assert Category.objects.filter(name="New").exists()
+
+
+def test_populate_with_copy() -> None:
+    populator = Populator(settings=Settings(use_copy=True))
+    categories = populator.create_categories(amount=2)
+    products = populator.create_products(categories=categories, amount=3)
+    customers = populator.create_customers(amount=2)
+    carts = populator.create_carts(customers=customers, carts_per_customer=2)
+    populator.create_cart_items(carts=carts, products=products, cart_items_per_cart=2)
+
+    assert Product.objects.count() == 6
+    assert CartItem.objects.filter(cart__in=carts).count() >= len(carts)
+    assert set(CartItem.objects.values_list("product_id", flat=True)) <= {p.pk for p in products}
+
+
+# The async loaders use connections of their own, which must see the rows of the test
+@pytest.mark.django_db(transaction=True)
+def test_async_loaders(categories: list[Category]) -> None:
+    loaded = async_to_sync(abulk_load)(Category, [Category(name="Music")])
+    now = timezone.now()
+    rows = [(category.pk, "Copy", now, now) for category in categories]
+
+    assert loaded[0].pk == Category.objects.get(name="Music").pk
+    assert async_to_sync(acopy_rows)(Category, FIELDS, rows, ignore_conflicts=True) == len(rows)
+    assert not Category.objects.filter(name="Copy").exists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("generator", ["faker", "numpy"])
+def test_async_populator(generator: str) -> None:
+    settings = Settings(
+        categories_count=2,
+        products_per_category_count=2,
+        customers_count=2,
+        carts_per_customer_count=1,
+        cart_items_per_cart_count=1,
+        password_pool_size=1,
+        generator=generator,  # type: ignore[arg-type]
+    )
+    stats = async_to_sync(AsyncPopulator(settings=settings, task_name="1").populate)()
+
+    assert tuple(stats) == TABLES
+    assert stats["cart_items"].rows == CartItem.objects.count()
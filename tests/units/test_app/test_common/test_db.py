@@ -0,0 +1,82 @@
+from typing import Any, cast
+
+from django.db.backends.utils import CursorWrapper
+
+from app.common.db import PreparedStatement, PreparedStatementRegistry
+
+STATEMENT = PreparedStatement(
+    name="get_things",
+    sql="SELECT * FROM things WHERE a >= %s AND b < %s",
+    arg_types=("INTEGER", "TIMESTAMP"),
+)
+
+
+class RawConnection:
+    ...
+
+
+class FakeDatabase:
+    alias = "default"
+    in_atomic_block = False
+
+    def __init__(self) -> None:
+        self.connection = RawConnection()
+        self.server_statements: set[str] = set()
+
+
+class FakeCursor:
+    cursor = None
+
+    def __init__(self, db: FakeDatabase) -> None:
+        self.db = db
+        self.executed: list[str] = []
+        self._row: tuple[int] | None = None
+
+    def execute(self, sql: str, params: Any = None) -> None:
+        self.executed.append(sql)
+        if sql.startswith("SELECT 1 FROM pg_prepared_statements"):
+            self._row = (1,) if params[0] in self.db.server_statements else None
+        elif sql.startswith("PREPARE"):
+            self.db.server_statements.add(STATEMENT.name)
+
+    def fetchone(self) -> tuple[int] | None:
+        return self._row
+
+
+def test_prepared_statement_sql() -> None:
+    assert STATEMENT.prepare_sql == (
+        "PREPARE get_things(INTEGER, TIMESTAMP) AS " "SELECT * FROM things WHERE a >= $1 AND b < $2"
+    )
+    assert STATEMENT.execute_sql == "EXECUTE get_things(%s, %s)"
+
+
+def test_registry_prepares_once_per_connection() -> None:
+    registry = PreparedStatementRegistry()
+    db = FakeDatabase()
+
+    cursor = FakeCursor(db)
+    registry.execute(cast(CursorWrapper, cursor), STATEMENT, [1, 2])
+    registry.execute(cast(CursorWrapper, cursor), STATEMENT, [3, 4])
+    assert [sql.split()[0] for sql in cursor.executed] == [
+        "SELECT",
+        "PREPARE",
+        "EXECUTE",
+        "EXECUTE",
+    ]
+
+    # A new physical connection starts from scratch
+    db.connection, db.server_statements = RawConnection(), set()
+    cursor = FakeCursor(db)
+    registry.execute(cast(CursorWrapper, cursor), STATEMENT, [1, 2])
+    assert [sql.split()[0] for sql in cursor.executed] == ["SELECT", "PREPARE", "EXECUTE"]
+
+
+def test_registry_reuses_statement_prepared_elsewhere() -> None:
+    registry = PreparedStatementRegistry()
+    db = FakeDatabase()
+    db.server_statements.add(STATEMENT.name)
+
+    cursor = FakeCursor(db)
+    registry.execute(cast(CursorWrapper, cursor), STATEMENT, [1, 2])
+    assert [sql.split()[0] for sql in cursor.executed] == ["SELECT", "EXECUTE"]
+    assert registry.is_prepared(db.connection, STATEMENT.name)
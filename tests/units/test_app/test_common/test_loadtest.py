@@ -0,0 +1,85 @@
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+
+from app.common.loadtest import login_cookies, run_http, run_in_process, server_timing_queries
+from app.products.models import Product
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+class CookieEchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        status = 200 if "sessionid=" in self.headers.get("Cookie", "") else 403
+        self.send_response(status)
+        self.send_header("Server-Timing", 'cache;dur=1, db;dur=2.50;desc="3 queries"')
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args: object) -> None:  # noqa: U100
+        pass
+
+
+@pytest.fixture()
+def server_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CookieEchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_run_in_process(products: list[Product]) -> None:  # noqa: U100
+    report = run_in_process("/", login_cookies(), requests=6, concurrency=3, host="testserver")
+
+    assert report.statuses() == {200: 6}
+    assert all(queries > 0 for queries in report.queries())
+    assert sum(count for _, count in report.histogram()) == 6
+
+
+def test_run_in_process_without_session() -> None:
+    report = run_in_process("/", {}, requests=2, concurrency=1, host="testserver")
+
+    # Redirected to the login page
+    assert report.statuses() == {302: 2}
+
+
+def test_run_http(server_url: str) -> None:
+    report = run_http(server_url, login_cookies(), requests=5, concurrency=2)
+
+    assert report.statuses() == {200: 5}
+    assert report.queries() == [3] * 5
+
+
+def test_server_timing_queries() -> None:
+    assert server_timing_queries('db;dur=12.00;desc="7 queries", app;dur=20.00') == 7
+    assert server_timing_queries("") is None
+
+
+def test_loadtest_command(products: list[Product], tmp_path: Path) -> None:  # noqa: U100
+    report_path = tmp_path / "report.json"
+    out = StringIO()
+    call_command(
+        "loadtest",
+        requests=4,
+        concurrency=2,
+        warmup=1,
+        host="testserver",
+        json_path=str(report_path),
+        stdout=out,
+    )
+
+    assert "4 requests to asgi:/" in out.getvalue()
+    report = json.loads(report_path.read_text())
+    assert report["statuses"] == {"200": 4}
+    assert report["queries_per_request"]["max"] > 0
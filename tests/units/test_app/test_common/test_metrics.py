@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from app.common.cache import LocalCache, VersionedCache
+from app.common.metrics import render_metrics, set_pool_stats
+from app.products.models import Product
+from tests.units.types import Client
+
+pytestmark = pytest.mark.django_db
+
+
+def _sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_view(auth_client: Client) -> None:
+    auth_client.get(reverse("home"))
+    resp = auth_client.get(reverse("metrics"))
+
+    assert resp.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",status="200",view="home"}' in (
+        resp.content.decode()
+    )
+
+
+def test_request_duration_unresolved(client: Client) -> None:
+    def count() -> float:
+        # handler404 renders the error page with a 200
+        return sum(
+            _sample(
+                "http_request_duration_seconds_count",
+                view="unresolved",
+                method="GET",
+                status=status,
+            )
+            for status in ("200", "404")
+        )
+
+    before = count()
+    client.get("/nope/")
+
+    assert count() == before + 1
+
+
+def test_request_duration_unknown_method(client: Client) -> None:
+    def count(method: str) -> float:
+        return sum(
+            _sample(
+                "http_request_duration_seconds_count", view="home", method=method, status=status
+            )
+            for status in ("302", "405")
+        )
+
+    before = count("other")
+    client.generic("FOO", reverse("home"))
+
+    assert count("other") == before + 1
+    assert count("FOO") == 0
+
+
+def test_query_duration(current_year: int, current_month: int) -> None:
+    before = _sample("db_query_duration_seconds_count", query="get_products_rollup")
+    Product.objects.get_products_rollup(year=current_year, month=current_month)
+
+    assert _sample("db_query_duration_seconds_count", query="get_products_rollup") == before + 1
+
+
+def test_cache_requests() -> None:
+    cache.clear()
+    versioned = VersionedCache("metrics", local=LocalCache())
+
+    def get() -> int:
+        return versioned.get_or_set(
+            "key", lambda: 1, dumps=lambda v: str(v).encode(), loads=int, timeout=60
+        )
+
+    before = {
+        (tier, result): _sample("cache_requests_total", cache="metrics", tier=tier, result=result)
+        for tier in ("local", "shared")
+        for result in ("hit", "miss")
+    }
+    get()
+    get()
+    versioned.clear_local()
+    get()
+
+    def delta(tier: str, result: str) -> float:
+        after = _sample("cache_requests_total", cache="metrics", tier=tier, result=result)
+        return after - before[tier, result]
+
+    assert (delta("local", "miss"), delta("local", "hit")) == (2, 1)
+    assert (delta("shared", "miss"), delta("shared", "hit")) == (1, 1)
+
+
+def test_pool_stats() -> None:
+    set_pool_stats("test", {"pool_size": 3})
+
+    assert _sample("db_pool_stats", pool="test", stat="pool_size") == 3
+    assert b'db_pool_stats{pool="test",stat="pool_size"} 3.0' in render_metrics()
+
+
+def test_render_multiprocess_metrics(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    # Only the metrics files of the directory are read
+    assert b"db_pool_stats" not in render_metrics()
@@ -0,0 +1,37 @@
+import re
+
+import pytest
+from django.urls import reverse
+from pytest_django.fixtures import SettingsWrapper
+
+from app.common.db import collect_queries, record_query
+from app.products.models import Product
+from tests.units.types import Client
+
+pytestmark = pytest.mark.django_db
+
+
+def test_collect_queries_nested() -> None:
+    with collect_queries() as outer:
+        record_query("SELECT 1", 0.5, rows=1)
+        with collect_queries() as inner:
+            record_query("SELECT 2", 1.0, rows=2)
+
+    assert (outer.count, outer.seconds, outer.rows) == (2, 1.5, 3)
+    assert (inner.count, inner.slowest_sql) == (1, "SELECT 2")
+    assert outer.slowest_sql == "SELECT 2"
+
+
+def test_server_timing(auth_client: Client, products: list[Product]) -> None:  # noqa: U100
+    resp = auth_client.get(reverse("home"))
+
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', resp["Server-Timing"])
+    assert match is not None
+    assert int(match.group(1)) > 0
+    assert "app;dur=" in resp["Server-Timing"]
+
+
+def test_server_timing_not_sampled(auth_client: Client, settings: SettingsWrapper) -> None:
+    settings.QUERY_TIMING_SAMPLE_RATE = 0
+
+    assert "Server-Timing" not in auth_client.get(reverse("home"))
@@ -0,0 +1,116 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from app.common.db import pool
+from app.common.db.backends.postgresql import base
+from app.common.db.pool import PoolOptions
+
+SETTINGS = {
+    "NAME": "products",
+    "USER": "user",
+    "PASSWORD": "",
+    "HOST": "",
+    "PORT": "",
+    "TIME_ZONE": None,
+    "OPTIONS": {"pool": {"max_size": 3, "check": True}},
+}
+
+
+class FakeConnection:
+    autocommit = True
+    broken = False
+
+    def execute(self, sql: str) -> None:  # noqa: U100
+        if self.broken:
+            raise OSError("server closed the connection unexpectedly")
+
+
+class FakePool:
+    name = "pooled"
+
+    def __init__(self, *connections: FakeConnection) -> None:
+        self.idle = list(connections)
+        self.returned: list[FakeConnection] = []
+
+    def getconn(self) -> FakeConnection:
+        return self.idle.pop(0)
+
+    def putconn(self, conn: FakeConnection) -> None:
+        self.returned.append(conn)
+
+    def get_stats(self) -> dict[str, int]:
+        return {"pool_size": len(self.idle)}
+
+
+@pytest.fixture()
+def wrapper() -> base.DatabaseWrapper:
+    return base.DatabaseWrapper(SETTINGS, alias="pooled")
+
+
+def _use_pool(monkeypatch: pytest.MonkeyPatch, pool: FakePool) -> None:
+    def _get_pool(*args: Any) -> FakePool:  # noqa: U100
+        return pool
+
+    monkeypatch.setattr(base, "get_pool", _get_pool)
+
+
+def test_pool_options(wrapper: base.DatabaseWrapper) -> None:
+    assert wrapper.pool_options == PoolOptions(max_size=3, check=True)
+    assert "pool" not in wrapper.get_connection_params()
+
+
+def test_connection_is_given_back(
+    monkeypatch: pytest.MonkeyPatch, wrapper: base.DatabaseWrapper
+) -> None:
+    broken, healthy = FakeConnection(), FakeConnection()
+    broken.broken = True
+    pool = FakePool(broken, healthy)
+    _use_pool(monkeypatch, pool)
+
+    wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+    assert wrapper.connection is healthy
+    assert pool.returned == [broken]
+
+    wrapper.close()
+    assert wrapper.connection is None
+    assert pool.returned == [broken, healthy]
+
+
+def test_connection_closed_in_atomic_block_is_given_back(
+    monkeypatch: pytest.MonkeyPatch, wrapper: base.DatabaseWrapper
+) -> None:
+    connection = FakeConnection()
+    pool = FakePool(connection)
+    _use_pool(monkeypatch, pool)
+
+    wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+    wrapper.in_atomic_block = True
+    wrapper.close()
+    assert pool.returned == [connection]
+
+
+class FakeAsyncPool:
+    def __init__(self, **kwargs: Any) -> None:  # noqa: U100
+        self.opened = self.closed = False
+
+    async def open(self) -> None:
+        self.opened = True
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_async_pools_are_closed_with_their_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pool, "AsyncConnectionPool", FakeAsyncPool)
+
+    async def use_pool() -> tuple[Any, bool]:
+        async_pool = await pool.aget_pool("pooled", {}, PoolOptions())
+        await pool.aclose_pools()
+        return async_pool, asyncio.get_running_loop() in pool._async_pools
+
+    async_pool, kept = asyncio.run(use_pool())
+    assert async_pool.opened
+    assert async_pool.closed
+    assert not kept
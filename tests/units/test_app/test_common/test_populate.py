@@ -0,0 +1,197 @@
+import json
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import replace
+from io import StringIO
+from pathlib import Path
+from typing import Any
+
+import pytest
+from django.core.management import call_command
+from django.db.models import F
+
+from app.common.models import PopulateCheckpoint
+from app.common.populate import script_processes
+from app.common.populate.report import TABLES
+from app.common.populate.script_chunks import ChunkPopulator, populate_chunks
+from app.common.populate.script_processes import _shard, populate_processes, ProcessPopulator
+from app.common.populate.settings import Settings
+from app.customers.models import Cart, CartItem, Customer
+from app.products.models import Category, Product
+
+pytestmark = pytest.mark.django_db
+
+
+def test_shard() -> None:
+    assert [_shard(10, 4, index) for index in range(4)] == [3, 3, 2, 2]
+    assert sum(_shard(7, 3, index) for index in range(3)) == 7
+
+
+def test_process_populator_report() -> None:
+    settings = Settings(
+        categories_count=2,
+        products_per_category_count=3,
+        customers_count=2,
+        carts_per_customer_count=2,
+        cart_items_per_cart_count=2,
+    )
+    report = ProcessPopulator(settings=settings, worker=1, seed=42).populate()
+
+    assert (report.worker, report.seed) == (1, 42)
+    assert tuple(report.tables) == TABLES
+    assert report.tables["products"].rows == 6
+    assert report.tables["cart_items"].rows == CartItem.objects.count()
+
+
+def test_process_populator_numpy_generator() -> None:
+    settings = Settings(
+        categories_count=2,
+        products_per_category_count=3,
+        customers_count=3,
+        carts_per_customer_count=2,
+        cart_items_per_cart_count=2,
+        generator="numpy",
+        zipf_exponent=1.0,
+    )
+    report = ProcessPopulator(settings=settings, worker=1, seed=42).populate()
+
+    assert report.tables["carts"].rows == Cart.objects.count()
+    assert 3 <= Cart.objects.count() <= 9
+    assert report.tables["cart_items"].rows == CartItem.objects.count()
+    assert not Cart.objects.filter(is_purchased=True, purchased_at__isnull=True).exists()
+    assert not Cart.objects.filter(is_purchased=False, purchased_at__isnull=False).exists()
+
+
+class InlineExecutor:
+    """
+    Runs the workers of `populate_processes` in the test process, on its database.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:  # noqa: U100
+        pass
+
+    def __enter__(self) -> "InlineExecutor":
+        return self
+
+    def __exit__(self, *args: Any) -> None:  # noqa: U100
+        pass
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future[Any]:
+        future: Future[Any] = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def _assert_purchase_times_synced() -> None:
+    assert CartItem.objects.filter(cart__is_purchased=True).exists()
+    assert not CartItem.objects.filter(cart__is_purchased=True).exclude(
+        purchased_at=F("cart__purchased_at")
+    )
+    assert not CartItem.objects.filter(cart__is_purchased=False, purchased_at__isnull=False)
+
+
+# The workers close the connections, and the transaction of the test with them
+@pytest.mark.django_db(transaction=True)
+def test_populate_processes_syncs_purchase_times(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(script_processes, "ProcessPoolExecutor", InlineExecutor)
+    settings = Settings(
+        categories_count=2,
+        products_per_category_count=2,
+        customers_count=4,
+        carts_per_customer_count=2,
+        cart_items_per_cart_count=2,
+    )
+    populate_processes(settings, processes_count=2)
+    _assert_purchase_times_synced()
+
+
+def _chunks_settings() -> Settings:
+    return Settings(
+        categories_count=3,
+        products_per_category_count=2,
+        customers_count=5,
+        carts_per_customer_count=1,
+        cart_items_per_cart_count=1,
+        password_pool_size=1,
+    )
+
+
+def test_populate_chunks() -> None:
+    progress = list(
+        ChunkPopulator(settings=_chunks_settings(), run="test", chunk_size=4).populate()
+    )
+
+    # 2 categories of 2 products, then 4 customers of 1 cart item per chunk
+    assert [(p.stage, p.done) for p in progress] == [
+        ("catalog", 2),
+        ("catalog", 3),
+        ("customers", 4),
+        ("customers", 5),
+    ]
+    assert Product.objects.count() == 6
+    assert Customer.objects.count() == 5
+    checkpoints = PopulateCheckpoint.objects.filter(run="test")
+    assert all(checkpoint.is_done for checkpoint in checkpoints)
+    # Every customer also has a user
+    rows = sum(model.objects.count() for model in (Category, Product, Customer, Cart, CartItem))
+    assert sum(checkpoint.rows for checkpoint in checkpoints) == rows + Customer.objects.count()
+
+
+def test_populate_chunks_syncs_purchase_times() -> None:
+    populate_chunks(
+        replace(_chunks_settings(), carts_per_customer_count=2, cart_items_per_cart_count=2),
+        run="test",
+        chunk_size=4,
+    )
+    _assert_purchase_times_synced()
+
+
+def test_populate_chunks_resumes(monkeypatch: pytest.MonkeyPatch) -> None:
+    create_customers_chunk = ChunkPopulator.create_customers_chunk
+    calls = 0
+
+    def crash_on_second_chunk(self: ChunkPopulator, amount: int, products: list[Product]) -> int:
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("crash")
+        return create_customers_chunk(self, amount, products)
+
+    monkeypatch.setattr(ChunkPopulator, "create_customers_chunk", crash_on_second_chunk)
+    with pytest.raises(RuntimeError, match="crash"):
+        populate_chunks(_chunks_settings(), run="test", chunk_size=4)
+    assert Customer.objects.count() == 4
+    assert PopulateCheckpoint.objects.get(run="test", stage="customers").done == 4
+
+    checkpoints = populate_chunks(_chunks_settings(), run="test", chunk_size=4)
+
+    assert [(checkpoint.stage, checkpoint.done) for checkpoint in checkpoints] == [
+        ("catalog", 3),
+        ("customers", 5),
+    ]
+    assert Category.objects.count() == 3
+    assert Customer.objects.count() == 5
+    _assert_purchase_times_synced()
+
+
+def test_populate_command(tmp_path: Path) -> None:
+    out = StringIO()
+    report_path = tmp_path / "report.json"
+    call_command(
+        "populate",
+        engine="chunks",
+        categories_count=2,
+        products_per_category_count=2,
+        customers_count=2,
+        password_pool_size=1,
+        json_path=str(report_path),
+        stdout=out,
+    )
+
+    report = json.loads(report_path.read_text())
+    assert report["engine"] == "chunks"
+    assert report["settings"]["categories_count"] == 2
+    assert report["peak_rss"] > 0
+    assert report["stages"]["catalog"]["rows"] == 6
+    assert report["rows"] == sum(stage["rows"] for stage in report["stages"].values())
+    assert "catalog" in out.getvalue()
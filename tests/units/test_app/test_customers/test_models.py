@@ -0,0 +1,211 @@
+import datetime as dt
+from typing import Any
+
+import pytest
+from django.core.management import call_command
+
+from app.customers.models import Cart, CartItem, Customer
+from app.products.models import Product, ProductMonthlySales, ProductRow
+
+pytestmark = pytest.mark.django_db
+
+
+def _rollup() -> dict[tuple[int, int, int], int]:
+    return {
+        (row.product_id, row.year, row.month): row.quantity
+        for row in ProductMonthlySales.objects.all()
+    }
+
+
+def test_cart_save_updates_monthly_sales(
+    customers: list[Customer],
+    products: list[Product],
+    now: dt.datetime,
+) -> None:
+    cart = Cart.objects.create(customer=customers[0])
+    CartItem.objects.create(cart=cart, product=products[0], quantity=3)
+    assert _rollup() == {}
+
+    cart.is_purchased = True
+    cart.save()
+    assert _rollup() == {(products[0].pk, now.year, now.month): 3}
+
+    # Saving again must not count the cart twice
+    cart.save()
+    assert _rollup() == {(products[0].pk, now.year, now.month): 3}
+
+    cart.is_purchased = False
+    cart.save()
+    assert _rollup() == {(products[0].pk, now.year, now.month): 0}
+
+
+def test_cart_bulk_purchase_updates_monthly_sales(
+    customers: list[Customer],
+    products: list[Product],
+    now: dt.datetime,
+) -> None:
+    carts = [Cart.objects.create(customer=customer) for customer in customers[:2]]
+    for cart in carts:
+        CartItem.objects.create(cart=cart, product=products[0], quantity=2)
+        CartItem.objects.create(cart=cart, product=products[1], quantity=1)
+
+    assert Cart.objects.filter(pk__in=[cart.pk for cart in carts]).purchase(now) == 2
+    assert _rollup() == {
+        (products[0].pk, now.year, now.month): 4,
+        (products[1].pk, now.year, now.month): 2,
+    }
+
+    # Already purchased carts are skipped
+    assert Cart.objects.all().purchase(now) == 0
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_rollup_matches_live_aggregation(current_year: int, current_month: int) -> None:
+    ProductMonthlySales.objects.all().delete()
+    call_command("backfill_monthly_sales")
+
+    def by_id(rows: list[ProductRow]) -> dict[int, tuple[int, int]]:
+        return {row[0]: (row[-2], row[-1]) for row in rows}
+
+    assert by_id(Product.objects.get_products_rollup(current_year, current_month)) == by_id(
+        Product.objects.get_products_live(current_year, current_month)
+    )
+
+
+def _items_purchased_at(cart: Cart) -> set[dt.datetime | None]:
+    return set(cart.cart_items.values_list("purchased_at", flat=True))
+
+
+def test_cart_items_follow_purchase_time(
+    customers: list[Customer],
+    products: list[Product],
+    now: dt.datetime,
+) -> None:
+    cart = Cart.objects.create(customer=customers[0])
+    CartItem.objects.create(cart=cart, product=products[0])
+    assert _items_purchased_at(cart) == {None}
+
+    cart.is_purchased, cart.purchased_at = True, now
+    cart.save()
+    CartItem.objects.create(cart=cart, product=products[1])
+    assert _items_purchased_at(cart) == {now}
+
+    cart.is_purchased = False
+    cart.save()
+    assert _items_purchased_at(cart) == {None}
+
+    Cart.objects.filter(pk=cart.pk).purchase(now)
+    assert _items_purchased_at(cart) == {now}
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_backfill_purchased_at(carts: list[Cart]) -> None:
+    CartItem.objects.update(purchased_at=None)
+    call_command("backfill_purchased_at", batch_size=7)
+
+    for cart in carts:
+        assert _items_purchased_at(cart) == {cart.purchased_at if cart.is_purchased else None}
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_sync_purchased_at_of_new_items(carts: list[Cart], products: list[Product]) -> None:
+    CartItem.objects.update(purchased_at=None)
+    last_pk = CartItem.objects.last_pk()
+    cart = next(cart for cart in carts if cart.is_purchased)
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for product in products)
+
+    assert CartItem.objects.filter(pk__gt=last_pk).sync_purchased_at() == len(products)
+    assert CartItem.objects.filter(pk__lte=last_pk, purchased_at__isnull=False).count() == 0
+    assert CartItem.objects.none().last_pk() == 0
+
+
+def _expected_rollup() -> dict[tuple[int, int, int], int]:
+    return {
+        (product_id, year, month): quantity
+        for product_id, year, month, quantity in Cart.objects.monthly_sales()
+    }
+
+
+def _nonzero_rollup() -> dict[tuple[int, int, int], int]:
+    return {key: quantity for key, quantity in _rollup().items() if quantity}
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_deleting_purchased_carts_updates_monthly_sales(
+    carts: list[Cart], customers: list[Customer]
+) -> None:
+    Cart.objects.get(pk=carts[1].pk).delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+    # Carts go along with their customer
+    Customer.objects.get(pk=customers[3].pk).delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+    # And their rollup rows along with the product
+    Product.objects.get(pk=CartItem.objects.values_list("product_id", flat=True)[0]).delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_deleting_in_bulk_updates_monthly_sales(carts: list[Cart], products: list[Product]) -> None:
+    CartItem.objects.filter(product=products[0]).delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+    Cart.objects.filter(pk__in=[carts[1].pk, carts[2].pk]).delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+
+def test_deleting_a_cart_does_not_load_its_items(
+    carts: list[Cart], products: list[Product], django_assert_num_queries: Any
+) -> None:
+    cart = Cart.objects.get(pk=carts[1].pk)
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for product in products)
+    CartItem.objects.sync_purchased_at()
+    ProductMonthlySales.objects.rebuild(Cart.objects.monthly_sales())
+
+    # Sales of the cart, the rollup update and the deletes, whatever the number of items
+    with django_assert_num_queries(4):
+        cart.delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_changing_items_of_purchased_carts_updates_monthly_sales(
+    carts: list[Cart], products: list[Product]
+) -> None:
+    item = CartItem.objects.get(cart=carts[1], product=products[0])
+    item.quantity = 5
+    item.save()
+    assert _nonzero_rollup() == _expected_rollup()
+
+    item.product = products[1]
+    item.save()
+    assert _nonzero_rollup() == _expected_rollup()
+
+    CartItem.objects.create(cart=carts[2], product=products[0], quantity=2)
+    assert _nonzero_rollup() == _expected_rollup()
+
+    item.delete()
+    assert _nonzero_rollup() == _expected_rollup()
+
+    # Items of unpurchased carts are not sales
+    CartItem.objects.create(cart=carts[0], product=products[0], quantity=7)
+    assert _nonzero_rollup() == _expected_rollup()
+
+
+@pytest.mark.usefixtures("cart_items")
+def test_saving_an_item_queries_its_cart_once(
+    carts: list[Cart], products: list[Product], django_assert_num_queries: Any
+) -> None:
+    cart = Cart.objects.get(pk=carts[1].pk)
+    # The insert and the rollup update, in a savepoint
+    with django_assert_num_queries(4):
+        CartItem.objects.create(cart=cart, product=products[0], quantity=2)
+
+    item = CartItem.objects.filter(cart=cart).first()
+    assert item is not None
+    item.quantity += 1
+    # The previous row joined to its cart, the update and the rollup updates, in a savepoint
+    with django_assert_num_queries(6):
+        item.save()
+    assert _nonzero_rollup() == _expected_rollup()
@@ -0,0 +1,161 @@
+import datetime as dt
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app.customers.models import Cart, CartItem, Customer
+from app.customers.partitions import (
+    add_months,
+    convert,
+    DEFAULT_PARTITION,
+    ensure_partitions,
+    expired_partitions,
+    is_partitioned,
+    list_partitions,
+    missing_months,
+    month_start,
+    partition_month,
+    partition_name,
+)
+from app.products.models import Product, SalesViewRefresh
+from app.products.queries import MONTHLY_SALES_VIEW
+
+requires_postgresql = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Partitioning is only supported on PostgreSQL"
+)
+
+
+def test_partition_names() -> None:
+    assert partition_name(dt.date(2023, 1, 1)) == "customers_cartitem_p2023_01"
+    assert partition_month("customers_cartitem_p2023_01") == dt.date(2023, 1, 1)
+    assert partition_month("customers_cartitem_default") is None
+    assert add_months(dt.date(2023, 11, 1), 3) == dt.date(2024, 2, 1)
+    assert add_months(dt.date(2023, 1, 1), -1) == dt.date(2022, 12, 1)
+
+
+def test_missing_months() -> None:
+    existing = ["customers_cartitem_default", "customers_cartitem_p2023_12"]
+
+    assert missing_months(existing, dt.date(2023, 11, 15), dt.date(2024, 1, 1)) == [
+        dt.date(2023, 11, 1),
+        dt.date(2024, 1, 1),
+    ]
+
+
+def test_expired_partitions() -> None:
+    existing = [partition_name(dt.date(2023, month, 1)) for month in range(1, 13)]
+    existing.append("customers_cartitem_default")
+
+    # The current month and the previous one are kept
+    assert expired_partitions(existing, dt.date(2023, 3, 20), retain=2) == [
+        "customers_cartitem_p2023_01"
+    ]
+
+
+@pytest.mark.skipif(connection.vendor == "postgresql", reason="Runs on other databases")
+@pytest.mark.django_db()
+def test_partition_command_requires_postgresql() -> None:
+    with pytest.raises(CommandError, match="only supported on PostgreSQL"):
+        call_command("partition_cart_items")
+
+
+@requires_postgresql
+@pytest.mark.django_db()
+@pytest.mark.usefixtures("cart_items")
+def test_convert_keeps_the_monthly_sales_view(current_year: int, current_month: int) -> None:
+    SalesViewRefresh.objects.refresh(concurrently=False)
+    rows = Product.objects.get_products_matview(year=current_year, month=current_month)
+
+    assert convert(ahead=1, today=timezone.now().date()) == CartItem.objects.count()
+
+    with connection.cursor() as cursor:
+        assert is_partitioned(cursor)
+        cursor.execute(f"SELECT COUNT(*) FROM {MONTHLY_SALES_VIEW}")
+        (view_rows,) = cursor.fetchone()
+    assert view_rows > 0
+    assert Product.objects.get_products_matview(year=current_year, month=current_month) == rows
+    # A concurrent refresh needs the unique index of the view
+    SalesViewRefresh.objects.refresh(concurrently=True)
+    assert Product.objects.get_products_matview(year=current_year, month=current_month) == rows
+
+
+@requires_postgresql
+@pytest.mark.django_db()
+@pytest.mark.usefixtures("cart_items")
+def test_ensure_partitions_moves_rows_out_of_the_default_partition(
+    customers: list[Customer], products: list[Product]
+) -> None:
+    today = timezone.now().date()
+    convert(ahead=0, today=today)
+    next_month = add_months(month_start(today), 1)
+    cart = Cart.objects.create(
+        customer=customers[0],
+        is_purchased=True,
+        purchased_at=dt.datetime(next_month.year, next_month.month, 2, tzinfo=dt.timezone.utc),
+    )
+    item = CartItem.objects.create(cart=cart, product=products[0], quantity=1)
+
+    assert ensure_partitions(ahead=1, today=today) == [partition_name(next_month)]
+
+    with connection.cursor() as cursor:
+        assert partition_name(next_month) in list_partitions(cursor)
+        cursor.execute(f"SELECT id FROM {partition_name(next_month)}")
+        assert cursor.fetchall() == [(item.pk,)]
+        cursor.execute(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION} WHERE id = %s", [item.pk])
+        assert cursor.fetchone() == (0,)
+
+
+@requires_postgresql
+@pytest.mark.django_db()
+@pytest.mark.usefixtures("cart_items")
+def test_partitioned_cart_items_follow_purchases(
+    carts: list[Cart], current_year: int, current_month: int
+) -> None:
+    convert(ahead=1, today=timezone.now().date())
+    cart = Cart.objects.get(pk=carts[0].pk)
+    cart.is_purchased = True
+    cart.save()
+
+    # The items of the cart moved from the default partition to the one of the month
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION} WHERE cart_id = %s", [cart.pk])
+        assert cursor.fetchone() == (0,)
+    assert Product.objects.get_products_raw_pg(
+        year=current_year, month=current_month
+    ) == Product.objects.get_products_orm_fallback(year=current_year, month=current_month)
+
+    Cart.objects.filter(pk=cart.pk).delete()
+    assert not CartItem.objects.filter(cart_id=cart.pk).exists()
+
+
+@requires_postgresql
+@pytest.mark.django_db()
+@pytest.mark.usefixtures("cart_items")
+def test_partition_command_archives_old_months() -> None:
+    today = timezone.now().date()
+    oldest_kept = add_months(month_start(today), -1)
+    old_items = CartItem.objects.filter(purchased_at__lt=oldest_kept).count()
+    total = CartItem.objects.count()
+    out = StringIO()
+
+    call_command("partition_cart_items", convert=True, ahead=1, retain=2, stdout=out)
+
+    assert f"Partitioned customers_cartitem: {total} rows" in out.getvalue()
+    assert old_items > 0
+    assert CartItem.objects.count() == total - old_items
+    with connection.cursor() as cursor:
+        partitions = list_partitions(cursor)
+        assert partition_name(add_months(month_start(today), 1)) in partitions
+        assert all(
+            month is None or month >= oldest_kept for month in map(partition_month, partitions)
+        )
+        cursor.execute(
+            "SELECT COUNT(*) FROM pg_tables WHERE schemaname = 'archive' AND tablename LIKE %s",
+            ["customers_cartitem_p%"],
+        )
+        (archived,) = cursor.fetchone()
+    assert archived > 0
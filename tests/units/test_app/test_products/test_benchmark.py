@@ -0,0 +1,87 @@
+import json
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from app.common.utils import percentile
+from app.customers.models import CartItem
+from app.products.benchmark import (
+    BACKENDS,
+    benchmark_backend,
+    find_regressions,
+    POSTGRESQL_BACKENDS,
+)
+from app.products.models import Product
+
+pytestmark = pytest.mark.django_db
+
+
+def test_percentile() -> None:
+    samples = [float(sample) for sample in range(1, 101)]
+
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+    with pytest.raises(ValueError, match="no samples"):
+        percentile([], 50)
+
+
+# Cold runs reconnect, which ends the transaction of a test
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_backend(
+    cart_items: list[CartItem],  # noqa: U100
+    current_year: int,
+    current_month: int,
+) -> None:
+    benchmark = benchmark_backend(
+        "orm_fallback", year=current_year, month=current_month, cold_runs=1, warm_runs=5
+    )
+
+    assert benchmark.rows == Product.objects.count()
+    assert len(benchmark.warm.samples) == 5
+    assert set(benchmark.as_dict()["warm"]) == {"p50", "p95", "p99", "samples"}
+    # EXPLAIN (ANALYZE, BUFFERS) is PostgreSQL only
+    assert bool(benchmark.explain) == (connection.vendor == "postgresql")
+
+    baseline = {"backends": {"orm_fallback": {"warm": {"p95": 1e-9}}}}
+    assert [regression.backend for regression in find_regressions(baseline, [benchmark])] == [
+        "orm_fallback"
+    ]
+
+
+@pytest.mark.skipif(connection.vendor == "postgresql", reason="Runs on other databases")
+def test_benchmark_backend_requires_postgresql() -> None:
+    with pytest.raises(ValueError, match="requires PostgreSQL"):
+        benchmark_backend("raw_pg", year=2023, month=10)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_products_command(
+    cart_items: list[CartItem], tmp_path: Path  # noqa: U100
+) -> None:
+    baseline = tmp_path / "baseline.json"
+    out = StringIO()
+    call_command(
+        "benchmark_products",
+        baseline=baseline,
+        save_baseline=True,
+        cold_runs=1,
+        warm_runs=3,
+        stdout=out,
+    )
+
+    saved = json.loads(baseline.read_text())
+    expected = set(BACKENDS)
+    if connection.vendor != "postgresql":
+        expected -= set(POSTGRESQL_BACKENDS)
+    assert set(saved["backends"]) == expected
+    assert saved["dataset"]["cart_items"] == len(cart_items)
+
+    saved["backends"]["rollup"]["warm"]["p95"] = 1e-9
+    baseline.write_text(json.dumps(saved))
+    with pytest.raises(CommandError, match="rollup: warm.p95"):
+        call_command("benchmark_products", baseline=baseline, warm_runs=3, stdout=out)
@@ -0,0 +1,41 @@
+import datetime as dt
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from app.common.db import capture_sql, explain_plan
+from app.customers.models import Cart, CartItem
+
+pytestmark = pytest.mark.django_db
+
+
+def test_explain_plan_partial_index(carts: list[Cart], now: dt.datetime) -> None:  # noqa: U100
+    if connection.vendor == "postgresql":
+        # A few rows are read faster without an index, until the test transaction ends
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    queryset = Cart.objects.filter(
+        is_purchased=True, purchased_at__gte=now - dt.timedelta(days=30), purchased_at__lt=now
+    )
+    plan = explain_plan(capture_sql(lambda: list(queryset)))
+
+    assert "cart_purchased_at_paid_idx" in plan.indexes
+    assert plan.lines
+
+
+def test_explain_plan_full_scan(carts: list[Cart]) -> None:  # noqa: U100
+    plan = explain_plan(capture_sql(lambda: list(Cart.objects.filter(is_purchased=False))))
+
+    assert plan.indexes == {}
+    assert plan.seq_scans == {Cart._meta.db_table}
+
+
+def test_advise_indexes_command(cart_items: list[CartItem]) -> None:  # noqa: U100
+    out = StringIO()
+    call_command("advise_indexes", stdout=out)
+
+    assert "orm_fallback" in out.getvalue()
+    assert "cart_purchased_at_paid_idx" in out.getvalue()
+    assert "cartitem_cart_covering_idx" in out.getvalue()
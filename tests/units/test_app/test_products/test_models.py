@@ -0,0 +1,268 @@
+import datetime as dt
+from typing import Any
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Sum
+from pytest_django.fixtures import SettingsWrapper
+
+from app.common.db import aclose_pools, PreparedStatement
+from app.customers.models import CartItem
+from app.products import models as product_models
+from app.products.models import (
+    _dump_rows,
+    _rows_size,
+    Category,
+    Product,
+    ProductRow,
+    products_cache,
+    SalesViewRefresh,
+)
+from app.products.pagination import ProductsPage
+from app.products.queries import GET_PRODUCTS, GET_PRODUCTS_MATVIEW, paginated, ranked
+from app.products.ranking import Ranking
+from app.products.series import count_periods, Granularity, period_starts
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize("backend", ["rollup", "live", "matview"])
+def test_get_products_aggr_backends(
+    settings: SettingsWrapper,
+    products_rows: list[ProductRow],
+    current_year: int,
+    current_month: int,
+    backend: str,
+) -> None:
+    settings.PRODUCTS_AGGREGATION_BACKEND = backend
+    if backend == "matview" and connection.vendor == "postgresql":
+        SalesViewRefresh.objects.refresh(concurrently=False)
+    rows = Product.objects.get_products_aggr(year=current_year, month=current_month)
+    assert sorted(rows) == sorted(products_rows)
+
+
+@pytest.mark.skipif(connection.vendor == "postgresql", reason="Runs on other databases")
+def test_get_sales_as_of_is_realtime_without_matview(settings: SettingsWrapper) -> None:
+    settings.PRODUCTS_AGGREGATION_BACKEND = "matview"
+    # SQLite falls back to the rollup, which is always up to date
+    assert Product.objects.get_sales_as_of() is None
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="Requires PostgreSQL")
+def test_get_sales_as_of_is_the_last_matview_refresh(settings: SettingsWrapper) -> None:
+    settings.PRODUCTS_AGGREGATION_BACKEND = "matview"
+    refresh = SalesViewRefresh.objects.refresh(concurrently=False)
+    assert Product.objects.get_sales_as_of() == refresh.refreshed_at
+
+
+def test_get_products_aggr_unknown_backend(settings: SettingsWrapper) -> None:
+    settings.PRODUCTS_AGGREGATION_BACKEND = "nope"
+    with pytest.raises(ImproperlyConfigured):
+        Product.objects.get_products_aggr(year=2023, month=10)
+
+
+@pytest.mark.parametrize("statement", [GET_PRODUCTS, GET_PRODUCTS_MATVIEW])
+@pytest.mark.parametrize("keyset", [True, False])
+def test_paginated_statements(statement: PreparedStatement, keyset: bool) -> None:
+    page = paginated(statement, "-current_month_sales", keyset=keyset)
+    assert page.sql.count("%s") == len(page.arg_types)
+    assert len(page.name) < 64
+    assert "ORDER BY p.current_month_sales DESC" in page.sql
+    assert ("(p.current_month_sales, p.id) < (%s, %s)" in page.sql) is keyset
+
+
+@pytest.mark.parametrize("statement", [GET_PRODUCTS, GET_PRODUCTS_MATVIEW])
+@pytest.mark.parametrize("per_category", [True, False])
+def test_ranked_statements(statement: PreparedStatement, per_category: bool) -> None:
+    top = ranked(statement, "movers", per_category=per_category)
+    assert top.sql.count("%s") == len(top.arg_types)
+    assert len(top.name) < 64
+    assert "ABS(p.current_month_sales - p.last_month_sales) DESC, p.id" in top.sql
+    assert ("PARTITION BY p.category" in top.sql) is per_category
+
+
+def test_get_products_aggr_cache(
+    settings: SettingsWrapper,
+    products_rows: list[ProductRow],
+    products: list[Product],
+    current_year: int,
+    current_month: int,
+    django_assert_num_queries: Any,
+    django_capture_on_commit_callbacks: Any,
+) -> None:
+    settings.PRODUCTS_CACHE_TIMEOUT = 60
+    cache.clear()
+    products_cache.clear_local()
+    rows = Product.objects.get_products_aggr(year=current_year, month=current_month)
+    assert sorted(rows) == sorted(products_rows)
+
+    with django_assert_num_queries(0):
+        assert Product.objects.get_products_aggr(year=current_year, month=current_month) == rows
+
+    with django_capture_on_commit_callbacks(execute=True):
+        products[0].name = "Renamed"
+        products[0].save()
+    rows = Product.objects.get_products_aggr(year=current_year, month=current_month)
+    assert next(row[1] for row in rows if row[0] == products[0].pk) == "Renamed"
+    cache.clear()
+
+
+def test_rows_size_counts_decoded_rows(products_rows: list[ProductRow]) -> None:
+    rows = products_rows * 100
+    # Decoded rows take far more memory than their compressed JSON
+    assert _rows_size(rows) > 10 * len(_dump_rows(rows))
+    assert _rows_size([]) > 0
+
+
+def test_bulk_writes_invalidate_products_cache(
+    products: list[Product],
+    categories: list[Category],
+    django_capture_on_commit_callbacks: Any,
+) -> None:
+    cache.clear()
+    products_cache.clear_local()
+    version = products_cache.get_version()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Product.objects.filter(pk=products[0].pk).update(name="Renamed")
+    assert products_cache.get_version() != version
+    version = products_cache.get_version()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Category.objects.bulk_create([Category(name="New")])
+    assert products_cache.get_version() != version
+    version = products_cache.get_version()
+
+    categories[0].name = "Renamed"
+    with django_capture_on_commit_callbacks(execute=True):
+        Category.objects.bulk_update(categories[:1], ["name"])
+    assert products_cache.get_version() != version
+    cache.clear()
+
+
+# The async psycopg connections do not see the data of a test transaction
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("products_rows")
+@pytest.mark.parametrize("pooled", [True, False])
+@pytest.mark.parametrize("backend", ["rollup", "live", "matview"])
+def test_aget_products_aggr(
+    settings: SettingsWrapper,
+    monkeypatch: pytest.MonkeyPatch,
+    current_year: int,
+    current_month: int,
+    backend: str,
+    pooled: bool,
+) -> None:
+    settings.PRODUCTS_AGGREGATION_BACKEND = backend
+    if backend == "matview" and connection.vendor == "postgresql":
+        SalesViewRefresh.objects.refresh(concurrently=False)
+    if pooled:
+        monkeypatch.setitem(connection.settings_dict["OPTIONS"], "pool", {"min_size": 1})
+    else:
+        # Without a pool the query runs in a thread rather than opening a connection
+        monkeypatch.setattr(product_models, "async_connection", None)
+    page = ProductsPage(order_by="-name", limit=2)
+
+    async def aget_products_aggr() -> list[ProductRow]:
+        rows = await Product.objects.aget_products_aggr(
+            year=current_year, month=current_month, page=page
+        )
+        await aclose_pools()
+        return rows
+
+    rows = async_to_sync(aget_products_aggr)()
+    assert len(rows) == 2
+    assert rows == Product.objects.get_products_aggr(
+        year=current_year, month=current_month, page=page
+    )
+
+
+def test_sales_series_matches_monthly_sales(
+    products_rows: list[ProductRow], current_year: int, current_month: int
+) -> None:
+    this_month = dt.date(current_year, current_month, 1)
+    previous_month = (this_month - dt.timedelta(days=1)).replace(day=1)
+    next_month = (this_month + dt.timedelta(days=31)).replace(day=1)
+
+    series = Product.objects.sales_series(previous_month, next_month, granularity="month")
+
+    assert series.periods == [previous_month, this_month]
+    assert {product_id: series.row(product_id).tolist() for product_id in series.product_ids} == {
+        row[0]: [row[5], row[6]] for row in products_rows
+    }
+    matrix = series.to_numpy()
+    assert matrix.shape == (len(products_rows), 2)
+    assert matrix.sum() == sum(row[5] + row[6] for row in products_rows)
+
+
+@pytest.mark.parametrize("granularity", ["day", "week", "month"])
+def test_sales_series_is_dense(
+    cart_items: list[CartItem], now: dt.datetime, granularity: Granularity
+) -> None:
+    start, end = now.date() - dt.timedelta(days=45), now.date() + dt.timedelta(days=1)
+    product_ids = [cart_items[1].product_id, cart_items[0].product_id]
+
+    series = Product.objects.sales_series(start, end, granularity=granularity, products=product_ids)
+
+    assert series.periods == period_starts(start, end, granularity)
+    assert series.shape == (2, len(series.periods))
+    assert series.product_ids.tolist() == product_ids
+    sold = CartItem.objects.filter(
+        product_id=product_ids[0],
+        purchased_at__gte=dt.datetime.combine(series.periods[0], dt.time(), tzinfo=dt.timezone.utc),
+        purchased_at__lt=dt.datetime.combine(end, dt.time(), tzinfo=dt.timezone.utc),
+    ).aggregate(total=Sum("quantity"))["total"]
+    assert sum(series.as_dict()["quantities"][0]) == sold > 0
+
+
+@pytest.mark.parametrize("backend", ["rollup", "live"])
+@pytest.mark.parametrize("by", ["sellers", "movers"])
+@pytest.mark.parametrize("per_category", [True, False])
+def test_get_top_products(
+    settings: SettingsWrapper,
+    products_rows: list[ProductRow],
+    current_year: int,
+    current_month: int,
+    backend: str,
+    by: Ranking,
+    per_category: bool,
+) -> None:
+    settings.PRODUCTS_AGGREGATION_BACKEND = backend
+
+    def rank(row: ProductRow) -> tuple[int, int]:
+        sales = row[6] if by == "sellers" else abs(row[6] - row[5])
+        return -sales, row[0]
+
+    ranked_rows = sorted(products_rows, key=rank)
+    if per_category:
+        categories = sorted({row[2] for row in products_rows})
+        expected = [
+            row
+            for category in categories
+            for row in [row for row in ranked_rows if row[2] == category][:2]
+        ]
+    else:
+        expected = ranked_rows[:2]
+
+    rows = Product.objects.get_top_products(
+        current_year, current_month, n=2, by=by, per_category=per_category
+    )
+    assert [tuple(row) for row in rows] == [tuple(row) for row in expected]
+
+
+@pytest.mark.parametrize("granularity", ["day", "week", "month"])
+@pytest.mark.parametrize(
+    ("start", "end"),
+    [
+        (dt.date(2023, 1, 1), dt.date(2023, 1, 2)),
+        (dt.date(2023, 1, 4), dt.date(2023, 3, 1)),
+        (dt.date(2023, 1, 31), dt.date(2023, 3, 2)),
+        (dt.date(2023, 2, 1), dt.date(2023, 1, 1)),
+        (dt.date(9999, 12, 1), dt.date(9999, 12, 31)),
+    ],
+)
+def test_count_periods(start: dt.date, end: dt.date, granularity: Granularity) -> None:
+    assert count_periods(start, end, granularity) == len(period_starts(start, end, granularity))
@@ -28,8 +28,8 @@ def test_home_view(
     assert resp.context["current_month"] == get_month_name(current_month)
 
     for product, row_product in zip(resp.context["products"], products_rows):
-        assert product[-1] == row_product[-1] == 2
-        assert product[-2] == row_product[-2] == 1
+        assert product[-1] == row_product[-1] == 1
+        assert product[-2] == row_product[-2] == 2
 
 
 @pytest.mark.usefixtures("product_without_sales")
@@ -51,3 +51,149 @@ def test_home_view_without_products(
     resp = auth_client.get(url)
     assert resp.status_code == 200
     assert len(resp.context["products"]) == 0
+
+
+def test_home_view_pagination(
+    auth_client: Client,
+    products_rows: list[ProductRow],
+) -> None:
+    url = reverse("home")
+    by_price = sorted(products_rows, key=lambda row: (row[4], row[0]), reverse=True)
+
+    resp = auth_client.get(url, data={"order": "-price", "limit": 3})
+    assert resp.status_code == 200
+    assert list(resp.context["products"]) == by_price[:3]
+    assert resp.context["next_after"]
+
+    resp = auth_client.get(
+        url, data={"order": "-price", "limit": 3, "after": resp.context["next_after"]}
+    )
+    assert resp.status_code == 200
+    assert list(resp.context["products"]) == by_price[3:6]
+
+    resp = auth_client.get(url, data={"order": "-price", "limit": 3, "offset": 6})
+    assert list(resp.context["products"]) == by_price[6:9]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"order": "is_active"},
+        {"limit": "many"},
+        {"limit": 0},
+        {"offset": -1},
+        {"after": "not-a-cursor"},
+    ],
+)
+def test_home_view_bad_pagination(auth_client: Client, params: dict[str, str]) -> None:
+    resp = auth_client.get(reverse("home"), data=params)
+    assert resp.status_code == 400
+
+
+def test_products_data_unauthenticated(client: Client) -> None:
+    resp = client.get(reverse("products_data"))
+    assert resp.status_code == 302
+
+
+def test_products_data(
+    auth_client: Client,
+    products_rows: list[ProductRow],
+) -> None:
+    resp = auth_client.get(
+        reverse("products_data"),
+        data={
+            "draw": 3,
+            "start": 2,
+            "length": 4,
+            "order[0][column]": 4,
+            "order[0][dir]": "desc",
+            "search[value]": "",
+        },
+    )
+    assert resp.status_code == 200
+
+    data = resp.json()
+    by_price = sorted(products_rows, key=lambda row: (row[4], row[0]), reverse=True)
+    assert data["draw"] == 3
+    assert data["recordsTotal"] == data["recordsFiltered"] == len(products_rows)
+    assert [row[0] for row in data["data"]] == [row[0] for row in by_price[2:6]]
+    assert data["salesAsOf"] is None
+
+
+def test_products_data_search(
+    auth_client: Client,
+    products_rows: list[ProductRow],
+) -> None:
+    category = products_rows[0][2]
+    resp = auth_client.get(reverse("products_data"), data={"search[value]": category.upper()})
+    assert resp.status_code == 200
+
+    data = resp.json()
+    expected = [row[0] for row in products_rows if category.lower() in row[2].lower()]
+    assert data["recordsTotal"] == len(products_rows)
+    assert data["recordsFiltered"] == len(expected)
+    assert [row[0] for row in data["data"]] == expected
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"order[0][column]": 3}, {"order[0][column]": 42}, {"order[0][dir]": "up"}, {"draw": "x"}],
+)
+def test_products_data_bad_params(auth_client: Client, params: dict[str, str]) -> None:
+    resp = auth_client.get(reverse("products_data"), data=params)
+    assert resp.status_code == 400
+
+
+def test_sales_series_view(auth_client: Client, products_rows: list[ProductRow]) -> None:
+    resp = auth_client.get(reverse("sales_series"), data={"granularity": "week"})
+    assert resp.status_code == 200
+
+    data = resp.json()
+    assert data["granularity"] == "week"
+    assert data["product_ids"] == sorted(row[0] for row in products_rows)
+    assert [len(row) for row in data["quantities"]] == [len(data["periods"])] * len(products_rows)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"granularity": "hour"},
+        {"start": "2023-02-01", "end": "2023-01-01"},
+        {"start": "yesterday"},
+        {"products": "1,x"},
+        {"start": "1900-01-01", "products": ",".join(map(str, range(1000)))},
+        {"start": "0001-01-01", "end": "9999-12-31", "products": "1"},
+        {"end": "0001-01-05"},
+    ],
+)
+def test_sales_series_view_bad_params(auth_client: Client, params: dict[str, str]) -> None:
+    resp = auth_client.get(reverse("sales_series"), data=params)
+    assert resp.status_code == 400
+
+
+def test_top_products_view(auth_client: Client, products_rows: list[ProductRow]) -> None:
+    resp = auth_client.get(reverse("top_products"), data={"n": 3, "by": "movers"})
+    assert resp.status_code == 200
+
+    data = resp.json()
+    assert data["by"] == "movers"
+    assert data["perCategory"] is False
+    assert len(data["data"]) == 3
+    changes = [abs(row[6] - row[5]) for row in data["data"]]
+    assert changes == sorted(changes, reverse=True)
+    assert max(abs(row[6] - row[5]) for row in products_rows) == changes[0]
+
+
+@pytest.mark.parametrize("params", [{"n": 0}, {"n": 101}, {"n": "x"}, {"by": "losers"}])
+def test_top_products_view_bad_params(auth_client: Client, params: dict[str, str]) -> None:
+    resp = auth_client.get(reverse("top_products"), data=params)
+    assert resp.status_code == 400
+
+
+def test_sales_series_view_last_month(auth_client: Client) -> None:
+    resp = auth_client.get(
+        reverse("sales_series"),
+        data={"start": "9999-12-01", "end": "9999-12-31", "granularity": "month"},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["periods"] == ["9999-12-01"]
@@ -10,6 +10,9 @@ if TYPE_CHECKING:
         context: dict[str, Any]
         url: str
 
+        def json(self) -> Any:
+            ...
+
     class Client(Protocol):  # noqa: F811
         """
         Typed version of django.test.client.Client
@@ -18,6 +21,9 @@ if TYPE_CHECKING:
         def get(self, path: str, **extra: Any) -> Response:  # noqa: U100
             ...
 
+        def generic(self, method: str, path: str, **extra: Any) -> Response:  # noqa: U100
+            ...
+
         def force_login(self, user: AbstractUser, backend: Any = None) -> None:  # noqa: U100
             ...
 